@@ -1,9 +1,13 @@
 import json
+import os
 import sys
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 
 from PyQt5.QtWidgets import (
     QApplication,
+    QComboBox,
+    QListView,
+    QProgressBar,
     QMainWindow,
     QPushButton,
     QVBoxLayout,
@@ -18,8 +22,14 @@ from PyQt5.QtWidgets import (
     QFrame,
     QStackedWidget,
 )
-from PyQt5.QtCore import Qt, QMimeData, pyqtSignal
-from PyQt5.QtGui import QDrag
+from PyQt5.QtCore import Qt, QMimeData, pyqtSignal, QAbstractListModel, QModelIndex, QObject, QThread
+from PyQt5.QtGui import QDrag, QColor
+
+from models.classifier import ConfigurationGenerator
+from models.project import ProjectGroups, feature_text, group_title
+from models.streaming import (
+    ALL_CONFIGURATIONS, BLOCKED_CONFIGURATIONS, VALID_CONFIGURATIONS, VALID_ROW, ConfigurationRows, classify_in_batches
+)
 
 
 class AddGroupDialog(QDialog):
@@ -105,6 +115,326 @@ class DraggableLabel(QLabel):
         self.dropped.emit(event.source(), self)
 
 
+class ProjectModel(QObject):
+    """
+    The ProjectGroups of the project view, with a signal for every change.
+    """
+    # Every group changed, such as after loading a project
+    groups_reset = pyqtSignal()
+    # Priority of the new group
+    group_added = pyqtSignal(object)
+    # Priorities of the group and of its new feature
+    feature_added = pyqtSignal(object, object)
+    # Priorities of the two swapped groups
+    groups_swapped = pyqtSignal(object, object)
+    # Priority of the group and of its two swapped features
+    features_swapped = pyqtSignal(object, object, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.project = ProjectGroups()
+
+    @property
+    def groups(self) -> Dict:
+        return self.project.groups
+
+    def set_groups(self, groups: Dict):
+        self.project.groups = groups
+        self.groups_reset.emit()
+
+    def add_group(self, group_name: str):
+        group_priority = self.project.add_group(group_name)
+        self.group_added.emit(group_priority)
+        return group_priority
+
+    def add_feature(self, group_priority, feature_name: str):
+        feature_priority = self.project.add_feature(group_priority, feature_name)
+        self.feature_added.emit(group_priority, feature_priority)
+        return feature_priority
+
+    def swap_groups(self, first_priority, second_priority):
+        if self.project.swap_groups(first_priority, second_priority):
+            self.groups_swapped.emit(first_priority, second_priority)
+
+    def swap_features(self, group_priority, first_priority, second_priority):
+        if self.project.swap_features(group_priority, first_priority, second_priority):
+            self.features_swapped.emit(group_priority, first_priority, second_priority)
+
+
+class GroupBlock(QWidget):
+    """
+    Block of one group in the project view, updated in place when the group changes.
+    """
+
+    def __init__(self, window: "MainWindow", group_priority, group: Dict):
+        super().__init__()
+        self.main_window = window
+        self.group_priority = group_priority
+        self.group = group
+        self.feature_labels = {}
+
+        self.group_layout = QVBoxLayout()
+        self.setLayout(self.group_layout)
+
+        group_header = QHBoxLayout()
+        self.group_label = DraggableLabel()
+        self.group_label.setProperty("labelType", "group")
+        self.group_label.setFrameStyle(QFrame.Panel | QFrame.Raised)
+        self.group_label.setLineWidth(2)
+        self.group_label.setAcceptDrops(True)
+        self.group_label.dropped.connect(window.handleDrop)
+
+        add_feature_button = QPushButton("Add a feature +")
+        add_feature_button.clicked.connect(lambda: window.show_add_feature_dialog(self.group_priority))
+
+        group_header.addWidget(self.group_label)
+        group_header.addWidget(add_feature_button)
+        self.group_layout.addLayout(group_header)
+
+        self.placeholder_label = QLabel(f"Add new feature...")
+        self.group_layout.addWidget(self.placeholder_label)
+        self.placeholder_label.setVisible(not group["features"])
+
+        for feature_priority in group["features"]:
+            self.add_feature_label(feature_priority)
+        self.set_priority(group_priority)
+
+    def set_priority(self, group_priority):
+        self.group_priority = group_priority
+        self.group_label.setText(group_title(group_priority, self.group))
+        self.group_label.setProperty("groupIndex", group_priority)
+        for feature_label in self.feature_labels.values():
+            feature_label.setProperty("groupIndex", group_priority)
+
+    def set_color(self, color: str):
+        self.setStyleSheet(f"background: {color};")
+
+    def add_feature_label(self, feature_priority):
+        feature_label = DraggableLabel()
+        feature_label.setProperty("labelType", "feature")
+        feature_label.setProperty("groupIndex", self.group_priority)
+        feature_label.setProperty("featureIndex", feature_priority)
+        feature_label.setFrameStyle(QFrame.Panel | QFrame.Raised)
+        feature_label.setLineWidth(2)
+        feature_label.setAcceptDrops(True)
+        feature_label.dropped.connect(self.main_window.handleDrop)
+        self.group_layout.addWidget(feature_label)
+        self.feature_labels[feature_priority] = feature_label
+        self.placeholder_label.setVisible(False)
+        self.update_feature_label(feature_priority)
+
+    def update_feature_label(self, feature_priority):
+        feature = self.group["features"][feature_priority]
+        self.feature_labels[feature_priority].setText(feature_text(feature_priority, feature))
+
+
+class ClassifierWorker(QThread):
+    """
+    Classify the configurations of a project in a background thread and send them in batches.
+
+    The thread stops between two configurations when an interruption is requested; the batching
+    is done by `models.streaming.classify_in_batches`.
+    """
+    # The ConfigurationGenerator, once the project is compiled
+    loaded = pyqtSignal(object)
+    # A list of (index of the blocking constraint or None, value codes)
+    batch_ready = pyqtSignal(object)
+    # Combinations classified so far and in total; Python ints, which may not fit a C++ int
+    progress = pyqtSignal(object, object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, file_path: str, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+
+    def run(self):
+        try:
+            generator = ConfigurationGenerator(self.file_path)
+            if self.isInterruptionRequested():
+                return
+            self.loaded.emit(generator)
+            classify_in_batches(generator, self.batch_ready.emit, self.progress.emit, self.isInterruptionRequested)
+        except Exception as error:
+            self.failed.emit(f"{type(error).__name__}: {error}")
+
+
+class ConfigurationListModel(QAbstractListModel):
+    """
+    List model over the ConfigurationRows of the classifier view, formatting only the displayed rows.
+
+    The view only asks for the visible rows and filtering does not copy the configurations.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = ConfigurationRows()
+
+    def reset(self, plan=None):
+        self.beginResetModel()
+        self.rows.reset(plan)
+        self.endResetModel()
+
+    def total_count(self) -> int:
+        return self.rows.total_count()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.rows.visible_count()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self.rows.visible_count():
+            return None
+        if role == Qt.DisplayRole:
+            return self.rows.text(index.row())
+        if role == Qt.ForegroundRole and self.rows.status(index.row()) != VALID_ROW:
+            return QColor("#B71C1C")
+        return None
+
+    def append_rows(self, rows: List[Tuple[Optional[int], Tuple[int, ...]]]):
+        accepted = self.rows.append(rows)
+        if accepted:
+            start = self.rows.visible_count()
+            self.beginInsertRows(QModelIndex(), start, start + len(accepted) - 1)
+            self.rows.show(accepted)
+            self.endInsertRows()
+
+    def set_filter(self, status_filter: str, constraint_id: Optional[str]):
+        self.beginResetModel()
+        self.rows.set_filter(status_filter, constraint_id)
+        self.endResetModel()
+
+
+class ClassifierView(QWidget):
+    """
+    Classifier page: progress of the background classification and the filtered list of configurations.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.worker: Optional[ClassifierWorker] = None
+        self.file_path: Optional[str] = None
+        self.cancelled = False
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        self.status_label = QLabel("Load classifier...")
+        layout.addWidget(self.status_label)
+
+        progress_layout = QHBoxLayout()
+        # QProgressBar works with C++ ints, the progress is shown in per mille
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.setValue(0)
+        progress_layout.addWidget(self.progress_bar)
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel)
+        progress_layout.addWidget(self.cancel_button)
+        layout.addLayout(progress_layout)
+
+        filter_layout = QHBoxLayout()
+        self.status_filter = QComboBox()
+        self.status_filter.addItems([ALL_CONFIGURATIONS, VALID_CONFIGURATIONS, BLOCKED_CONFIGURATIONS])
+        self.status_filter.currentIndexChanged.connect(self.apply_filter)
+        filter_layout.addWidget(self.status_filter)
+        self.constraint_filter = QComboBox()
+        self.constraint_filter.addItem("All constraints", None)
+        self.constraint_filter.currentIndexChanged.connect(self.apply_filter)
+        filter_layout.addWidget(self.constraint_filter)
+        layout.addLayout(filter_layout)
+
+        self.model = ConfigurationListModel(self)
+        self.list_view = QListView()
+        # With uniform row heights the view lays out only the visible rows
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setModel(self.model)
+        layout.addWidget(self.list_view)
+
+        self.count_label = QLabel("")
+        layout.addWidget(self.count_label)
+        self.model.rowsInserted.connect(self.update_count)
+        self.model.modelReset.connect(self.update_count)
+
+    def load(self, file_path: str):
+        self.stop()
+        self.file_path = file_path
+        self.model.reset()
+        self.constraint_filter.blockSignals(True)
+        self.constraint_filter.clear()
+        self.constraint_filter.addItem("All constraints", None)
+        self.constraint_filter.blockSignals(False)
+        self.progress_bar.setValue(0)
+        self.status_label.setText(f"Classifying {os.path.basename(file_path)}...")
+
+        worker = ClassifierWorker(file_path, self)
+        worker.loaded.connect(self.on_loaded)
+        worker.batch_ready.connect(self.on_batch)
+        worker.progress.connect(self.on_progress)
+        worker.failed.connect(self.on_failed)
+        worker.finished.connect(self.on_finished)
+        worker.finished.connect(worker.deleteLater)
+        self.worker = worker
+        self.cancelled = False
+        self.cancel_button.setEnabled(True)
+        worker.start()
+
+    def on_loaded(self, generator):
+        # Signals of a stopped worker can still be queued, only the current worker is listened to
+        if self.sender() is not self.worker:
+            return
+        self.model.reset(generator.plan)
+        self.model.set_filter(self.status_filter.currentText(), None)
+        self.constraint_filter.blockSignals(True)
+        for constraint_id in dict.fromkeys(generator.plan.constraint_ids):
+            self.constraint_filter.addItem(constraint_id, constraint_id)
+        self.constraint_filter.blockSignals(False)
+
+    def on_batch(self, rows):
+        if self.sender() is self.worker:
+            self.model.append_rows(rows)
+
+    def on_progress(self, done, total):
+        if self.sender() is not self.worker:
+            return
+        self.progress_bar.setValue(done * 1000 // total if total else 1000)
+
+    def on_failed(self, message: str):
+        if self.sender() is not self.worker:
+            return
+        self.status_label.setText(f"Classification failed: {message}")
+
+    def on_finished(self):
+        if self.sender() is not self.worker:
+            return
+        self.cancel_button.setEnabled(False)
+        if self.cancelled:
+            self.status_label.setText(f"Cancelled: {os.path.basename(self.file_path)}")
+        elif not self.status_label.text().startswith("Classification failed"):
+            self.status_label.setText(f"Classified: {os.path.basename(self.file_path)}")
+
+    def cancel(self):
+        if self.worker is not None and self.worker.isRunning():
+            self.worker.requestInterruption()
+            self.cancelled = True
+            self.cancel_button.setEnabled(False)
+
+    def stop(self) -> Optional[ClassifierWorker]:
+        # Interrupt the classification without waiting for it, the worker is deleted once its
+        # thread has finished and its queued signals are ignored as it is no longer current;
+        # returns the worker while its thread still runs
+        worker, self.worker = self.worker, None
+        if worker is None:
+            return None
+        worker.requestInterruption()
+        return None if worker.isFinished() else worker
+
+    def apply_filter(self):
+        self.model.set_filter(self.status_filter.currentText(), self.constraint_filter.currentData())
+
+    def update_count(self):
+        self.count_label.setText(f"Showing {self.model.rowCount()} of {self.model.total_count()} configurations")
+
+
 class MainWindow(QMainWindow):
 
     colors = [
@@ -129,7 +459,13 @@ class MainWindow(QMainWindow):
         self.setGeometry(200, 200, 400, 600)
 
         # Main Data
-        self.groups = {}
+        self.project = ProjectModel(self)
+        self.project.groups_reset.connect(self.refresh_groups)
+        self.project.group_added.connect(self.on_group_added)
+        self.project.feature_added.connect(self.on_feature_added)
+        self.project.groups_swapped.connect(self.on_groups_swapped)
+        self.project.features_swapped.connect(self.on_features_swapped)
+        self.group_blocks: Dict[object, GroupBlock] = {}
         self.filters = []
 
         # Menu
@@ -179,83 +515,69 @@ class MainWindow(QMainWindow):
         self.add_group_button.clicked.connect(self.show_add_group_dialog)
         self.project_layout.addWidget(self.add_group_button)
 
-        # Placeholder to classifier_layout
-        classifier_label = QLabel(f"Load classifier...")
-        self.classifier_layout.addWidget(classifier_label)
+        # Classification runs in a background thread and streams into a virtualized list
+        self.classifier_panel = ClassifierView()
+        self.classifier_layout.addWidget(self.classifier_panel)
+        self.classifier_file_path = None
 
         self.switch_to_layout(self.project_widget_id)
 
     def switch_to_layout(self, index):
         self.central_widget.setCurrentIndex(index)
 
+    @property
+    def groups(self) -> Dict:
+        return self.project.groups
+
     def show_add_group_dialog(self):
         dialog = AddGroupDialog()
         if dialog.exec():  # If OK is pressed
-            group_priority = len(self.groups.keys()) + 1
             group_name = dialog.get_group_name()
             if group_name:
-                group = {
-                    "group_name": group_name,
-                    "features": {}
-                }
-                self.groups[group_priority] = group
-                self.add_group_block(group_priority, group)
-
-    def add_group_block(self, group_priority: int, group: Dict):
-        group_layout = QVBoxLayout()
-
-        group_header = QHBoxLayout()
-        group_label = DraggableLabel(f"Group ({group_priority}): {group['group_name']}")
-        group_label.setProperty("labelType", "group")
-        group_label.setProperty("groupIndex", group_priority)
-        group_label.setFrameStyle(QFrame.Panel | QFrame.Raised)
-        group_label.setLineWidth(2)
-        group_label.setAcceptDrops(True)
-        group_label.dropped.connect(self.handleDrop)
+                self.project.add_group(group_name)
 
-        add_feature_button = QPushButton("Add a feature +")
-        add_feature_button.clicked.connect(lambda: self.show_add_feature_dialog(group))
+    def add_group_block(self, group_priority, group: Dict):
+        block = GroupBlock(self, group_priority, group)
+        # The "Add Group" button stays last
+        position = self.project_layout.count() - 1
+        block.set_color(self._get_color(position + 1))
+        self.project_layout.insertWidget(position, block)
+        self.group_blocks[group_priority] = block
 
-        group_header.addWidget(group_label)
-        group_header.addWidget(add_feature_button)
-        group_layout.addLayout(group_header)
-
-        if not group["features"]:
-            feature_label = QLabel(f"Add new feature...")
-            group_layout.addWidget(feature_label)
-
-        for feature_priority, feature in group["features"].items():
-            label_text = f"Feature ({feature_priority}): {feature['name']}"
-            for option in feature["options"]:
-                label_text += f"\n({option['code']}) {option['name']}"
-            feature_label = DraggableLabel(label_text)
-            feature_label.setProperty("labelType", "feature")
-            feature_label.setProperty("groupIndex", group_priority)
-            feature_label.setProperty("featureIndex", feature_priority)
-            feature_label.setFrameStyle(QFrame.Panel | QFrame.Raised)
-            feature_label.setLineWidth(2)
-            feature_label.setAcceptDrops(True)
-            feature_label.dropped.connect(self.handleDrop)
-            group_layout.addWidget(feature_label)
-
-        container = QWidget()
-        group_color = self._get_color(self.project_layout.count())
-        container.setStyleSheet(f"background: {group_color};")
-        container.setLayout(group_layout)
-        self.project_layout.insertWidget(self.project_layout.count() - 1, container)
-
-    def show_add_feature_dialog(self, group: Dict):
+    def show_add_feature_dialog(self, group_priority):
         dialog = AddFeatureDialog()
         if dialog.exec():
-            feature_priority = len(group["features"]) + 1
             feature_name = dialog.get_feature_name()
             if feature_name:
-                feature = {
-                    "name": feature_name,
-                    "options": []
-                }
-                group["features"][feature_priority] = feature
-                self.refresh_groups()
+                self.project.add_feature(group_priority, feature_name)
+
+    def on_group_added(self, group_priority):
+        self.add_group_block(group_priority, self.groups[group_priority])
+
+    def on_feature_added(self, group_priority, feature_priority):
+        self.group_blocks[group_priority].add_feature_label(feature_priority)
+
+    def on_groups_swapped(self, first_priority, second_priority):
+        # The blocks move with their groups, only their priorities and colors change
+        first_block = self.group_blocks[first_priority]
+        second_block = self.group_blocks[second_priority]
+        first_position = self.project_layout.indexOf(first_block)
+        second_position = self.project_layout.indexOf(second_block)
+        self.project_layout.removeWidget(first_block)
+        self.project_layout.removeWidget(second_block)
+        for position, block in sorted([(first_position, second_block), (second_position, first_block)]):
+            self.project_layout.insertWidget(position, block)
+            block.set_color(self._get_color(position + 1))
+
+        self.group_blocks[first_priority] = second_block
+        self.group_blocks[second_priority] = first_block
+        second_block.set_priority(first_priority)
+        first_block.set_priority(second_priority)
+
+    def on_features_swapped(self, group_priority, first_priority, second_priority):
+        block = self.group_blocks[group_priority]
+        block.update_feature_label(first_priority)
+        block.update_feature_label(second_priority)
 
     def save_project(self):
         options = QFileDialog.Options()
@@ -278,13 +600,11 @@ class MainWindow(QMainWindow):
         if file_path:
             with open(file_path, 'r', encoding='utf-8') as project_file:
                 project_configs = json.load(project_file)
-                self.groups = project_configs["groups"]
                 self.filters = project_configs["filters"]
-                self.refresh_groups()
+                self.project.set_groups(project_configs["groups"])
 
     def clear_project(self):
-        self.groups = {}
-        self.refresh_groups()
+        self.project.set_groups({})
 
     def project_view(self):
         self.switch_to_layout(self.project_widget_id)
@@ -296,11 +616,9 @@ class MainWindow(QMainWindow):
         options = QFileDialog.Options()
         file_path, _ = QFileDialog.getOpenFileName(self, "load Project", "./projects/", "JSON Files (*.json)", options=options)
         if file_path:
-            with open(file_path, 'r', encoding='utf-8') as project_file:
-                project_configs = json.load(project_file)
-                self.groups = project_configs["groups"]
-                self.filters = project_configs["filters"]
-                self.refresh_classifier()
+            self.classifier_file_path = file_path
+            self.refresh_classifier()
+            self.switch_to_layout(self.classifier_widget_id)
 
     def handleDrop(self, source_label, target_label):
         source_type = source_label.property("labelType")  # 'group' or 'feature'
@@ -313,39 +631,37 @@ class MainWindow(QMainWindow):
 
         if source_type == "group" and target_type == "group":
             # swap group priority
-            source_group = json.loads(json.dumps(self.groups[source_group_idx]))
-            target_group = json.loads(json.dumps(self.groups[target_group_idx]))
-            self.groups[source_group_idx] = target_group
-            self.groups[target_group_idx] = source_group
+            self.project.swap_groups(source_group_idx, target_group_idx)
 
         elif source_type == "feature" and target_type == "feature" and source_group_idx == target_group_idx:
             # swap feature priority
-            group = self.groups[source_group_idx]
-            source_feature = json.loads(json.dumps(group["features"][source_feature_idx]))
-            target_feature = json.loads(json.dumps(group["features"][target_feature_idx]))
-
-            group["features"][source_feature_idx] = target_feature
-            group["features"][target_feature_idx] = source_feature
-
-        self.refresh_groups()
+            self.project.swap_features(source_group_idx, source_feature_idx, target_feature_idx)
 
     def refresh_groups(self):
         while self.project_layout.count() > 1:
             project_widget = self.project_layout.takeAt(0).widget()
             if project_widget:
                 project_widget.deleteLater()
+        self.group_blocks = {}
 
         for group_priority, group in self.groups.items():
             self.add_group_block(group_priority, group)
 
     def refresh_classifier(self):
-        while self.classifier_layout.count() > 1:
-            classifier_widget = self.classifier_layout.takeAt(0).widget()
-            if classifier_widget:
-                classifier_widget.deleteLater()
-
-        for group_priority, group in self.groups.items():
-            self.add_group_block(group_priority, group)
+        if self.classifier_file_path:
+            self.classifier_panel.load(self.classifier_file_path)
+
+    def closeEvent(self, event):
+        worker = self.classifier_panel.stop()
+        if worker is not None:
+            # A running QThread must not be destroyed: the window hides and closes again once the
+            # interrupted classification has finished
+            worker.finished.connect(self.close)
+            if not worker.isFinished():
+                self.hide()
+                event.ignore()
+                return
+        super().closeEvent(event)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,118 @@
+import argparse
+import json
+import random
+from typing import Optional, Sequence, Union
+
+
+def generate_project(n_features: int, domain_size: Union[int, Sequence[int]] = 3, n_domain_constraints: int = 0,
+                     n_conditional_constraints: int = 0, condition_arity: int = 1, null_fraction: float = 0.0,
+                     seed: Optional[int] = None) -> dict:
+    """
+    Generate a synthetic project in the schema of `projects/project_template.json`.
+
+    Args:
+        n_features (int): Number of features.
+        domain_size (Union[int, Sequence[int]]): Number of values of every feature, or the
+            (minimum, maximum) range the size of every domain is drawn from.
+        n_domain_constraints (int): Number of `domain` constraints.
+        n_conditional_constraints (int): Number of `conditional` constraints.
+        condition_arity (int): Number of conditions of every conditional constraint.
+        null_fraction (float): Fraction of conditional constraints whose action is `null`
+            instead of `block`.
+        seed (Optional[int]): Seed of the random generator, for reproducible projects.
+
+    Returns:
+        dict: The project, with `features` and `constraints`.
+    """
+    if condition_arity >= n_features and n_conditional_constraints:
+        raise ValueError('Conditional constraints need more features than conditions')
+
+    rng = random.Random(seed)
+    low, high = (domain_size, domain_size) if isinstance(domain_size, int) else domain_size
+
+    features = []
+    for feature_idx in range(n_features):
+        size = rng.randint(low, high)
+        features.append({
+            'name': f'Feature {feature_idx + 1}',
+            'description': f'Feature {feature_idx + 1} description',
+            'type': 'enum',
+            'domain': [f'F{feature_idx + 1} value {value_idx + 1}' for value_idx in range(size)],
+            'group': f'Group {feature_idx // 5 + 1}',
+        })
+
+    def allowed_values(feature: dict) -> list:
+        domain = feature['domain']
+        return rng.sample(domain, rng.randint(1, max(1, len(domain) - 1))) if domain else []
+
+    constraints = []
+    for _ in range(n_domain_constraints):
+        feature = rng.choice(features)
+        values = allowed_values(feature)
+        constraints.append({
+            'id': f'c{len(constraints)}',
+            'description': f"Allow only {', '.join(values)} for '{feature['name']}'",
+            'rule_type': 'domain',
+            'feature': feature['name'],
+            'allowed_values': values,
+        })
+
+    for _ in range(n_conditional_constraints):
+        condition_features = rng.sample([feature for feature in features if feature['domain']], condition_arity + 1)
+        target = condition_features.pop()
+        conditions = [{'feature': feature['name'], 'value': rng.choice(feature['domain'])}
+                      for feature in condition_features]
+        condition_text = ' and '.join(f"'{condition['feature']}' = '{condition['value']}'" for condition in conditions)
+
+        if rng.random() < null_fraction:
+            action = {'feature': target['name'], 'mode': 'null'}
+            description = f"If {condition_text}, then '{target['name']}' is not applicable"
+        else:
+            values = allowed_values(target)
+            action = {'feature': target['name'], 'mode': 'block', 'allowed_values': values}
+            description = f"If {condition_text}, then '{target['name']}' is one of {', '.join(values)}"
+
+        constraints.append({
+            'id': f'c{len(constraints)}',
+            'description': description,
+            'rule_type': 'conditional',
+            'conditions': conditions,
+            'actions': [action],
+        })
+
+    return {'features': features, 'constraints': constraints}
+
+
+def write_project(file_path: str, project: dict):
+    """
+    Write a project to a JSON file, formatted as the files in `projects/`.
+
+    Args:
+        file_path (str): Path of the file to write.
+        project (dict): The project, with `features` and `constraints`.
+    """
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(project, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a synthetic project JSON file.")
+    parser.add_argument('file_path', type=str, help="Path of the project file to write.")
+    parser.add_argument('--features', type=int, default=10, help="Number of features.")
+    parser.add_argument('--domain-size', type=int, nargs='+', default=[3],
+                        help="Size of every domain, or the minimum and maximum size.")
+    parser.add_argument('--domain-constraints', type=int, default=2, help="Number of domain constraints.")
+    parser.add_argument('--conditional-constraints', type=int, default=8, help="Number of conditional constraints.")
+    parser.add_argument('--arity', type=int, default=1, help="Number of conditions of conditional constraints.")
+    parser.add_argument('--null-fraction', type=float, default=0.25,
+                        help="Fraction of conditional constraints with a null action.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the random generator.")
+    args = parser.parse_args()
+
+    if len(args.domain_size) > 2:
+        parser.error("--domain-size takes one size or a minimum and a maximum")
+    size = args.domain_size[0] if len(args.domain_size) == 1 else tuple(args.domain_size)
+    write_project(args.file_path, generate_project(
+        args.features, size, args.domain_constraints, args.conditional_constraints, args.arity,
+        args.null_fraction, args.seed,
+    ))
@@ -0,0 +1,229 @@
+"""
+Benchmark the configuration generator on synthetic projects.
+
+Run from the repository root as a module, so that the `benchmarks` and `models` packages import:
+
+    python -m benchmarks.run --scenario small --output results.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.generator import generate_project, write_project
+from models.classifier import ENGINES, ConfigurationGenerator
+
+# Root of the repository, where create_configurations.py lives
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Parameters of `generate_project` for every scenario
+SCENARIOS: Dict[str, dict] = {
+    'small': dict(n_features=6, domain_size=3, n_domain_constraints=1, n_conditional_constraints=4,
+                  condition_arity=1, null_fraction=0.25, seed=1),
+    'medium': dict(n_features=10, domain_size=(2, 4), n_domain_constraints=2, n_conditional_constraints=12,
+                   condition_arity=1, null_fraction=0.25, seed=2),
+    'wide_conditions': dict(n_features=10, domain_size=3, n_domain_constraints=2, n_conditional_constraints=20,
+                            condition_arity=3, null_fraction=0.1, seed=3),
+    'null_heavy': dict(n_features=10, domain_size=3, n_domain_constraints=0, n_conditional_constraints=16,
+                       condition_arity=2, null_fraction=0.75, seed=4),
+}
+
+# Runs the CLI in a child process and reports the peak resident set size of that process
+CLI_WRAPPER = (
+    "import resource, runpy, sys\n"
+    "sys.argv = sys.argv[1:]\n"
+    "runpy.run_path(sys.argv[0], run_name='__main__')\n"
+    "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, file=sys.stderr)\n"
+)
+
+
+def measure(function: Callable[[], object], repeat: int) -> dict:
+    """
+    Time a function and track its peak Python memory.
+
+    The timings run without tracemalloc, which slows allocations down; the peak memory comes
+    from one more run under tracemalloc.
+
+    Args:
+        function (Callable[[], object]): The benchmarked call.
+        repeat (int): Number of timed runs, the best one is kept.
+
+    Returns:
+        dict: Best wall-clock time in seconds and peak traced memory in bytes.
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(timings), 'peak_bytes': peak}
+
+
+def measure_cli(file_path: str, engine: str, repeat: int) -> dict:
+    """
+    Time the command line export of every configuration to CSV, in a child process.
+
+    Args:
+        file_path (str): Path of the project file.
+        engine (str): Evaluation engine passed to the CLI.
+        repeat (int): Number of timed runs, the best one is kept.
+
+    Returns:
+        dict: Best wall-clock time in seconds and peak resident set size of the process in bytes
+            (None where the resource module is not available).
+    """
+    script = os.path.join(REPOSITORY_ROOT, 'create_configurations.py')
+    command = [sys.executable, '-c', CLI_WRAPPER, script, file_path,
+               '--engine', engine, '--format', 'csv', '--output', os.devnull]
+    timings, peak = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run(command, cwd=REPOSITORY_ROOT, capture_output=True, text=True, check=True)
+        timings.append(time.perf_counter() - start)
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        max_rss = int(completed.stderr.strip().splitlines()[-1])
+        peak = max_rss if sys.platform == 'darwin' else max_rss * 1024
+    return {'seconds': min(timings), 'peak_bytes': peak}
+
+
+def run_scenario(name: str, parameters: dict, engine: str, repeat: int, directory: str) -> List[dict]:
+    """
+    Generate the project of a scenario and run every benchmark on it.
+
+    Returns:
+        List[dict]: One result per benchmark.
+    """
+    file_path = os.path.join(directory, f'{name}.json')
+    write_project(file_path, generate_project(**parameters))
+    generator = ConfigurationGenerator(file_path, engine=engine)
+
+    benchmarks = {
+        'calculate_all_configurations': lambda: generator.calculate_all_configurations(),
+        'calculate_valid_configurations': lambda: generator.calculate_valid_configurations(),
+    }
+    results = []
+    for benchmark, function in benchmarks.items():
+        results.append({'scenario': name, 'benchmark': benchmark, **measure(function, repeat)})
+    results.append({'scenario': name, 'benchmark': 'cli', **measure_cli(file_path, engine, repeat)})
+
+    valid, blocked = generator.calculate_valid_configurations()
+    size = {'all': generator.count_all(), 'valid': len(valid), 'blocked': len(blocked)}
+    for result in results:
+        result['parameters'] = parameters
+        result['configurations'] = size
+    return results
+
+
+def git_commit() -> Optional[str]:
+    """
+    Get the commit of the working tree, None outside a git checkout.
+    """
+    try:
+        completed = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPOSITORY_ROOT,
+                                   capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip()
+
+
+def compare(results: dict, baseline: dict) -> List[str]:
+    """
+    Compare benchmark results with the results of another run.
+
+    Args:
+        results (dict): Results of this run, as written by `main`.
+        baseline (dict): Results of the run to compare with.
+
+    Returns:
+        List[str]: One line per benchmark present in both runs with the time and memory ratios.
+    """
+    previous = {(result['scenario'], result['benchmark']): result for result in baseline['results']}
+    lines = []
+    for result in results['results']:
+        old = previous.get((result['scenario'], result['benchmark']))
+        if old is None:
+            continue
+        time_ratio = result['seconds'] / old['seconds'] if old['seconds'] else float('inf')
+        line = f"{result['scenario']}/{result['benchmark']}: time x{time_ratio:.2f}"
+        if result['peak_bytes'] and old['peak_bytes']:
+            line += f", peak memory x{result['peak_bytes'] / old['peak_bytes']:.2f}"
+        lines.append(line)
+    return lines
+
+
+def main(output: Optional[str], scenarios: List[str], engine: str = 'search', repeat: int = 3,
+         baseline: Optional[str] = None) -> dict:
+    """
+    Run the benchmark scenarios and write the results as JSON.
+
+    Args:
+        output (Optional[str]): Path of the results file, standard output by default.
+        scenarios (List[str]): Names of the scenarios to run, from SCENARIOS.
+        engine (str): Evaluation engine of the ConfigurationGenerator.
+        repeat (int): Number of timed runs of every benchmark.
+        baseline (Optional[str]): Path of the results of an earlier run to compare with.
+
+    Returns:
+        dict: The results.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name in scenarios:
+            results.extend(run_scenario(name, SCENARIOS[name], engine, repeat, directory))
+
+    report = {
+        'commit': git_commit(),
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'engine': engine,
+        'repeat': repeat,
+        'results': results,
+    }
+    if output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if baseline is not None:
+        with open(baseline, 'r', encoding='utf-8') as f:
+            for line in compare(report, json.load(f)):
+                print(line, file=sys.stderr)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Benchmark the configuration generator on synthetic projects. "
+                    "Run as `python -m benchmarks.run` from the repository root."
+    )
+    parser.add_argument('--output', type=str, default=None, help="Results file, standard output by default.")
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS), default=None,
+                        help="Scenario to run, every scenario by default; can be repeated.")
+    parser.add_argument('--engine', choices=list(ENGINES), default='search', help="Evaluation engine.")
+    parser.add_argument('--repeat', type=int, default=3, help="Number of timed runs of every benchmark.")
+    parser.add_argument('--compare', type=str, default=None, dest='baseline',
+                        help="Results of an earlier run to compare with.")
+    args = parser.parse_args()
+
+    main(args.output, args.scenario or list(SCENARIOS), engine=args.engine, repeat=args.repeat,
+         baseline=args.baseline)
@@ -1,44 +1,238 @@
 import argparse
-from models.classifier import ConfigurationGenerator
+import sys
+from collections import Counter
+from itertools import islice
+from typing import Dict, Optional, TextIO
 
+from models.analysis import format_findings
+from models.cache import ResultCache
+from models.classifier import ENGINES, ConfigurationGenerator
+from models.writers import CHECKED_WRITERS, WRITERS, write_text
 
-def main(file_path: str):
+# Size of the output buffer, so that rows reach the file in large blocks
+OUTPUT_BUFFER_SIZE = 1 << 20
+
+
+def main(file_path: str, engine: str = 'search', workers: int = 1, speedup: bool = False,
+         output_format: str = 'text', output: Optional[str] = None, only: str = 'all', limit: Optional[int] = None,
+         cache_dir: Optional[str] = None, profile: bool = False, reorder: bool = False,
+         analyse: bool = False, drop_dead_rules: bool = False):
     """
     Example usage:
-    Load a JSON file containing features and constraints, generate all configurations,
-    and identify valid and blocked configurations.
+    Load a JSON file containing features and constraints, classify every configuration once
+    and stream the valid and blocked configurations to the output.
 
     Args:
         file_path (str): Path to the JSON configuration file.
+        engine (str): Evaluation engine used by the ConfigurationGenerator.
+        workers (int): Number of worker processes used to classify the configurations.
+        speedup (bool): Whether to report the speedup of the workers against the serial path.
+        output_format (str): Format of the rows, one of WRITERS: 'text', 'csv' or 'jsonl', or
+            'packed' for the binary file of `models.packed`, which needs an output path.
+        output (Optional[str]): Path of the output file, standard output by default.
+        only (str): Which configurations to write: 'valid', 'blocked' or 'all'.
+        limit (Optional[int]): Maximum number of configurations to write, all by default.
+        cache_dir (Optional[str]): Directory of the on-disk result cache, no cache by default.
+        profile (bool): Whether to report per-constraint statistics of the classification.
+        reorder (bool): Whether to evaluate the most selective constraints first.
+        analyse (bool): Whether to report the problems `analyse_constraints` finds in the constraints.
+        drop_dead_rules (bool): Whether to stop evaluating the constraints that never apply.
     """
-    configuration_generator = ConfigurationGenerator(file_path)
+    cache = ResultCache(cache_dir) if cache_dir is not None else None
+    configuration_generator = ConfigurationGenerator(file_path, engine=engine, workers=workers, cache=cache,
+                                                     profile=profile, reorder=reorder,
+                                                     drop_dead_rules=drop_dead_rules)
+    if analyse:
+        report_analysis(configuration_generator)
 
-    # Generate all possible configurations
-    all_combinations = configuration_generator.calculate_all_configurations()
-    print(f"All possible configurations {len(all_combinations)}:")
-    for idx, config in enumerate(all_combinations, start=1):
-        print(f"{idx}. {config}")
+    if output_format == 'packed':
+        configuration_generator.export_packed(output, valid=only != 'blocked', blocked=only != 'valid', limit=limit)
+        report_profile(configuration_generator)
+        report_speedup(configuration_generator, workers, speedup)
+        return
 
-    # Generate valid configurations and identify blocked configurations
-    valid_combinations, blocked_combinations = configuration_generator.calculate_valid_configurations()
+    # A full run stores the results, so that the next runs with the same cache only decode them
+    if limit is None:
+        configuration_generator.cache_results()
 
-    print("\nValid configurations:")
-    for idx, config in enumerate(valid_combinations, start=1):
-        print(f"{idx}. {config}")
+    # Classify every combination once, valid and blocked configurations in product order
+    rows = configuration_generator.iter_classified_configurations(valid=only != 'blocked', blocked=only != 'valid')
+    if limit is not None:
+        rows = islice(rows, limit)
 
-    print("\nBlocked configurations:")
-    for idx, (constraint_id, config) in enumerate(blocked_combinations, start=1):
-        print(f"{idx}. Blocked by ({constraint_id}): {config}")
+    if output is None:
+        stream = sys.stdout
+    else:
+        stream = open(output, 'w', encoding='utf-8', newline='', buffering=OUTPUT_BUFFER_SIZE)
+    try:
+        if output_format == 'text':
+            write_all_text(configuration_generator, stream, only, limit)
+            write_text(rows, stream, valid=only != 'blocked', blocked=only != 'valid')
+        else:
+            WRITERS[output_format](rows, stream)
 
-    # Show constraint descriptions
-    print("\nConstraints description:")
-    for description in configuration_generator.list_constraints_descriptions():
-        print(description)
+        # Show constraint descriptions
+        if output_format == 'text':
+            stream.write("\nConstraints description:\n")
+            stream.writelines(f"{description}\n" for description in configuration_generator.list_constraints_descriptions())
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
 
+    report_profile(configuration_generator)
+    report_speedup(configuration_generator, workers, speedup)
 
-if __name__ == '__main__':
+
+def write_all_text(configuration_generator: ConfigurationGenerator, stream: TextIO, only: str, limit: Optional[int]):
+    """
+    Write the header of the console report and, when every configuration is written, the numbered
+    list of all possible configurations, streamed without classifying them.
+    """
+    stream.write(f"All possible configurations {configuration_generator.count_all()}:\n")
+    if only != 'all':
+        return
+
+    all_configurations = configuration_generator.iter_all_configurations()
+    if limit is not None:
+        all_configurations = islice(all_configurations, limit)
+    stream.writelines(f"{idx}. {config}\n" for idx, config in enumerate(all_configurations, start=1))
+
+
+def report_analysis(configuration_generator: ConfigurationGenerator):
+    """
+    Print the problems found in the constraints.
+    """
+    findings = configuration_generator.analyse_constraints()
+    print(f"Constraint analysis: {len(findings)} finding(s)", file=sys.stderr)
+    for line in format_findings(findings):
+        print(line, file=sys.stderr)
+
+
+def report_profile(configuration_generator: ConfigurationGenerator):
+    """
+    Print the per-constraint statistics of the classification, in profiling mode.
+    """
+    if configuration_generator.stats is not None:
+        print("\nConstraint profile:", file=sys.stderr)
+        for line in configuration_generator.stats.report():
+            print(line, file=sys.stderr)
+
+
+def report_speedup(configuration_generator: ConfigurationGenerator, workers: int, speedup: bool):
+    """
+    Print the speedup of the workers against the serial path, if requested.
+    """
+    if speedup:
+        timings = configuration_generator.measure_speedup()
+        print(f"Serial: {timings['serial']:.3f}s, {workers} workers: {timings['parallel']:.3f}s, "
+              f"speedup: {timings['speedup']:.2f}x", file=sys.stderr)
+
+
+def validate(file_path: str, input_path: Optional[str] = None, output_format: str = 'text',
+             output: Optional[str] = None, reorder: bool = False) -> Dict[str, int]:
+    """
+    Check configurations read one per line against the constraints of a project and write the results.
+
+    Args:
+        file_path (str): Path to the JSON configuration file.
+        input_path (Optional[str]): File of `/`-joined configurations, standard input by default.
+        output_format (str): Format of the results, one of CHECKED_WRITERS: 'text', 'csv' or 'jsonl'.
+        output (Optional[str]): Path of the output file, standard output by default.
+        reorder (bool): Whether to evaluate the most selective constraints first.
+
+    Returns:
+        Dict[str, int]: Number of configurations of every status.
+    """
+    configuration_generator = ConfigurationGenerator(file_path, reorder=reorder)
+    statuses = Counter()
+
+    def counted(results):
+        for result in results:
+            statuses[result[1]] += 1
+            yield result
+
+    source = sys.stdin if input_path is None else open(input_path, 'r', encoding='utf-8', buffering=OUTPUT_BUFFER_SIZE)
+    if output is None:
+        stream = sys.stdout
+    else:
+        stream = open(output, 'w', encoding='utf-8', newline='', buffering=OUTPUT_BUFFER_SIZE)
+    try:
+        CHECKED_WRITERS[output_format](counted(configuration_generator.validate_batch(source)), stream)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if stream is not sys.stdout:
+            stream.close()
+
+    print(', '.join(f"{status}: {statuses[status]}" for status in ('valid', 'blocked', 'invalid')), file=sys.stderr)
+    return dict(statuses)
+
+
+def parse_arguments(arguments):
+    """
+    Parse the arguments of a generation run, or of a validation run with `--validate`, and run it.
+    """
     parser = argparse.ArgumentParser(description="Run the Configuration Generator with a JSON configuration file.")
     parser.add_argument('file_path', type=str, help="Path to the JSON configuration file.")
-    args = parser.parse_args()
+    parser.add_argument('--validate', action='store_true',
+                        help="Check given configurations against the constraints instead of generating them.")
+    parser.add_argument('--input', type=str, default=None, dest='input_path',
+                        help="With --validate, file with one '/'-joined configuration per line, "
+                             "standard input by default.")
+    parser.add_argument('--engine', choices=list(ENGINES), default='search', help="Evaluation engine.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of worker processes; only faster with spare CPU cores, check with --speedup.")
+    parser.add_argument('--speedup', action='store_true',
+                        help="Time the workers against the serial path and report the ratio.")
+    parser.add_argument('--format', dest='output_format', choices=list(WRITERS) + ['packed'], default='text',
+                        help="Output format; 'packed' writes a binary file and needs --output.")
+    parser.add_argument('--output', type=str, default=None, help="Output file, standard output by default.")
+    parser.add_argument('--only', choices=['valid', 'blocked', 'all'], default='all',
+                        help="Which configurations to write.")
+    parser.add_argument('--limit', type=int, default=None, help="Maximum number of configurations to write.")
+    parser.add_argument('--cache-dir', type=str, default=None,
+                        help="Directory of the on-disk result cache, reused across runs of the same project.")
+    parser.add_argument('--profile', action='store_true',
+                        help="Report per-constraint statistics: evaluations, matches, blocks, nulls and time.")
+    parser.add_argument('--reorder', action='store_true',
+                        help="Evaluate the most selective constraints first; the results are unchanged.")
+    parser.add_argument('--analyse', action='store_true',
+                        help="Report unknown references and constraints that never apply or are subsumed.")
+    parser.add_argument('--drop-dead-rules', action='store_true',
+                        help="Stop evaluating the constraints that never apply; the results are unchanged.")
+    args = parser.parse_args(arguments)
+
+    if args.validate:
+        for option in ('engine', 'workers', 'speedup', 'only', 'limit', 'cache_dir', 'profile', 'analyse',
+                       'drop_dead_rules'):
+            if getattr(args, option) != parser.get_default(option):
+                parser.error(f"--{option.replace('_', '-')} cannot be used with --validate")
+        if args.output_format not in CHECKED_WRITERS:
+            parser.error(f"--format {args.output_format} cannot be used with --validate")
+        validate(args.file_path, input_path=args.input_path, output_format=args.output_format, output=args.output,
+                 reorder=args.reorder)
+        return
+    if args.input_path is not None:
+        parser.error("--input requires --validate")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.speedup and args.workers < 2:
+        parser.error("--speedup requires --workers of at least 2")
+    if args.profile and args.workers > 1:
+        parser.error("--profile cannot be used with --workers")
+    if args.profile and args.cache_dir is not None:
+        parser.error("--profile cannot be used with --cache-dir")
+    if args.engine == 'incremental' and args.workers > 1:
+        parser.error("--engine incremental cannot be used with --workers")
+    if args.output_format == 'packed' and args.output is None:
+        parser.error("--format packed requires --output")
+    if args.limit is not None and args.limit < 0:
+        parser.error("--limit must not be negative")
+    main(args.file_path, engine=args.engine, workers=args.workers, speedup=args.speedup,
+         output_format=args.output_format, output=args.output, only=args.only, limit=args.limit,
+         cache_dir=args.cache_dir, profile=args.profile, reorder=args.reorder,
+         analyse=args.analyse, drop_dead_rules=args.drop_dead_rules)
 
-    main(args.file_path)
+
+if __name__ == '__main__':
+    parse_arguments(sys.argv[1:])
@@ -0,0 +1,262 @@
+from typing import Dict, List, Optional, Tuple
+
+from models.ordering import movable_rules
+from models.plan import BLOCK_ACTION, CONDITIONAL_RULE, DOMAIN_RULE, INVALID_RULE, CompiledPlan
+
+# Kinds of findings
+UNKNOWN_FEATURE = 'unknown_feature'
+UNKNOWN_VALUE = 'unknown_value'
+UNKNOWN_RULE_TYPE = 'unknown_rule_type'
+MALFORMED = 'malformed'
+NEVER_MATCHES = 'never_matches'
+ALWAYS_BLOCKS = 'always_blocks'
+UNREACHABLE = 'unreachable'
+REDUNDANT = 'redundant'
+SUBSUMED = 'subsumed'
+
+
+class Finding:
+    """
+    One problem found in the constraints of a project.
+
+    Attributes:
+        kind (str): Kind of the problem, one of the module constants.
+        index (int): Position of the constraint in declared order.
+        constraint_id (str): ID of the constraint.
+        message (str): Description of the problem.
+        dead (bool): Whether the constraint never changes the classification, so that it can be
+            dropped from the evaluated rules.
+    """
+
+    def __init__(self, kind: str, index: int, constraint_id: str, message: str, dead: bool = False):
+        self.kind = kind
+        self.index = index
+        self.constraint_id = constraint_id
+        self.message = message
+        self.dead = dead
+
+    def __repr__(self) -> str:
+        return f'Finding({self.kind!r}, {self.constraint_id!r}, {self.message!r})'
+
+    def as_dict(self) -> dict:
+        """
+        Convert the finding to a dictionary.
+        """
+        return {
+            'kind': self.kind,
+            'index': self.index,
+            'constraint_id': self.constraint_id,
+            'message': self.message,
+            'dead': self.dead,
+        }
+
+
+def _check_references(plan: CompiledPlan, index: int, constraint: dict) -> List[Finding]:
+    """
+    Find the references of a constraint to unknown features and values and its structural errors.
+    """
+    constraint_id = constraint.get('id')
+    rule_type = constraint.get('rule_type')
+    if rule_type not in ('domain', 'conditional'):
+        return [Finding(UNKNOWN_RULE_TYPE, index, constraint_id, f'Unknown constraint type {rule_type}')]
+
+    # (feature name, values, what the values are) of every reference
+    references: List[Tuple[str, list, str]] = []
+    try:
+        if rule_type == 'domain':
+            references.append((constraint['feature'], constraint['allowed_values'], 'allowed value'))
+        else:
+            for condition in constraint['conditions']:
+                references.append((condition['feature'], [condition['value']], 'condition value'))
+            for action in constraint['actions']:
+                values = action['allowed_values'] if action['mode'] == 'block' else []
+                references.append((action['feature'], values, 'allowed value'))
+    except KeyError as error:
+        return [Finding(MALFORMED, index, constraint_id, f'Missing key {error}')]
+
+    findings = []
+    for name, values, role in references:
+        if name not in plan.feature_index:
+            findings.append(Finding(UNKNOWN_FEATURE, index, constraint_id, f"Unknown feature '{name}'"))
+            continue
+        labels = plan.labels[plan.feature_index[name]]
+        for value in values:
+            if value not in labels:
+                findings.append(Finding(UNKNOWN_VALUE, index, constraint_id,
+                                        f"Unknown {role} '{value}' of feature '{name}'"))
+    return findings
+
+
+def _blocked_cubes(plan: CompiledPlan, rule_idx: int) -> List[Dict[int, int]]:
+    """
+    Describe the configurations a block-only rule blocks, as a union of cubes.
+
+    A cube maps features to the bitmask of their accepted codes; a feature missing from it accepts
+    every code of its domain.
+    """
+    rule = plan.rules[rule_idx]
+    if rule[0] == DOMAIN_RULE:
+        return [{rule[1]: ~rule[2] & ((1 << plan.domain_sizes[rule[1]]) - 1)}]
+
+    conditions: Dict[int, int] = {}
+    for feature, mask in rule[1]:
+        conditions[feature] = conditions.get(feature, (1 << plan.domain_sizes[feature]) - 1) & mask
+    cubes = []
+    for feature, _, mask in rule[2]:
+        cube = dict(conditions)
+        cube[feature] = cube.get(feature, (1 << plan.domain_sizes[feature]) - 1) & ~mask
+        cubes.append(cube)
+    return cubes
+
+
+def _contains(outer: Dict[int, int], inner: Dict[int, int], plan: CompiledPlan) -> bool:
+    """
+    Check whether a cube contains another one.
+    """
+    for feature, mask in outer.items():
+        inner_mask = inner.get(feature, (1 << plan.domain_sizes[feature]) - 1)
+        if inner_mask & ~mask:
+            return False
+    return True
+
+
+def analyse_constraints(features: List[dict], constraints: List[dict],
+                        plan: Optional[CompiledPlan] = None) -> List[Finding]:
+    """
+    Find the constraints that reference unknown features or values and those that never apply.
+
+    The values a feature can hold when a configuration reaches each rule are tracked in declared
+    order: its domain, restricted by the earlier domain rules and extended with the null value by
+    the earlier `null` actions. A rule is then dead when its conditions can never match, or when
+    none of its actions can block and it has no `null` action. A rule whose conditions always
+    match and which allows none of the values a feature can hold blocks every configuration
+    reaching it, and every rule after it is dead. A block-only rule reading raw
+    values is also dead when every configuration it blocks is blocked by an earlier such rule:
+    the configurations reaching it have passed that rule. Unknown features and rule types are
+    reported but not dead, since evaluating them raises an error, unless the conditions before
+    them can never match.
+
+    Args:
+        features (List[dict]): List of features, each with a name and a domain.
+        constraints (List[dict]): List of constraints in declared order.
+        plan (Optional[CompiledPlan]): The compiled features and constraints, compiled here if None.
+
+    Returns:
+        List[Finding]: The findings, by constraint in declared order.
+    """
+    plan = plan if plan is not None else CompiledPlan(features, constraints)
+    findings: List[Finding] = []
+
+    reachable = [(1 << size) - 1 for size in plan.domain_sizes]
+    dead = [False] * len(plan.rules)
+    # ID of the first rule blocking every configuration reaching it
+    blocker = None
+    for rule_idx, (constraint, rule) in enumerate(zip(constraints, plan.rules)):
+        constraint_id = plan.constraint_ids[rule_idx]
+        findings.extend(_check_references(plan, rule_idx, constraint))
+        if blocker is not None:
+            dead[rule_idx] = True
+            findings.append(Finding(UNREACHABLE, rule_idx, constraint_id,
+                                    f'Never reached, every configuration is blocked by {blocker}', dead=True))
+            continue
+        # Without any configuration left, every rule is already redundant or never matches
+        populated = all(reachable)
+
+        if rule[0] == DOMAIN_RULE:
+            feature, mask = rule[1], rule[2]
+            if not reachable[feature] & ~mask:
+                dead[rule_idx] = True
+                findings.append(Finding(REDUNDANT, rule_idx, constraint_id, f"Allows every value of feature "
+                                        f"'{plan.feature_sequence[feature]}' it can hold", dead=True))
+            elif populated and not reachable[feature] & mask:
+                blocker = constraint_id
+                findings.append(Finding(ALWAYS_BLOCKS, rule_idx, constraint_id, f"Allows no value of feature "
+                                        f"'{plan.feature_sequence[feature]}' it can hold"))
+            reachable[feature] &= mask
+
+        elif rule[0] == CONDITIONAL_RULE:
+            matching = {}
+            for feature, mask in rule[1]:
+                matching[feature] = matching.get(feature, reachable[feature]) & mask
+            never_matching = [feature for feature, mask in matching.items() if not mask]
+            if never_matching:
+                dead[rule_idx] = True
+                names = ', '.join(f"'{plan.feature_sequence[feature]}'" for feature in never_matching)
+                findings.append(Finding(NEVER_MATCHES, rule_idx, constraint_id,
+                                        f'The conditions on {names} can never match', dead=True))
+                continue
+
+            # Values of the matching configurations, through the actions
+            local = dict(matching)
+            # A rule raising an error when it is reached is never dead once its conditions can match
+            effective = rule[3] is not None
+            always = all(mask == reachable[feature] for feature, mask in matching.items())
+            action_findings = []
+            for feature, mode, mask in rule[2]:
+                name = plan.feature_sequence[feature]
+                values = local.get(feature, reachable[feature])
+                if mode == BLOCK_ACTION:
+                    if values & ~mask:
+                        effective = True
+                    else:
+                        action_findings.append(Finding(REDUNDANT, rule_idx, constraint_id,
+                                                       f"The action on '{name}' allows every value it can hold"))
+                    if always and populated and blocker is None and not values & mask:
+                        blocker = constraint_id
+                        action_findings.append(Finding(ALWAYS_BLOCKS, rule_idx, constraint_id,
+                                                       f"The action on '{name}' allows no value it can hold"))
+                    local[feature] = values & mask
+                else:
+                    effective = True
+                    local[feature] = 1 << plan.null_codes[feature]
+
+            if not effective:
+                dead[rule_idx] = True
+                findings.append(Finding(REDUNDANT, rule_idx, constraint_id, 'No action can block or null a value',
+                                        dead=True))
+                continue
+            findings.extend(action_findings)
+
+            for feature, mask in local.items():
+                reachable[feature] = mask if always else reachable[feature] | mask
+
+    # Subsumption between the remaining block-only rules reading raw values
+    movable = movable_rules(plan)
+    candidates = [rule_idx for rule_idx, rule in enumerate(plan.rules)
+                  if movable[rule_idx] and not dead[rule_idx] and rule[0] != INVALID_RULE]
+    cubes = {rule_idx: _blocked_cubes(plan, rule_idx) for rule_idx in candidates}
+    for position, rule_idx in enumerate(candidates):
+        for earlier in candidates[:position]:
+            if all(any(_contains(outer, inner, plan) for outer in cubes[earlier]) for inner in cubes[rule_idx]):
+                dead[rule_idx] = True
+                findings.append(Finding(SUBSUMED, rule_idx, plan.constraint_ids[rule_idx],
+                                        f'Every configuration it blocks is blocked by {plan.constraint_ids[earlier]}',
+                                        dead=True))
+                break
+
+    findings.sort(key=lambda finding: finding.index)
+    return findings
+
+
+def format_findings(findings: List[Finding]) -> List[str]:
+    """
+    Format findings as report lines.
+
+    Returns:
+        List[str]: One line per finding.
+    """
+    return [f"{finding.constraint_id}: {finding.kind}{' (dead)' if finding.dead else ''}: {finding.message}"
+            for finding in findings]
+
+
+def dead_rules(findings: List[Finding]) -> List[int]:
+    """
+    List the indices of the dead rules.
+
+    Args:
+        findings (List[Finding]): The findings of `analyse_constraints`.
+
+    Returns:
+        List[int]: Sorted indices of the rules that never change the classification.
+    """
+    return sorted({finding.index for finding in findings if finding.dead})
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import List, Optional
+
+# Part of every key, to be increased when the format of the cached files changes
+CACHE_VERSION = 3
+
+# Default bound of the total size of the cache
+DEFAULT_MAX_BYTES = 1 << 30
+
+# Files of a cache entry
+COUNTS_FILE = 'counts.json'
+RESULTS_FILE = 'results.pack'
+
+
+def default_cache_dir() -> str:
+    """
+    Directory of the cache when none is given: $CONFIGURATION_CACHE_DIR, or
+    ~/.cache/configuration_generator.
+    """
+    return os.environ.get('CONFIGURATION_CACHE_DIR') or os.path.join(
+        os.path.expanduser('~'), '.cache', 'configuration_generator'
+    )
+
+
+def project_key(features: List[dict], constraints: List[dict]) -> str:
+    """
+    Hash the parts of a project that determine its configurations.
+
+    Features are reduced to their name and domain and constraints lose their description, then
+    the result is serialized with sorted keys, so groups, descriptions and formatting of the
+    project file do not change the key.
+
+    Args:
+        features (List[dict]): List of features, each with a name and a domain.
+        constraints (List[dict]): List of constraints in declared order.
+
+    Returns:
+        str: Hex SHA-256 digest identifying the project content.
+    """
+    normalized = {
+        'version': CACHE_VERSION,
+        'features': [{'name': feature['name'], 'domain': feature['domain']} for feature in features],
+        'constraints': [
+            {field: value for field, value in constraint.items() if field != 'description'}
+            for constraint in constraints
+        ],
+    }
+    data = json.dumps(normalized, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk cache of counts and result files, keyed by project content.
+
+    Every project has a directory named by its `project_key`. The modification time of the
+    directory is its last use; when the total size exceeds `max_bytes`, the least recently used
+    entries are removed. Files are written to a temporary name and renamed, so a concurrent reader
+    never sees a partial file. The directory may be shared, so only data is cached, never objects
+    that run code when loaded; the compiled plan is cheap to build again from the project.
+
+    Attributes:
+        directory (str): Root directory of the cache.
+        max_bytes (int): Bound of the total size of the cached files.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Initialize the cache, creating its directory if needed.
+
+        Args:
+            directory (Optional[str]): Root directory of the cache, `default_cache_dir()` by default.
+            max_bytes (int): Bound of the total size of the cached files.
+        """
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def entry_path(self, key: str, name: str) -> str:
+        """
+        Path of a file of a cache entry, which may not exist.
+        """
+        return os.path.join(self.directory, key, name)
+
+    def lookup(self, key: str, name: str) -> Optional[str]:
+        """
+        Find a cached file and mark its entry as recently used.
+
+        Args:
+            key (str): Key of the project.
+            name (str): Name of the file in the entry.
+
+        Returns:
+            Optional[str]: Path of the file, None if it is not cached.
+        """
+        path = self.entry_path(key, name)
+        if not os.path.exists(path):
+            return None
+        try:
+            os.utime(os.path.join(self.directory, key))
+        except OSError:  # Evicted by another process in the meantime
+            return None
+        return path
+
+    def store(self, key: str, name: str, write) -> str:
+        """
+        Add a file to a cache entry and evict old entries if the cache is too large.
+
+        Args:
+            key (str): Key of the project.
+            name (str): Name of the file in the entry.
+            write: Function called with a temporary path to write the file to.
+
+        Returns:
+            str: Path of the cached file.
+        """
+        entry = os.path.join(self.directory, key)
+        os.makedirs(entry, exist_ok=True)
+        descriptor, temporary_path = tempfile.mkstemp(dir=entry, prefix=f'.{name}.')
+        os.close(descriptor)
+        try:
+            write(temporary_path)
+            os.replace(temporary_path, os.path.join(entry, name))
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+        os.utime(entry)
+        self.evict(keep=key)
+        return os.path.join(entry, name)
+
+    def evict(self, keep: Optional[str] = None):
+        """
+        Remove the least recently used entries until the cache fits in `max_bytes`.
+
+        Args:
+            keep (Optional[str]): Key of an entry never removed, the one being used.
+        """
+        entries = []
+        total = 0
+        for key in os.listdir(self.directory):
+            entry = os.path.join(self.directory, key)
+            try:
+                if not os.path.isdir(entry):
+                    continue
+                size = sum(os.path.getsize(os.path.join(entry, name)) for name in os.listdir(entry))
+                entries.append((os.path.getmtime(entry), key, size))
+            except FileNotFoundError:  # Removed by another process in the meantime
+                continue
+            total += size
+
+        for _, key, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if key != keep:
+                shutil.rmtree(os.path.join(self.directory, key), ignore_errors=True)
+                total -= size
+
+    def load_counts(self, key: str) -> dict:
+        """
+        Load the counts computed for a project.
+
+        Returns:
+            dict: The cached counts by name, empty if none are cached.
+        """
+        path = self.lookup(key, COUNTS_FILE)
+        if path is None:
+            return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def store_counts(self, key: str, counts: dict):
+        """
+        Cache the counts computed for a project, replacing the cached ones.
+        """
+        def write(path: str):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(counts, f, ensure_ascii=False)
+
+        self.store(key, COUNTS_FILE, write)
@@ -1,6 +1,29 @@
 import json
-from itertools import product
-from typing import List, Tuple, Dict
+from itertools import islice, product
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from models.analysis import Finding, analyse_constraints, dead_rules
+from models.cache import RESULTS_FILE, ResultCache, project_key
+from models.counting import ConfigurationCounter
+from models.incremental import IncrementalEvaluator
+from models.ordering import evaluation_order
+from models.packed import PackedResults, write_packed, write_packed_chunks
+from models.parallel import ShardedWalker, measure_speedup
+from models.plan import NULL_VALUE, CompiledPlan
+from models.profiling import ProfileStats, ProfilingEvaluator
+from models.query import restrict_project
+from models.search import BacktrackingSearch
+from models.validation import ConfigurationValidator, ValidationResult
+from models.vectorized import VectorizedEvaluator
+
+ENGINES = {
+    'search': BacktrackingSearch,
+    'vectorized': VectorizedEvaluator,
+    'incremental': IncrementalEvaluator,
+}
+
+# Minimum number of parts `iter_classified_parts` splits the product into, when it has enough combinations
+CLASSIFIED_PARTS = 1000
 
 
 class ConfigurationGenerator:
@@ -11,14 +34,39 @@ class ConfigurationGenerator:
         features (List[dict]): List of features, each with a name, domain, and optional group.
         constraints (List[dict]): List of constraints, each defining rules for valid configurations.
         feature_sequence (List[str]): Ordered list of feature names, defining the sequence for configuration output.
+        plan (CompiledPlan): Features and constraints compiled to integer value codes and bitmasks.
+        stats (Optional[ProfileStats]): Per-constraint statistics of the classifications, in
+            profiling mode only.
     """
 
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, engine: str = 'search', workers: int = 1,
+                 cache: Optional[ResultCache] = None, profile: bool = False, reorder: bool = False,
+                 drop_dead_rules: bool = False):
         """
         Initialize the classifier by loading features and constraints from a JSON file.
 
         Args:
             file_path (str): Path to the JSON configuration file.
+            engine (str): Evaluation engine, one of ENGINES: 'search' (backtracking search),
+                'vectorized' (NumPy batch evaluation, requires numpy) or 'incremental' (NumPy
+                evaluation whose state is updated by the edit methods, requires numpy).
+            workers (int): Number of processes classifying shards of the configuration space;
+                1 classifies in the current process. The workers only pay off with spare CPU
+                cores, see `measure_speedup`.
+            cache (Optional[ResultCache]): On-disk cache of the counts and results,
+                shared by every project with the same features and constraints.
+            profile (bool): Whether to classify in profiling mode, collecting per-constraint
+                statistics in `stats`. The configurations are then evaluated one by one in
+                declared order, whatever the engine. Cannot be combined with `cache`, whose results
+                are decoded without classifying.
+            reorder (bool): Whether the engines evaluating every configuration ('vectorized' and
+                'incremental') evaluate the most selective constraints first, in the order
+                estimated by `models.ordering.evaluation_order`; the blocking constraint reported
+                is still the first one in declared order. The search engine already decides the
+                constraints in the order their features are assigned and is not affected.
+            drop_dead_rules (bool): Whether to stop evaluating the constraints that
+                `analyse_constraints` finds dead: they never block nor null a value, so the
+                results are unchanged.
         """
 
         with open(file_path, 'r', encoding='utf-8') as f:
@@ -30,6 +78,158 @@ class ConfigurationGenerator:
         # Define the sequence of features for consistent configuration output
         self.feature_sequence = [feature['name'] for feature in self.features]
 
+        if engine not in ENGINES:
+            raise ValueError(f'Unknown engine {engine}, expected one of {", ".join(ENGINES)}')
+        if engine == 'incremental' and workers > 1:
+            raise ValueError('The incremental engine keeps its state in one process, it cannot use workers')
+        if profile and workers > 1:
+            raise ValueError('Profiling collects its statistics in one process, it cannot use workers')
+        if profile and cache is not None:
+            raise ValueError('Profiling collects its statistics while classifying, it cannot use cached results')
+        self._profile = profile
+        self.stats: Optional[ProfileStats] = None
+        self._engine_name = engine
+        self._workers = workers
+        self._cache = cache
+        self._reorder = reorder
+        self._drop_dead_rules = drop_dead_rules
+        self._dropped: List[int] = []
+
+        self._engine = None
+        self._compile()
+
+    def _compile(self, first_changed: Optional[int] = None, extended_feature: Optional[int] = None):
+        """
+        Compile the features and constraints and set up the engines for them.
+
+        The incremental engine keeps its state when told what changed; the other engines and the
+        counter are created again.
+
+        Args:
+            first_changed (Optional[int]): Index of the first constraint that changed, if only
+                constraints changed.
+            extended_feature (Optional[int]): Index of the feature whose domain was extended with
+                new values at its end, if only that changed.
+        """
+        # Compile the constraints once, the engines only work with integer value codes
+        self._cache_key = project_key(self.features, self.constraints) if self._cache is not None else None
+        self.plan = CompiledPlan(self.features, self.constraints)
+        if self._drop_dead_rules:
+            dropped = dead_rules(analyse_constraints(self.features, self.constraints, self.plan))
+            # Whether a rule is dead only depends on the rules before it, but also on the domains
+            if extended_feature is not None and dropped != self._dropped:
+                extended_feature = None
+            self._dropped = dropped
+            self.plan.drop_rules(dropped)
+        self.plan.evaluation_order = evaluation_order(self.plan) if self._reorder else None
+
+        if isinstance(self._engine, IncrementalEvaluator) and first_changed is not None:
+            self._engine.update_rules(self.plan, first_changed)
+        elif isinstance(self._engine, IncrementalEvaluator) and extended_feature is not None:
+            self._engine.extend_domain(self.plan, extended_feature)
+        else:
+            self._engine = ENGINES[self._engine_name](self.plan)
+
+        engine_class = ENGINES[self._engine_name]
+        if self._profile:
+            # Statistics start over when the constraints change
+            self.stats = ProfileStats(self.plan.constraint_ids)
+            self._walker = ProfilingEvaluator(self.plan, self.stats)
+        elif self._workers > 1:
+            self._walker = ShardedWalker(engine_class, self.plan, self._workers)
+        else:
+            self._walker = self._engine
+        self._counter = ConfigurationCounter(self.plan)
+
+    def analyse_constraints(self) -> List[Finding]:
+        """
+        Find constraints referencing unknown features or values and constraints that never apply.
+
+        Returns:
+            List[Finding]: The findings of `models.analysis.analyse_constraints`, by constraint
+                in declared order.
+        """
+        return analyse_constraints(self.features, self.constraints)
+
+    def reorder_constraints(self, stats: Optional[ProfileStats] = None):
+        """
+        Evaluate the most selective constraints first, by measured or estimated selectivity per lookup.
+
+        The order only changes how fast the configurations are classified, not the results. It is
+        estimated again from the constraints when they are edited.
+
+        Args:
+            stats (Optional[ProfileStats]): Statistics of a classification of the same
+                constraints in profiling mode, such as the `stats` of a generator created with
+                `profile=True`; the order is estimated from the constraints if None.
+        """
+        measured_ids = None if stats is None else [constraint.constraint_id for constraint in stats.constraints]
+        if measured_ids is not None and measured_ids != self.plan.constraint_ids:
+            raise ValueError('The statistics do not describe the current constraints')
+        self._reorder = True
+        self.plan.evaluation_order = evaluation_order(self.plan, stats)
+
+    def _constraint_index(self, constraint_id: str) -> int:
+        """
+        Find the position of a constraint by its ID.
+        """
+        for idx, constraint in enumerate(self.constraints):
+            if constraint['id'] == constraint_id:
+                return idx
+        raise ValueError(f'Unknown constraint {constraint_id}')
+
+    def add_constraint(self, constraint: dict, index: Optional[int] = None):
+        """
+        Add a constraint and update the classification.
+
+        Args:
+            constraint (dict): The constraint, in the format of the project file.
+            index (Optional[int]): Position of the constraint in declared order, last by default.
+        """
+        index = len(self.constraints) if index is None else min(index, len(self.constraints))
+        self.constraints.insert(index, constraint)
+        self._compile(first_changed=index)
+
+    def remove_constraint(self, constraint_id: str):
+        """
+        Remove a constraint and update the classification.
+
+        Args:
+            constraint_id (str): ID of the constraint.
+        """
+        index = self._constraint_index(constraint_id)
+        del self.constraints[index]
+        self._compile(first_changed=index)
+
+    def update_constraint(self, constraint_id: str, constraint: dict):
+        """
+        Replace a constraint, keeping its position, and update the classification.
+
+        Args:
+            constraint_id (str): ID of the constraint to replace.
+            constraint (dict): The new constraint, in the format of the project file.
+        """
+        index = self._constraint_index(constraint_id)
+        self.constraints[index] = constraint
+        self._compile(first_changed=index)
+
+    def add_domain_value(self, feature_name: str, value: str):
+        """
+        Append a value to the domain of a feature and update the classification.
+
+        Args:
+            feature_name (str): Name of the feature.
+            value (str): The new value.
+        """
+        if feature_name not in self.plan.feature_index:
+            raise ValueError(f'Unknown feature {feature_name}')
+        feature_idx = self.plan.feature_index[feature_name]
+        feature = self.features[feature_idx]
+        # The null value or a repeated value changes how existing configurations are formatted
+        simple = value != NULL_VALUE and value not in feature['domain']
+        feature['domain'] = list(feature['domain']) + [value]
+        self._compile(extended_feature=feature_idx if simple else None)
+
     def list_constraints_descriptions(self) -> List[str]:
         """
         Generate a list of descriptions for all constraints.
@@ -51,96 +251,426 @@ class ConfigurationGenerator:
         """
         return '/'.join(config[_key] for _key in self.feature_sequence)
 
-    def calculate_all_configurations(self) -> List[str]:
+    def _cached_count(self, name: str, compute):
         """
-        Generate all possible configurations without applying constraints.
+        Get a count from the cache, computing and caching it on a miss.
+
+        Args:
+            name (str): Name of the count in the cache entry.
+            compute: Function computing the count.
 
         Returns:
-            List[str]: A list of all possible configurations, formatted as strings.
+            The count.
+        """
+        if self._cache is None:
+            return compute()
+        counts = self._cache.load_counts(self._cache_key)
+        if name not in counts:
+            counts[name] = compute()
+            self._cache.store_counts(self._cache_key, counts)
+        return counts[name]
+
+    def count_all(self) -> int:
+        """
+        Count all possible configurations without enumerating them.
+
+        Returns:
+            int: The number of configurations returned by `calculate_all_configurations`.
+        """
+        return self._cached_count('all', self._count_all)
+
+    def _count_all(self) -> int:
+        """
+        Count the distinct combinations of the feature domains.
+
+        Without '/' in a value every configuration splits back into its shown values, so the
+        distinct configurations are the combinations of the distinct values of every domain.
+        """
+        domains = [labels[:size] for labels, size in zip(self.plan.labels, self.plan.domain_sizes)]
+        if any('/' in label for domain in domains for label in domain):
+            return sum(1 for _ in self.iter_all_configurations())
+
+        count = 1
+        for domain in domains:
+            count *= len(set(domain))
+        return count
+
+    def count_valid(self) -> int:
         """
+        Count the valid configurations without enumerating them.
 
+        Returns:
+            int: The number of configurations returned by `calculate_valid_configurations`.
+        """
+        return self._cached_count('valid', self._counter.count_valid)
+
+    def count_blocked_by(self) -> Dict[str, int]:
+        """
+        Count the blocked configurations of every constraint without enumerating them.
+
+        Returns:
+            Dict[str, int]: Number of blocked configurations attributed to every constraint ID.
+        """
+        return self._cached_count('blocked_by', self._count_blocked_by)
+
+    def _count_blocked_by(self) -> Dict[str, int]:
+        """
+        Count the blocked configurations of every constraint, from the state of the incremental
+        engine when it keeps one; blocked configurations are never deduplicated.
+        """
+        if not isinstance(self._engine, IncrementalEvaluator):
+            return self._counter.count_blocked_by()
+        counts = {constraint_id: 0 for constraint_id in self.plan.constraint_ids}
+        for rule_idx, count in enumerate(self._engine.blocked_counts()):
+            counts[self.plan.constraint_ids[rule_idx]] += count
+        return counts
+
+    def sample_valid(self, n: int, seed: Optional[int] = None) -> List[str]:
+        """
+        Draw valid configurations uniformly at random without enumerating them.
+
+        Args:
+            n (int): Number of configurations to draw, with replacement.
+            seed (Optional[int]): Seed of the random generator, for reproducible draws.
+
+        Returns:
+            List[str]: The drawn configurations, each from the list returned by
+                `calculate_valid_configurations` with the same probability.
+        """
+        return self._counter.sample_valid(n, seed)
+
+    def iter_all_configurations(self) -> Iterator[str]:
+        """
+        Lazily generate all possible configurations without applying constraints.
+
+        Yields:
+            str: Each distinct configuration, formatted as a string, in product order.
+        """
         feature_domains = [feature['domain'] for feature in self.features]
-        all_combinations = list(product(*feature_domains))
+        # Different combinations only format to the same string with ambiguous labels
+        if not self.plan.ambiguous_labels:
+            for combination in product(*feature_domains):
+                yield '/'.join(combination)
+            return
+
+        seen = set()
+        for combination in product(*feature_domains):
+            formatted_config = '/'.join(combination)
+            if formatted_config not in seen:
+                seen.add(formatted_config)
+                yield formatted_config
+
+    def get_valid_configuration(self, k: int) -> str:
+        """
+        Get a valid configuration by its position without enumerating the ones before it.
 
-        all_configurations = list()
-        for combination in all_combinations:
-            config = dict(zip(self.feature_sequence, combination))
-            formatted_config = self._format_configuration(config)
-            if formatted_config not in all_configurations:
-                all_configurations.append(formatted_config)
-        return all_configurations
+        Args:
+            k (int): Zero-based position in the list returned by `calculate_valid_configurations`.
 
-    def calculate_valid_configurations(self) -> Tuple[List[str], List[Tuple[str, str]]]:
+        Returns:
+            str: The k-th valid configuration.
+
+        Raises:
+            IndexError: If there are not more than k valid configurations.
         """
-        Generate all valid configurations by applying constraints and identify blocked configurations.
+        if k < 0:
+            raise IndexError(f'Valid configuration index {k} out of range')
+        for formatted_config in self._counter.iter_valid(k, 1):
+            return formatted_config
+        raise IndexError(f'Valid configuration index {k} out of range')
+
+    def iter_valid_configurations(self, offset: int = 0, limit: Optional[int] = None) -> Iterator[str]:
+        """
+        Lazily generate the valid configurations.
+
+        A page (`offset` or `limit` given) skips ahead using the counts of valid completions of
+        every prefix instead of classifying the configurations before it.
+
+        Args:
+            offset (int): Number of valid configurations to skip.
+            limit (Optional[int]): Maximum number of configurations to generate, all by default.
+
+        Yields:
+            str: Each distinct valid configuration, formatted as a string, in product order.
+        """
+        if offset or limit is not None:
+            yield from self._counter.iter_valid(offset, limit)
+            return
+
+        for _, formatted_config in self.iter_classified_configurations(blocked=False):
+            yield formatted_config
+
+    def _query_plan(self, fixed: Dict[str, str]) -> CompiledPlan:
+        """
+        Compile the project restricted to the configurations showing some fixed values.
+        """
+        features, constraints = restrict_project(self.features, self.constraints, fixed)
+        plan = CompiledPlan(features, constraints)
+        if self._drop_dead_rules:
+            plan.drop_rules(dead_rules(analyse_constraints(features, constraints, plan)))
+        if self._reorder:
+            plan.evaluation_order = evaluation_order(plan)
+        return plan
+
+    def query(self, fixed: Dict[str, str]) -> Iterator[str]:
+        """
+        Lazily generate the valid configurations in which some features have fixed values.
+
+        The fixed values restrict the domains before the search, so only the restricted subspace
+        is classified.
+
+        Args:
+            fixed (Dict[str, str]): Value of every fixed feature, by feature name; the null value
+                selects the configurations in which the feature is not applicable.
+
+        Yields:
+            str: Each distinct valid configuration showing the fixed values, in the order of
+                `iter_valid_configurations`.
+
+        Raises:
+            ValueError: If a fixed feature or value is unknown.
+        """
+        plan = self._query_plan(fixed)
+        engine_class = ENGINES[self._engine_name]
+        walker = ShardedWalker(engine_class, plan, self._workers) if self._workers > 1 else engine_class(plan)
+        if isinstance(walker, BacktrackingSearch) or not plan.repeats_configurations():
+            # The search produces every valid configuration once
+            for _, formatted_config in walker.walk(blocked=False):
+                yield formatted_config
+            return
+
+        seen = set()
+        for _, formatted_config in walker.walk(blocked=False):
+            if formatted_config not in seen:
+                seen.add(formatted_config)
+                yield formatted_config
+
+    def count_query(self, fixed: Dict[str, str]) -> int:
+        """
+        Count the valid configurations in which some features have fixed values without enumerating them.
+
+        Args:
+            fixed (Dict[str, str]): Value of every fixed feature, by feature name, as in `query`.
 
         Returns:
-            Tuple[List[str], List[Tuple[str, str]]]:
-                - A list of valid configurations, formatted as strings.
-                - A list of tuples containing constraint IDs and corresponding blocked configurations.
+            int: The number of configurations generated by `query`.
+        """
+        return ConfigurationCounter(self._query_plan(fixed)).count_valid()
+
+    def validate_batch(self, configurations: Iterable[str]) -> Iterator[ValidationResult]:
+        """
+        Check configurations supplied from outside against the constraints, without enumerating the space.
+
+        Args:
+            configurations (Iterable[str]): Configurations formatted as by `_format_configuration`,
+                such as the lines of a file; a trailing newline is ignored.
+
+        Yields:
+            ValidationResult: The configuration, its status ('valid', 'blocked' or 'invalid') and
+                the ID of the first blocking constraint or the reason the configuration is not
+                one of the project (None if valid), in input order.
+        """
+        yield from ConfigurationValidator(self.plan).validate_batch(configurations)
+
+    def iter_blocked_configurations(self) -> Iterator[Tuple[str, str]]:
+        """
+        Lazily generate the blocked configurations.
+
+        Yields:
+            Tuple[str, str]: The ID of the first blocking constraint and the blocked configuration,
+                in product order.
+        """
+        yield from self._walker.walk(valid=False)
+
+    def iter_classified_configurations(self, valid: bool = True,
+                                       blocked: bool = True) -> Iterator[Tuple[Optional[str], str]]:
         """
+        Lazily classify every combination of feature values in a single pass.
 
-        # Create a dictionary of feature domains
-        features = {feature['name']: feature['domain'] for feature in self.features}
+        Args:
+            valid (bool): Whether to generate the valid configurations.
+            blocked (bool): Whether to generate the blocked configurations.
 
-        # Generate all possible combinations of feature values
-        all_combinations = list(product(*features.values()))
+        Yields:
+            Tuple[Optional[str], str]: The ID of the first blocking constraint (None for a valid
+                configuration) and the configuration, in product order. Valid configurations are
+                generated once, as in `iter_valid_configurations`.
+        """
+        results_path = self._cache.lookup(self._cache_key, RESULTS_FILE) if self._cache is not None else None
+        if results_path is not None:
+            with PackedResults(results_path) as results:
+                yield from results.iter_rows(valid=valid, blocked=blocked)
+            return
+        if isinstance(self._walker, BacktrackingSearch) or not self.plan.repeats_configurations():
+            # The search produces every valid configuration once, and so do the other engines
+            # when every combination gives its own configuration
+            yield from self._walker.walk(valid=valid, blocked=blocked)
+            return
+
+        seen = set()
+        for constraint_id, formatted_config in self._walker.walk(valid=valid, blocked=blocked):
+            if constraint_id is None:
+                if formatted_config in seen:
+                    continue
+                seen.add(formatted_config)
+            yield constraint_id, formatted_config
+
+    def iter_classified_codes(self, valid: bool = True,
+                              blocked: bool = True) -> Iterator[Tuple[Optional[int], Tuple[int, ...]]]:
+        """
+        Lazily classify every combination of feature values in a single pass, as value codes.
 
-        valid_configurations = list()
-        blocked_configurations = list()
+        Args:
+            valid (bool): Whether to generate the valid configurations.
+            blocked (bool): Whether to generate the blocked configurations.
 
-        for combination in all_combinations:
-            config = dict(zip(self.feature_sequence, combination))
-            is_valid = True
+        Yields:
+            Tuple[Optional[int], Tuple[int, ...]]: Index of the first blocking constraint (None for
+                a valid configuration) and the code of every feature value in `plan.labels`, in the
+                order of `iter_classified_configurations`.
+        """
+        rows = self._walker.walk_codes(valid=valid, blocked=blocked)
+        if isinstance(self._walker, BacktrackingSearch) or not self.plan.repeats_configurations():
+            yield from rows
+        else:
+            yield from self._drop_repeats(rows, set())
+
+    def iter_classified_parts(self, valid: bool = True, blocked: bool = True, parts: int = CLASSIFIED_PARTS
+                              ) -> Iterator[Tuple[int, Iterator[Tuple[Optional[int], Tuple[int, ...]]]]]:
+        """
+        Classify every combination as `iter_classified_codes`, in parts split on the leading features.
 
-            constraint = dict()
-            for constraint in self.constraints:
-                if constraint['rule_type'] == 'conditional':
-                    # Check conditions
-                    check_condition = True
-                    for condition in constraint['conditions']:
-                        condition_feature = condition['feature']
-                        condition_value = condition['value']
+        Every part covers a contiguous range of the product order, so the number of combinations
+        classified is known at the end of each part, whether or not its rows were produced.
 
-                        if config[condition_feature] != condition_value:
-                            check_condition = False
-                            break
+        Args:
+            valid (bool): Whether to generate the valid configurations.
+            blocked (bool): Whether to generate the blocked configurations.
+            parts (int): Minimum number of parts, if the leading features have that many combinations.
+
+        Yields:
+            Tuple[int, Iterator[Tuple[Optional[int], Tuple[int, ...]]]]: Number of combinations
+                classified once the part is consumed, and the rows of the part as in
+                `iter_classified_codes`. A part must be consumed before the next one.
+        """
+        domain_sizes = self.plan.domain_sizes
+        depth, count = 0, 1
+        # The workers of a sharded walk already split it, their walk is a single part
+        if not isinstance(self._walker, ShardedWalker):
+            while depth < len(domain_sizes) and count < parts:
+                count *= domain_sizes[depth]
+                depth += 1
+        part_size = 1
+        for size in domain_sizes[depth:]:
+            part_size *= size
+
+        # A configuration repeated across parts is dropped against the earlier parts as well
+        seen = set() if self.plan.repeats_configurations() else None
+        for position, prefix in enumerate(product(*(range(size) for size in domain_sizes[:depth])), 1):
+            if depth:
+                rows = self._walker.walk_codes(valid=valid, blocked=blocked, prefix=prefix)
+            else:
+                rows = self._walker.walk_codes(valid=valid, blocked=blocked)
+            yield position * part_size, rows if seen is None else self._drop_repeats(rows, seen)
+
+    def _drop_repeats(self, rows: Iterator[Tuple[Optional[int], Tuple[int, ...]]],
+                      seen: set) -> Iterator[Tuple[Optional[int], Tuple[int, ...]]]:
+        """
+        Drop the valid configurations of a walk already in `seen`, adding the others to it.
+        """
+        for rule_idx, codes in rows:
+            if rule_idx is None:
+                # Different codes only format to the same configuration with ambiguous labels
+                key = self.plan.format(codes) if self.plan.ambiguous_labels else codes
+                if key in seen:
+                    continue
+                seen.add(key)
+            yield rule_idx, codes
+
+    def export_packed(self, file_path: str, valid: bool = True, blocked: bool = True,
+                      limit: Optional[int] = None) -> int:
+        """
+        Classify every combination once and write the results as a packed binary file.
 
-                    if not check_condition:
-                        continue
+        The file is read back with `models.packed.PackedResults`.
 
-                    for action in constraint['actions']:
-                        action_feature = action['feature']
-                        action_mode = action['mode']
+        Args:
+            file_path (str): Path of the file to write.
+            valid (bool): Whether to write the valid configurations.
+            blocked (bool): Whether to write the blocked configurations.
+            limit (Optional[int]): Maximum number of configurations to write, all by default.
 
-                        if action_mode == 'block':
-                            allowed_values = action['allowed_values']
-                            if config[action_feature] not in allowed_values:
-                                is_valid = False
-                                break
-                        elif action_mode == 'null':
-                            config[action_feature] = 'None'
+        Returns:
+            int: Number of configurations written.
+        """
+        if isinstance(self._walker, (VectorizedEvaluator, IncrementalEvaluator)) and not self.plan.repeats_configurations():
+            # Without duplicates to drop, the chunks of the NumPy engines are written as they are
+            chunks = self._walker.walk_chunks(valid=valid, blocked=blocked)
+            if limit is not None:
+                chunks = self._limit_chunks(chunks, limit)
+            return write_packed_chunks(file_path, self.features, self.constraints, self.plan, chunks)
+
+        rows = self.iter_classified_codes(valid=valid, blocked=blocked)
+        if limit is not None:
+            rows = islice(rows, limit)
+        return write_packed(file_path, self.features, self.constraints, self.plan, rows)
+
+    @staticmethod
+    def _limit_chunks(chunks: Iterator[tuple], limit: int) -> Iterator[tuple]:
+        """
+        Keep the first `limit` rows of a walk of NumPy chunks, stopping the walk after them.
+        """
+        for codes, blocked_by in chunks:
+            if limit <= 0:
+                break
+            yield codes[:limit], blocked_by[:limit]
+            limit -= len(codes)
 
-                    if not is_valid:
-                        break
+    def cache_results(self):
+        """
+        Classify every combination once and store the results file in the cache, if it is missing.
 
-                elif constraint['rule_type'] == 'domain':
-                    # Check domain constraints
-                    domain_feature = constraint['feature']
-                    domain_allowed_values = constraint['allowed_values']
-                    if config[domain_feature] not in domain_allowed_values:
-                        is_valid = False
-                        break
+        Cached results are written once and decoded from then on by `iter_classified_configurations`
+        and `calculate_valid_configurations`. Does nothing without a cache.
+        """
+        if self._cache is not None and self._cache.lookup(self._cache_key, RESULTS_FILE) is None:
+            self._cache.store(self._cache_key, RESULTS_FILE, self.export_packed)
 
-                else:
-                    raise Exception(f'Unknown constraint type {constraint["rule_type"]}')
+    def calculate_all_configurations(self) -> List[str]:
+        """
+        Generate all possible configurations without applying constraints.
 
-            formatted_config = self._format_configuration(config)
+        Returns:
+            List[str]: A list of all possible configurations, formatted as strings.
+        """
+        return list(self.iter_all_configurations())
 
-            if is_valid and formatted_config not in valid_configurations:
-                valid_configurations.append(formatted_config)
+    def calculate_valid_configurations(self) -> Tuple[List[str], List[Tuple[str, str]]]:
+        """
+        Generate all valid configurations by applying constraints and identify blocked configurations.
 
-            if not is_valid and constraint:
-                blocked_configurations.append((constraint['id'], formatted_config))
+        Returns:
+            Tuple[List[str], List[Tuple[str, str]]]:
+                - A list of valid configurations, formatted as strings.
+                - A list of tuples containing constraint IDs and corresponding blocked configurations.
+        """
+        self.cache_results()
 
+        valid_configurations, blocked_configurations = [], []
+        for constraint_id, formatted_config in self.iter_classified_configurations():
+            if constraint_id is None:
+                valid_configurations.append(formatted_config)
+            else:
+                blocked_configurations.append((constraint_id, formatted_config))
         return valid_configurations, blocked_configurations
+
+    def measure_speedup(self) -> Dict[str, float]:
+        """
+        Time the classification of the whole configuration space serially and with the workers.
+
+        Returns:
+            Dict[str, float]: Serial and parallel wall-clock times in seconds and the speedup.
+        """
+        if not isinstance(self._walker, ShardedWalker):
+            raise ValueError('Measuring the speedup requires more than one worker')
+        return measure_speedup(self._engine, self._walker)
@@ -0,0 +1,689 @@
+import random
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from models.merging import MergedCounter
+from models.ordering import feature_order
+from models.plan import BLOCK_ACTION, CONDITIONAL_RULE, DOMAIN_RULE, UNASSIGNED, CompiledPlan
+from models.search import BLOCKED, VALID, BacktrackingSearch, SearchState
+
+# Result of a subtree: (distinct valid configurations, has late-nulled valid configurations, blocked counts by rule)
+SubtreeCount = Tuple[int, bool, Dict[int, int]]
+
+# Key of the blocked counts attributed to the blocker of the node the counts belong to
+CURRENT_BLOCKER = -1
+
+# Edge of the sampling graph: (values changed by the edge, index of the open child node or None,
+# unassigned features of the valid child node or None)
+SamplingEdge = Tuple[Tuple[Tuple[int, int], ...], Optional[int], Optional[Tuple[int, ...]]]
+
+
+class ConfigurationCounter:
+    """
+    Exact counts of valid and blocked configurations by dynamic programming over the search tree.
+
+    The search tree of BacktrackingSearch is explored with memoization: two nodes at the same depth
+    with the same undecided rules, whose values pass the same tests of those rules and are null for
+    the same features they use, have the same subtree counts. Once a blocker is known only the
+    earlier rules matter, and the counts attributed to the blocker itself are stored under
+    CURRENT_BLOCKER, so nodes with different blockers still share their counts. A feature nulled
+    before it is assigned is a collapsed branch: all its values give the same configurations, so
+    it multiplies the blocked counts but not the valid one.
+
+    A feature nulled after it has been assigned (a late null), or ambiguous labels, can make
+    different branches format to the same string. The DP only tells whether there are such valid
+    configurations; they are then counted, paged and sampled by MergedCounter over the shown
+    values, and only listed when a value contains '/'.
+
+    The number of memoized nodes grows with the rules open at each depth, those with some of their
+    features assigned and some not, and doubles with every independent one. Counts and samples do
+    not depend on the order of the features, so they are taken over the features in the order of
+    `models.ordering.feature_order`, which keeps the rules narrow: a project of 60 features with 40
+    rules on random pairs of features counts in well under a second, on random triples in about ten
+    seconds, while rules on more features each can still leave too many open. They keep the sequence
+    order when a rule can raise an error, since the first combination reaching one decides which
+    error is raised, or when a value contains '/'. Paging fixes the values of the sequence order
+    one at a time in the reordered counter, unless a configuration is late-nulled there: a rule
+    then reads a value before another nulls it, and the pages follow the sequence order.
+
+    Attributes:
+        plan (CompiledPlan): The compiled features and constraints.
+    """
+
+    def __init__(self, plan: CompiledPlan, reorder: bool = True):
+        """
+        Initialize the counter.
+
+        Args:
+            plan (CompiledPlan): The compiled features and constraints.
+            reorder (bool): Whether to count and sample over the features reordered by
+                `models.ordering.feature_order`, when the results cannot differ.
+        """
+        self.plan = plan
+        self.search = BacktrackingSearch(plan)
+
+        self._memo: Dict[tuple, SubtreeCount] = {}
+        self._root: SubtreeCount = None
+        # Raw value code every feature is fixed to while counting the configurations first shown
+        # below a prefix (see `_count_fixed`), UNASSIGNED if free, and the end of the fixed features
+        self._fixed: List[int] = [UNASSIGNED] * len(plan.domain_sizes)
+        self._fixed_end = 0
+        self._slashes = any('/' in label for labels in plan.labels for label in labels)
+        # Counter over the reordered features and the position of every feature in it, None when
+        # the sequence order is kept
+        self._reordered: Optional[ConfigurationCounter] = None
+        self._positions: List[int] = []
+        if reorder and not self._slashes and not self.search.raising:
+            order = feature_order(plan)
+            if order != sorted(order):
+                self._reordered = ConfigurationCounter(plan.reordered(order), reorder=False)
+                self._positions = [0] * len(order)
+                for position, feature in enumerate(order):
+                    self._positions[feature] = position
+        self._merged: Optional[MergedCounter] = None
+        self._merged_total: Optional[int] = None
+        self._listed: Optional[List[str]] = None
+
+        # Sampling graph: for every open node with valid configurations, when none can merge, the
+        # cumulative valid counts of its children and the edges to them
+        self._sampling: List[Tuple[List[int], List[SamplingEdge]]] = []
+        self._sampling_nodes: Dict[tuple, int] = {}
+        self._sampling_root: Optional[SamplingEdge] = None
+        self._root_values: Tuple[int, ...] = ()
+
+        # Value tests of every rule: its conditions and `block` actions, or its allowed values, and
+        # the features it nulls, as seen by the memoization key; both sorted by feature
+        self._tests: List[Tuple[Tuple[int, int], ...]] = []
+        for rule in plan.rules:
+            if rule[0] == CONDITIONAL_RULE:
+                tests = list(rule[1]) + [(feature, mask) for feature, mode, mask in rule[2] if mode == BLOCK_ACTION]
+                self._tests.append(tuple(sorted(tests)))
+            elif rule[0] == DOMAIN_RULE:
+                self._tests.append(((rule[1], rule[2]),))
+            else:
+                self._tests.append(())
+        self._nulls = self.search.nulls
+
+        # Number of raw combinations of the features from a depth onwards
+        size = len(plan.domain_sizes)
+        self._suffix_sizes = [1] * (size + 1)
+        for depth in range(size - 1, -1, -1):
+            self._suffix_sizes[depth] = self._suffix_sizes[depth + 1] * plan.domain_sizes[depth]
+
+    def _key(self, state: SearchState) -> tuple:
+        """
+        Memoization key of an open node.
+
+        The undecided rules only see the value of an assigned feature through their tests, and
+        through whether it is null already when they null it, so the values themselves are left out.
+        The features left to assign are in the key with their values, unassigned or nulled ahead,
+        so the tests and nulls of the undecided rules only add the assigned features.
+        """
+        values = state.values
+        depth = state.depth
+        last = len(state.decided) if state.blocker is None else state.blocker
+        undecided = tuple(rule_idx for rule_idx in range(state.pointer, last) if not state.decided[rule_idx])
+        null_codes = self.plan.null_codes
+        passed = []
+        for rule_idx in undecided:
+            for feature, mask in self._tests[rule_idx]:
+                if feature >= depth:
+                    break
+                passed.append(mask >> values[feature] & 1)
+            for feature in self._nulls[rule_idx]:
+                if feature >= depth:
+                    break
+                passed.append(values[feature] == null_codes[feature])
+        # Once blocked nothing below is valid, only the attribution among the undecided rules matters,
+        # and whether reaching the blocker raises its error
+        pending = state.blocker is not None
+        late = state.late and not pending
+        fixed = tuple(self._fixed[depth:self._fixed_end]) if depth < self._fixed_end else None
+        return depth, pending, state.raises(), late, undecided, tuple(passed), tuple(values[depth:]), fixed
+
+    def _free_size(self, state: SearchState) -> int:
+        """
+        Number of distinct completions of a node whose outcome is final.
+
+        A fixed feature has a single value, and a feature nulled ahead is only first shown with
+        its first value.
+        """
+        count = 1
+        fixed = self._fixed
+        for feature in range(state.depth, len(state.values)):
+            if not self.plan.domain_sizes[feature]:
+                return 0
+            if state.values[feature] == UNASSIGNED:
+                if fixed[feature] == UNASSIGNED:
+                    count *= self.plan.domain_sizes[feature]
+            elif fixed[feature] > 0:
+                return 0
+        return count
+
+    def _settled(self, state: SearchState) -> Optional[SubtreeCount]:
+        """
+        Count the subtree of a node whose outcome is final or whose counts are memoized.
+        """
+        status = state.status()
+        if status == BLOCKED:
+            return 0, False, {CURRENT_BLOCKER: self._suffix_sizes[state.depth]}
+        if status == VALID:
+            count = self._free_size(state)
+            return (0, count > 0, {}) if state.late else (count, False, {})
+        return self._memo.get(self._key(state))
+
+    def _count_frame(self, state: SearchState) -> list:
+        """
+        Start counting the children of an open node.
+
+        Returns:
+            list: [memoization key, undo mark, next value code, number of codes, multiplier,
+                blocker of the node, valid count, has late-nulled valid configurations, blocked counts]
+        """
+        domain_size = self.plan.domain_sizes[state.depth]
+        # Collapsed branch: every value of the feature gives the same configurations
+        collapsed = state.values[state.depth] != UNASSIGNED
+        first, codes = 0, 0 if not domain_size else 1 if collapsed else domain_size
+        fixed = self._fixed[state.depth]
+        if fixed != UNASSIGNED:
+            # Only the valid counts of a fixed feature matter, a collapsed one is first shown with its first value
+            first, codes = (0, 1 if not fixed else 0) if collapsed else (fixed, fixed + 1)
+        return [self._key(state), state.mark(), first, codes, domain_size if collapsed else 1, state.blocker, 0, False, {}]
+
+    @staticmethod
+    def _add_child(frame: list, child: SubtreeCount, child_blocker: Optional[int]):
+        """
+        Add the counts of a child to the frame of its parent.
+
+        The counts the child attributes to its own blocker are attributed to that rule, or to the
+        blocker of the parent when it is the same rule.
+        """
+        child_valid, child_late, child_blocked = child
+        frame[6] += child_valid
+        frame[7] = frame[7] or child_late
+        blocked, blocker, multiplier = frame[8], frame[5], frame[4]
+        for rule_idx, count in child_blocked.items():
+            if rule_idx == CURRENT_BLOCKER:
+                rule_idx = child_blocker
+            if rule_idx == blocker:
+                rule_idx = CURRENT_BLOCKER
+            blocked[rule_idx] = blocked.get(rule_idx, 0) + count * multiplier
+
+    def _count(self, state: SearchState) -> SubtreeCount:
+        """
+        Count the configurations of the subtree of the current node, depth first with a stack of frames.
+
+        Args:
+            state (SearchState): The search state, positioned at the node; positioned there again
+                on return.
+
+        Returns:
+            SubtreeCount: The distinct valid configurations not below a late null, whether there
+                are valid configurations below a late null, and the blocked counts by rule.
+        """
+        result = self._settled(state)
+        if result is not None:
+            return result
+
+        stack = [self._count_frame(state)]
+        while True:
+            frame = stack[-1]
+            state.rollback(frame[1])
+            if frame[2] < frame[3]:
+                state.assign(frame[2])
+                frame[2] += 1
+                result = self._settled(state)
+                if result is None:
+                    stack.append(self._count_frame(state))
+                else:
+                    self._add_child(frame, result, state.blocker)
+                continue
+
+            result = frame[6], frame[7], frame[8]
+            self._memo[frame[0]] = result
+            stack.pop()
+            if not stack:
+                return result
+            # The state is still positioned at the finished node, a child of the new top frame
+            self._add_child(stack[-1], result, state.blocker)
+
+    def _new_state(self) -> SearchState:
+        """
+        Create a search state at the root.
+
+        When labels are ambiguous every valid configuration is treated as late-nulled, so that
+        none of them is counted as distinct by the DP.
+        """
+        state = SearchState(self.search)
+        state.late = self.plan.ambiguous_labels
+        return state
+
+    def _count_root(self) -> SubtreeCount:
+        """
+        Count the whole search tree, once.
+        """
+        if self._root is None:
+            state = self._new_state()
+            valid, has_late, blocked = self._count(state)
+            # The root may share its counts with a memoized node, which must stay unchanged
+            blocked = dict(blocked)
+            if CURRENT_BLOCKER in blocked:
+                blocked[state.blocker] = blocked.pop(CURRENT_BLOCKER)
+            self._root = valid, has_late, blocked
+        return self._root
+
+    def _merged_counter(self) -> Optional[MergedCounter]:
+        """
+        Counter of the configurations over the shown values, None when a value contains '/' and
+        configurations of different shown values can format to the same string.
+        """
+        if self._merged is None and not self._slashes:
+            # With ambiguous labels the DP counts assignments, not distinct configurations
+            self._merged = MergedCounter(self.plan, self.search, None if self.plan.ambiguous_labels else self._count)
+        return self._merged
+
+    def _listed_configurations(self) -> List[str]:
+        """
+        List the distinct valid configurations, once, in product order; the last resort when
+        configurations can merge and a value contains '/'.
+        """
+        if self._listed is None:
+            self._listed = [formatted_config for _, formatted_config in self.search.walk(blocked=False)]
+        return self._listed
+
+    def count_valid(self) -> int:
+        """
+        Count the distinct valid configurations.
+
+        Returns:
+            int: The number of configurations returned by `calculate_valid_configurations`.
+        """
+        if self._reordered is not None:
+            return self._reordered.count_valid()
+        valid, has_late, _ = self._count_root()
+        if not has_late:
+            return valid
+        if self._merged_total is None:
+            merged = self._merged_counter()
+            self._merged_total = merged.count_valid() if merged is not None else len(self._listed_configurations())
+        return self._merged_total
+
+    def _completion(self, state: SearchState, index: int) -> str:
+        """
+        Format the completion of a valid node with the given index among its distinct completions.
+
+        The features left unassigned are digits of a mixed-radix number, the last one the fastest.
+        """
+        values = list(state.values)
+        for feature in range(len(values) - 1, state.depth - 1, -1):
+            if values[feature] == UNASSIGNED:
+                index, values[feature] = divmod(index, self.plan.domain_sizes[feature])
+        return self.plan.format(values)
+
+    def _iter_page(self, offset: int) -> Iterator[str]:
+        """
+        Produce the distinct valid configurations after the skipped ones, when none can merge.
+
+        Args:
+            offset (int): Number of valid configurations to skip.
+
+        Yields:
+            str: The valid configurations after the skipped ones, in product order.
+        """
+        domain_sizes = self.plan.domain_sizes
+        state = self._new_state()
+        # Each frame: [next value code, undo mark of the node, number of codes]
+        stack: List[list] = []
+        while True:
+            status = state.status()
+            if status == VALID:
+                count = self._free_size(state)
+                for index in range(offset, count):
+                    yield self._completion(state, index)
+                offset = max(offset - count, 0)
+            elif status != BLOCKED:
+                # The subtree holds exactly `valid` configurations
+                valid, _, _ = self._count(state)
+                if offset >= valid:
+                    offset -= valid
+                else:
+                    collapsed = state.values[state.depth] != UNASSIGNED
+                    size = domain_sizes[state.depth]
+                    stack.append([0, state.mark(), min(size, 1) if collapsed else size])
+
+            # Move on to the next unexplored child
+            while stack:
+                frame = stack[-1]
+                state.rollback(frame[1])
+                if frame[0] < frame[2]:
+                    state.assign(frame[0])
+                    frame[0] += 1
+                    break
+                stack.pop()
+            else:
+                return
+
+    def _count_fixed(self, fixed: List[int]) -> int:
+        """
+        Count the distinct valid configurations whose first combination has the fixed raw values.
+
+        Only exact when no valid configuration is late-nulled: a feature shown null then takes any
+        value, and is first shown with its first one. Nodes below the last fixed feature share
+        their counts with the unrestricted counts.
+
+        Args:
+            fixed (List[int]): Value code of every feature, UNASSIGNED if free.
+
+        Returns:
+            int: The number of configurations.
+        """
+        self._fixed = fixed
+        self._fixed_end = max((feature + 1 for feature, code in enumerate(fixed) if code != UNASSIGNED), default=0)
+        try:
+            valid, _, _ = self._count(self._new_state())
+        finally:
+            self._fixed = [UNASSIGNED] * len(fixed)
+            self._fixed_end = 0
+        return valid
+
+    def _iter_reordered_page(self, offset: int) -> Iterator[str]:
+        """
+        Produce the distinct valid configurations after the skipped ones, in sequence order, with
+        the counts of the reordered counter, when none of its configurations can merge.
+
+        The features are fixed one at a time in sequence order, and every value is skipped with
+        the count of the configurations first shown with it, so the cost grows with the number of
+        features times the page size whatever the rules spanning features far apart.
+
+        Args:
+            offset (int): Number of valid configurations to skip.
+
+        Yields:
+            str: The valid configurations after the skipped ones, in product order.
+        """
+        reordered, positions = self._reordered, self._positions
+        domain_sizes = self.plan.domain_sizes
+        size = len(domain_sizes)
+        fixed = [UNASSIGNED] * size
+        codes: List[int] = []
+        while True:
+            if len(codes) < size:
+                # Descend to the first value of the next feature
+                codes.append(-1)
+            # Move on to the next value of the deepest feature, or back up once it has none left
+            while codes:
+                feature = len(codes) - 1
+                codes[-1] += 1
+                if codes[-1] < domain_sizes[feature]:
+                    fixed[positions[feature]] = codes[-1]
+                    count = reordered._count_fixed(fixed)
+                    if count <= offset:
+                        offset -= count
+                        continue
+                    break
+                fixed[positions[feature]] = UNASSIGNED
+                codes.pop()
+            else:
+                return
+            if len(codes) == size:
+                # The first combination of the configuration, its nulls applied
+                values = list(codes)
+                self.plan.classify(values)
+                yield self.plan.format(values)
+                offset = 0
+
+    def iter_valid(self, offset: int = 0, limit: Optional[int] = None) -> Iterator[str]:
+        """
+        Produce a page of the distinct valid configurations.
+
+        Subtrees before the page are skipped with their counts, so the cost grows with the number
+        of features times the page size. Over reordered features (see the class) the values of the
+        sequence order are fixed one at a time in the reordered counter instead. When configurations can merge the prefixes are skipped
+        with the counts of the configurations first shown below them (see `MergedCounter`).
+
+        Args:
+            offset (int): Number of valid configurations to skip.
+            limit (Optional[int]): Maximum number of configurations to produce, all by default.
+
+        Yields:
+            str: The valid configurations, in the order of `calculate_valid_configurations`.
+        """
+        if offset < 0 or (limit is not None and limit < 0):
+            raise ValueError('The offset and limit must not be negative')
+        if self._reordered is not None and self.plan.domain_sizes and not self._reordered._count_root()[1]:
+            configurations = self._iter_reordered_page(offset)
+            yield from configurations if limit is None else islice(configurations, limit)
+            return
+        _, has_late, _ = self._count_root()
+        merged = self._merged_counter() if has_late else None
+        if not has_late:
+            configurations = self._iter_page(offset)
+        elif merged is not None:
+            configurations = merged.iter_valid(offset)
+        else:
+            configurations = islice(self._listed_configurations(), offset, None)
+        yield from configurations if limit is None else islice(configurations, limit)
+
+    def _sampling_leaf(self, state: SearchState, changes: Tuple[Tuple[int, int], ...]) -> Optional[SamplingEdge]:
+        """
+        Edge to a valid node or to an open node already in the sampling graph, None otherwise.
+        """
+        values = state.values
+        if state.status() == VALID:
+            free_features = tuple(feature for feature in range(state.depth, len(values)) if values[feature] == UNASSIGNED)
+            return changes, None, free_features
+        node = self._sampling_nodes.get(self._key(state))
+        return None if node is None else (changes, node, None)
+
+    def _sampling_edge(self, state: SearchState) -> SamplingEdge:
+        """
+        Build the sampling graph below a node with valid configurations, depth first with a stack of frames.
+
+        Args:
+            state (SearchState): The search state, positioned at the node.
+
+        Returns:
+            SamplingEdge: The edge to the node.
+        """
+        edge = self._sampling_leaf(state, ())
+        if edge is not None:
+            return edge
+
+        domain_sizes = self.plan.domain_sizes
+        values = state.values
+        # Each frame: [memoization key, undo mark, values of the node, next value code, number of
+        # codes, changes of the edge to the node, cumulative valid counts of the children, edges]
+        stack: List[list] = []
+        changes: Tuple[Tuple[int, int], ...] = ()
+        while True:
+            if edge is None:
+                collapsed = values[state.depth] != UNASSIGNED
+                size = domain_sizes[state.depth]
+                stack.append([self._key(state), state.mark(), list(values), 0, min(size, 1) if collapsed else size,
+                              changes, [], []])
+            else:
+                stack[-1][7].append(edge)
+
+            # Move on to the next child with valid configurations, or finish the node
+            edge = None
+            while edge is None:
+                frame = stack[-1]
+                state.rollback(frame[1])
+                if frame[3] < frame[4]:
+                    state.assign(frame[3])
+                    frame[3] += 1
+                    valid, _, _ = self._count(state)
+                    if valid:
+                        frame[6].append(valid + (frame[6][-1] if frame[6] else 0))
+                        changes = tuple((feature, value) for feature, value in enumerate(values)
+                                        if value != frame[2][feature])
+                        edge = self._sampling_leaf(state, changes)
+                        if edge is None:
+                            break
+                    continue
+
+                node = self._sampling_nodes[frame[0]] = len(self._sampling)
+                self._sampling.append((frame[6], frame[7]))
+                stack.pop()
+                edge = frame[5], node, None
+                if not stack:
+                    return edge
+
+    def _clean_configuration(self, values: List[int], edge: SamplingEdge, index: int) -> str:
+        """
+        Get a valid configuration by its index below an edge, when none can merge.
+
+        Follows the sampling graph from the edge, choosing the child containing the index.
+
+        Args:
+            values (List[int]): Values of the node the edge starts from, changed in place.
+            edge (SamplingEdge): The edge.
+            index (int): Zero-based index among the valid configurations below the edge.
+
+        Returns:
+            str: The configuration.
+        """
+        while True:
+            changes, node, free_features = edge
+            for feature, code in changes:
+                values[feature] = code
+            if node is None:
+                break
+            cumulative, edges = self._sampling[node]
+            position = bisect_right(cumulative, index)
+            if position:
+                index -= cumulative[position - 1]
+            edge = edges[position]
+
+        for feature in reversed(free_features):
+            index, values[feature] = divmod(index, self.plan.domain_sizes[feature])
+        return self.plan.format(values)
+
+    def _clean_configurations(self, indices: List[int]) -> List[str]:
+        """
+        Get valid configurations by their sorted indices, when none can merge.
+
+        Follows the sampling graph from the root once for all the indices, splitting them among
+        the children containing them, so the nodes shared by several indices are visited once.
+
+        Args:
+            indices (List[int]): Zero-based indices in ascending order.
+
+        Returns:
+            List[str]: The configurations, in the order of the indices.
+        """
+        domain_sizes = self.plan.domain_sizes
+        configurations: List[str] = []
+        values = list(self._root_values)
+        # Each entry: (edge, first and end position of its indices, count of the configurations
+        # before its subtree), or (None, values to restore once its subtree is done)
+        stack: List[tuple] = [(self._sampling_root, 0, len(indices), 0)]
+        while stack:
+            entry = stack.pop()
+            if entry[0] is None:
+                for feature, code in entry[1]:
+                    values[feature] = code
+                continue
+
+            edge, start, end, before = entry
+            if end - start == 1:
+                # A single index needs no split, it is followed on a copy of the values
+                configurations.append(self._clean_configuration(list(values), edge, indices[start] - before))
+                continue
+
+            changes, node, free_features = edge
+            stack.append((None, [(feature, values[feature]) for feature, _ in changes]))
+            for feature, code in changes:
+                values[feature] = code
+            if node is None:
+                # The unassigned features are digits of a mixed-radix number
+                for position in range(start, end):
+                    index = indices[position] - before
+                    for feature in reversed(free_features):
+                        index, values[feature] = divmod(index, domain_sizes[feature])
+                    configurations.append(self.plan.format(values))
+                for feature in free_features:
+                    values[feature] = UNASSIGNED
+                continue
+
+            cumulative, edges = self._sampling[node]
+            children = []
+            while start < end:
+                child = bisect_right(cumulative, indices[start] - before)
+                child_before = before + (cumulative[child - 1] if child else 0)
+                child_end = bisect_left(indices, before + cumulative[child], start, end)
+                children.append((edges[child], start, child_end, child_before))
+                start = child_end
+            stack.extend(reversed(children))
+        return configurations
+
+    def sample_valid(self, n: int, seed: Optional[int] = None) -> List[str]:
+        """
+        Draw valid configurations uniformly at random, with replacement.
+
+        Every distinct valid configuration is equally likely. The drawn indices are sorted and
+        followed down a graph of the open nodes built once from the counts, in a single descent
+        that visits every node shared by several draws once; when configurations can merge they
+        are followed down the nodes of `MergedCounter` instead.
+
+        Args:
+            n (int): Number of configurations to draw.
+            seed (Optional[int]): Seed of the random generator, for reproducible draws.
+
+        Returns:
+            List[str]: The drawn configurations.
+
+        Raises:
+            ValueError: If n is negative, or n is positive and there is no valid configuration.
+        """
+        if n < 0:
+            raise ValueError('The number of samples must not be negative')
+        if self._reordered is not None:
+            # Without '/' in any value the values of a configuration are its '/'-separated parts
+            positions = self._positions
+            return ['/'.join([parts[position] for position in positions])
+                    for parts in (configuration.split('/') for configuration in self._reordered.sample_valid(n, seed))]
+        _, has_late, _ = self._count_root()
+        total = self.count_valid()
+        if n and not total:
+            raise ValueError('There is no valid configuration to sample')
+
+        if not has_late:
+            configurations = self._clean_configurations
+            if total and self._sampling_root is None:
+                state = self._new_state()
+                self._root_values = tuple(state.values)
+                self._sampling_root = self._sampling_edge(state)
+        elif self._merged_counter() is not None:
+            configurations = self._merged_counter().configurations
+        else:
+            listed = self._listed_configurations()
+
+            def configurations(indices: List[int]) -> List[str]:
+                return [listed[index] for index in indices]
+
+        # The draws are sorted so that one descent serves them all, then put back in draw order
+        rng = random.Random(seed)
+        draws = [rng.randrange(total) for _ in range(n)]
+        order = sorted(range(n), key=draws.__getitem__)
+        samples: List[str] = [''] * n
+        for position, configuration in zip(order, configurations([draws[position] for position in order])):
+            samples[position] = configuration
+        return samples
+
+    def count_blocked_by(self) -> Dict[str, int]:
+        """
+        Count the blocked configurations of every constraint.
+
+        Returns:
+            Dict[str, int]: Number of blocked configurations attributed to every constraint ID, in
+                declared order, as returned by `calculate_valid_configurations`.
+        """
+        if self._reordered is not None:
+            return self._reordered.count_blocked_by()
+        _, _, blocked = self._count_root()
+        counts = {constraint_id: 0 for constraint_id in self.plan.constraint_ids}
+        for rule_idx, count in blocked.items():
+            counts[self.plan.constraint_ids[rule_idx]] += count
+        return counts
@@ -0,0 +1,249 @@
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from models.plan import CompiledPlan
+from models.vectorized import VALID, VectorizedEvaluator
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, VectorizedEvaluator reports it when it is missing
+    np = None
+
+
+class IncrementalEvaluator:
+    """
+    Classification of the configuration space that keeps its evaluation state between edits.
+
+    The state is indexed by product index, as in VectorizedEvaluator: the first blocking rule of
+    every configuration and, for every `null` action, the configurations that reached it. The
+    values a rule sees are the raw values with the hits of the earlier `null` actions applied, so
+    after an edit of the rules from index `j` on, only the configurations reaching rule `j` are
+    evaluated again, starting at rule `j`. A value appended to a domain leaves the existing
+    configurations unchanged: the state is spread to the larger space and only the new
+    configurations are evaluated.
+
+    The state is computed on the first walk.
+
+    Attributes:
+        plan (CompiledPlan): The compiled features and constraints.
+        chunk_size (int): Number of configurations evaluated at once.
+    """
+
+    def __init__(self, plan: CompiledPlan, chunk_size: int = 1 << 16):
+        """
+        Initialize the evaluator.
+
+        Args:
+            plan (CompiledPlan): The compiled features and constraints.
+            chunk_size (int): Number of configurations evaluated at once.
+        """
+        self.chunk_size = chunk_size
+        self._set_plan(plan)
+        self._blocked_by: Optional['np.ndarray'] = None
+        self._null_hits: Dict[Tuple[int, int], 'np.ndarray'] = {}
+
+    def _set_plan(self, plan: CompiledPlan):
+        self.plan = plan
+        self._evaluator = VectorizedEvaluator(plan, self.chunk_size)
+
+    def _apply_hits(self, codes: 'np.ndarray', rows, below: Optional[int] = None):
+        """
+        Apply the recorded `null` actions to decoded rows.
+
+        Args:
+            codes (np.ndarray): Value codes of the rows, rewritten in place.
+            rows: Product indices of the rows, a slice or an index array.
+            below (Optional[int]): Only apply the actions of the rules before this index.
+        """
+        null_codes = self.plan.null_codes
+        for (rule_idx, position), hits in self._null_hits.items():
+            if below is None or rule_idx < below:
+                feature = self.plan.rules[rule_idx][2][position][0]
+                codes[hits[rows], feature] = null_codes[feature]
+
+    def _evaluate_rows(self, rows: Optional['np.ndarray'], start: int):
+        """
+        Evaluate the rules from `start` on for some configurations and record the results.
+
+        Args:
+            rows (Optional[np.ndarray]): Sorted product indices of the configurations reaching
+                rule `start`, all of them if None.
+            start (int): Index of the first rule to evaluate.
+        """
+        evaluator = self._evaluator
+        count = evaluator.total if rows is None else len(rows)
+        try:
+            for chunk_start in range(0, count, self.chunk_size):
+                chunk_stop = min(chunk_start + self.chunk_size, count)
+                if rows is None:
+                    chunk_rows = slice(chunk_start, chunk_stop)
+                    codes = evaluator.decode(chunk_start, chunk_stop)
+                else:
+                    chunk_rows = rows[chunk_start:chunk_stop]
+                    codes = evaluator.decode_indices(chunk_rows)
+                self._apply_hits(codes, chunk_rows, below=start)
+
+                null_hits = {}
+                self._blocked_by[chunk_rows] = evaluator.evaluate(codes, start, null_hits)
+                for key, hits in null_hits.items():
+                    if key not in self._null_hits:
+                        self._null_hits[key] = np.zeros(evaluator.total, dtype=bool)
+                    self._null_hits[key][chunk_rows] = hits
+        except Exception:
+            # A partial update is not a valid state, the next walk evaluates everything again
+            self._blocked_by = None
+            raise
+
+    def _update_rows(self, rows: 'np.ndarray', start: int):
+        """
+        Evaluate some configurations again after an edit, as `_evaluate_rows`.
+
+        An error raised by a rule drops the state instead of failing the edit: as with the other
+        engines, it is raised by the next walk, which evaluates everything again.
+        """
+        try:
+            self._evaluate_rows(rows, start)
+        except Exception:
+            pass
+
+    def _ensure_state(self):
+        """
+        Evaluate the whole configuration space if there is no state yet.
+        """
+        if self._blocked_by is None:
+            self._blocked_by = np.full(self._evaluator.total, VALID, dtype=np.int32)
+            self._null_hits = {}
+            self._evaluate_rows(None, 0)
+
+    def update_rules(self, plan: CompiledPlan, first_changed: int):
+        """
+        Re-evaluate after the rules from `first_changed` on were added, removed or edited.
+
+        Args:
+            plan (CompiledPlan): The plan with the new rules; the features must be unchanged.
+            first_changed (int): Index of the first rule that differs from the current plan.
+        """
+        self._set_plan(plan)
+        if self._blocked_by is None:
+            return
+
+        self._null_hits = {key: hits for key, hits in self._null_hits.items() if key[0] < first_changed}
+        blocked_by = self._blocked_by
+        rows = np.flatnonzero((blocked_by == VALID) | (blocked_by >= first_changed))
+        self._update_rows(rows, first_changed)
+
+    def extend_domain(self, plan: CompiledPlan, feature: int):
+        """
+        Evaluate the configurations added by values appended to the domain of a feature.
+
+        Args:
+            plan (CompiledPlan): The plan with the extended domain; the rules must come from the
+                same constraints and every other feature must be unchanged.
+            feature (int): Index of the extended feature.
+        """
+        old_size = self.plan.domain_sizes[feature]
+        new_size = plan.domain_sizes[feature]
+        self._set_plan(plan)
+        if self._blocked_by is None:
+            return
+
+        prefix_count = 1
+        for size in plan.domain_sizes[:feature]:
+            prefix_count *= size
+        suffix_count = 1
+        for size in plan.domain_sizes[feature + 1:]:
+            suffix_count *= size
+
+        def spread(state: 'np.ndarray', fill) -> 'np.ndarray':
+            # The configurations of every prefix move apart to make room for the new values
+            extended = np.full((prefix_count, new_size, suffix_count), fill, dtype=state.dtype)
+            extended[:, :old_size, :] = state.reshape(prefix_count, old_size, suffix_count)
+            return extended.reshape(-1)
+
+        self._blocked_by = spread(self._blocked_by, VALID)
+        self._null_hits = {key: spread(hits, False) for key, hits in self._null_hits.items()}
+
+        indices = np.arange(self._evaluator.total, dtype=np.int64).reshape(prefix_count, new_size, suffix_count)
+        self._update_rows(indices[:, old_size:, :].reshape(-1), 0)
+
+    def blocked_counts(self) -> List[int]:
+        """
+        Count the configurations blocked by every rule, before deduplication.
+
+        Returns:
+            List[int]: Number of configurations whose first blocking rule is each rule.
+        """
+        self._ensure_state()
+        blocked_by = self._blocked_by
+        return np.bincount(blocked_by[blocked_by != VALID], minlength=len(self.plan.rules)).tolist()
+
+    def walk_chunks(self, valid: bool = True, blocked: bool = True,
+                    prefix: Sequence[int] = ()) -> Iterator[Tuple['np.ndarray', 'np.ndarray']]:
+        """
+        Decode the requested configurations starting with a prefix, a chunk at a time.
+
+        Args:
+            valid (bool): Whether to keep valid configurations.
+            blocked (bool): Whether to keep blocked configurations.
+            prefix (Sequence[int]): Value codes of the first features; only the combinations
+                starting with them are kept.
+
+        Yields:
+            Tuple[np.ndarray, np.ndarray]: Value codes (after `null` actions) of shape (rows,
+                n_features) and first blocking rule, VALID for a valid row, of the rows.
+        """
+        self._ensure_state()
+        start, stop = self._evaluator.prefix_range(prefix)
+        for chunk_start in range(start, stop, self.chunk_size):
+            chunk_stop = min(chunk_start + self.chunk_size, stop)
+            blocked_by = self._blocked_by[chunk_start:chunk_stop]
+            if not blocked:
+                rows = np.flatnonzero(blocked_by == VALID) + chunk_start
+            elif not valid:
+                rows = np.flatnonzero(blocked_by != VALID) + chunk_start
+            else:
+                rows = np.arange(chunk_start, chunk_stop, dtype=np.int64)
+
+            codes = self._evaluator.decode_indices(rows)
+            self._apply_hits(codes, rows)
+            yield codes, self._blocked_by[rows]
+
+    def walk(self, valid: bool = True, blocked: bool = True,
+             prefix: Sequence[int] = ()) -> Iterator[Tuple[Optional[str], str]]:
+        """
+        Classify every combination of feature values, in product order, from the kept state.
+
+        Valid configurations are not deduplicated.
+
+        Args:
+            valid (bool): Whether to produce valid configurations.
+            blocked (bool): Whether to produce blocked configurations.
+            prefix (Sequence[int]): Value codes of the first features; only the combinations
+                starting with them are produced.
+
+        Yields:
+            Tuple[Optional[str], str]: The ID of the first blocking constraint (None for a valid
+                configuration) and the formatted configuration.
+        """
+        evaluator = self._evaluator
+        for selected_codes, selected_blocked_by in self.walk_chunks(valid, blocked, prefix):
+            yield from zip(evaluator.format_statuses(selected_blocked_by), evaluator.format_rows(selected_codes))
+
+    def walk_codes(self, valid: bool = True, blocked: bool = True,
+                   prefix: Sequence[int] = ()) -> Iterator[Tuple[Optional[int], Tuple[int, ...]]]:
+        """
+        Classify every combination of feature values, in product order, as value codes.
+
+        Args:
+            valid (bool): Whether to produce valid configurations.
+            blocked (bool): Whether to produce blocked configurations.
+            prefix (Sequence[int]): Value codes of the first features; only the combinations
+                starting with them are produced.
+
+        Yields:
+            Tuple[Optional[int], Tuple[int, ...]]: Index of the first blocking rule (None for a
+                valid configuration) and the value code of every feature.
+        """
+        evaluator = self._evaluator
+        for selected_codes, selected_blocked_by in self.walk_chunks(valid, blocked, prefix):
+            yield from zip(evaluator.format_statuses(selected_blocked_by, ids=False),
+                           map(tuple, selected_codes.tolist()))
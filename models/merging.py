@@ -0,0 +1,406 @@
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, FrozenSet, Iterator, List, Optional, Sequence, Tuple
+
+from models.plan import BLOCK_ACTION, CONDITIONAL_RULE, DOMAIN_RULE, UNASSIGNED, CompiledPlan
+from models.search import VALID, BacktrackingSearch, SearchState
+
+# Role of a member of a node, relative to the bound of a count: its assignment is before the
+# bound, equal to the start of the bound, or starts with the whole bound
+BEFORE = 0
+TIGHT = 1
+INSIDE = 2
+
+# A member of a node: the search state of one assignment, the assigned features it must still
+# null to show the null value, its role and its memoization key
+Member = Tuple[SearchState, FrozenSet[int], int, tuple]
+
+
+class MergedCounter:
+    """
+    Exact counts of distinct valid configurations when different assignments format to the same string.
+
+    A feature nulled after it has been assigned (a late null) shows the null value whatever its
+    value was, and a value repeated in a domain, or the literal null value, shows the same label
+    for different codes. The distinct configurations are counted by dynamic programming over the
+    shown values instead of the assigned ones: a node fixes the values shown by the features
+    assigned so far and holds the set of search states of every assignment still able to show
+    them. Assigning a feature that may be nulled later keeps one state per value under the null
+    value shown, until the null is applied and the states merge, or a rule reads the value and
+    drops the states it blocks. A node counts the shown completions reachable from any of its
+    states, and two nodes with the same depth and the same set of states, as seen by their
+    undecided rules, have the same count. A node left with a single state whose subtree has no
+    late null counts the valid configurations of that subtree.
+
+    Only the first code of every label is assigned, since the others behave the same. Valid
+    configurations are ordered by the first assignment showing them, in product order: a count
+    with a bound only counts the configurations first shown below the bound, whose assignment
+    starts with it, which the states of earlier assignments showing the same values rule out.
+
+    Attributes:
+        plan (CompiledPlan): The compiled features and constraints.
+    """
+
+    def __init__(self, plan: CompiledPlan, search: BacktrackingSearch,
+                 count_subtree: Optional[Callable[[SearchState], Tuple[int, bool, dict]]] = None):
+        """
+        Initialize the counter.
+
+        Args:
+            plan (CompiledPlan): The compiled features and constraints.
+            search (BacktrackingSearch): The search the states belong to.
+            count_subtree (Optional[Callable[[SearchState], Tuple[int, bool, dict]]]): Counts of the
+                subtree of a search state, as `ConfigurationCounter._count`; only given when labels
+                are not ambiguous, so that the valid count of a subtree without late null is exact.
+        """
+        self.plan = plan
+        self.search = search
+        self._count_subtree = count_subtree
+        self._memo: Dict[tuple, int] = {}
+        # Cumulative counts and children of the nodes visited by sampling
+        self._sampling: Dict[tuple, Tuple[List[int], List[Tuple[int, List[Member]]]]] = {}
+
+        # First code of every label, and the rules nulling every feature
+        self._codes = [
+            tuple(code for code, label in enumerate(labels[:size]) if labels.index(label) == code)
+            for labels, size in zip(plan.labels, plan.domain_sizes)
+        ]
+        self._nullers: List[List[int]] = [[] for _ in plan.domain_sizes]
+        for rule_idx, nulls in enumerate(search.nulls):
+            for feature in nulls:
+                self._nullers[feature].append(rule_idx)
+        # Value tests of every rule: its conditions and `block` actions, or its allowed values
+        self._tests: List[Tuple[Tuple[int, int], ...]] = []
+        for rule in plan.rules:
+            if rule[0] == CONDITIONAL_RULE:
+                self._tests.append(tuple(rule[1]) + tuple((feature, mask) for feature, mode, mask in rule[2]
+                                                          if mode == BLOCK_ACTION))
+            elif rule[0] == DOMAIN_RULE:
+                self._tests.append(((rule[1], rule[2]),))
+            else:
+                self._tests.append(())
+        self._rule_features = [plan.rule_features(rule_idx) for rule_idx in range(len(plan.rules))]
+        self._root = SearchState(search)
+
+    def _member(self, state: SearchState, needs: FrozenSet[int], role: int) -> Member:
+        """
+        Make a member, keyed by its role, the features it must still null, its undecided rules,
+        whether the values they test pass each test, whether the features they use are null
+        already, and the features left to assign.
+
+        The rules only see a value through their masks, and the value of an assigned feature is
+        shown by the node, so values passing the same tests give the same counts.
+        """
+        values = state.values
+        undecided = tuple(rule_idx for rule_idx in range(state.pointer, len(state.decided)) if not state.decided[rule_idx])
+        passed, used = [], set()
+        for rule_idx in undecided:
+            for feature, mask in self._tests[rule_idx]:
+                value = values[feature]
+                passed.append(UNASSIGNED if value == UNASSIGNED else mask >> value & 1)
+            used.update(self._rule_features[rule_idx])
+        null_codes = self.plan.null_codes
+        nulled = tuple(values[feature] == null_codes[feature] for feature in sorted(used))
+        return state, needs, role, (role, needs, undecided, tuple(passed), nulled, tuple(values[state.depth:]))
+
+    def _node_key(self, depth: int, members: List[Member], bound: Sequence[int]) -> tuple:
+        """
+        Memoization key of a node; the rest of the bound matters only while a member is tight.
+        """
+        tight = any(member[2] == TIGHT for member in members)
+        return depth, frozenset(member[3] for member in members), tuple(bound[depth:]) if tight else None
+
+    def _nullable(self, state: SearchState, feature: int) -> bool:
+        """
+        Whether an undecided rule can still null a feature.
+        """
+        return any(rule_idx >= state.pointer and not state.decided[rule_idx] for rule_idx in self._nullers[feature])
+
+    def _branches(self, member: Member, depth: int, bound: Sequence[int]) -> List[Tuple[int, int]]:
+        """
+        List the codes to assign to the next feature of a member, with the role of every child.
+        """
+        state, role = member[0], member[2]
+        if not self.plan.domain_sizes[depth]:
+            return []
+        collapsed = state.values[depth] != UNASSIGNED
+        codes = (0,) if collapsed else self._codes[depth]
+        if role != TIGHT:
+            return [(code, role) for code in codes]
+
+        target = bound[depth]
+        inner = INSIDE if depth + 1 == len(bound) else TIGHT
+        if collapsed:
+            return ([(0, BEFORE)] if target else []) + [(0, inner)]
+        return [(code, BEFORE) for code in codes if code < target] + [(target, inner)]
+
+    def _children(self, depth: int, members: List[Member], bound: Sequence[int]) -> List[Tuple[int, List[Member]]]:
+        """
+        Assign the next feature of every member and group the children by the value it shows.
+
+        Args:
+            depth (int): Depth of the node.
+            members (List[Member]): Members of the node.
+            bound (Sequence[int]): Bound of the count.
+
+        Returns:
+            List[Tuple[int, List[Member]]]: The code of every value shown by the feature, in code
+                order, and the members of the child node, for children counting some configurations.
+        """
+        null_code = self.plan.null_codes[depth]
+        groups: Dict[int, Dict[tuple, Member]] = {}
+        for member in members:
+            state, needs = member[0], member[1]
+            for code, role in self._branches(member, depth, bound):
+                child = state.copy()
+                child.assign(code)
+                if child.blocker is not None:
+                    continue
+                # The late nulls of the path are followed by the features to null instead
+                child.late = False
+
+                # A feature shown with its value must keep it, one shown null must still be nulled
+                child_needs = set(needs)
+                kept = True
+                for feature in range(depth):
+                    if child.values[feature] != state.values[feature]:
+                        if feature not in child_needs:
+                            kept = False
+                            break
+                        child_needs.remove(feature)
+                if not kept or not all(self._nullable(child, feature) for feature in child_needs):
+                    continue
+
+                value = child.values[depth]
+                shown = [(value, frozenset(child_needs))]
+                if value != null_code and self._nullable(child, depth):
+                    shown.append((null_code, frozenset(child_needs | {depth})))
+                for shown_code, shown_needs in shown:
+                    child_member = self._member(child, shown_needs, role)
+                    groups.setdefault(shown_code, {})[child_member[3]] = child_member
+
+        return [
+            (shown_code, list(groups[shown_code].values())) for shown_code in sorted(groups)
+            if any(member[2] != BEFORE for member in groups[shown_code].values())
+        ]
+
+    @staticmethod
+    def _free(members: List[Member]) -> bool:
+        """
+        Whether a node has a single valid member with nothing left to null, whose features left
+        unassigned show any of their values.
+        """
+        return len(members) == 1 and members[0][2] == INSIDE and not members[0][1] and members[0][0].status() == VALID
+
+    def _settled(self, depth: int, members: List[Member]) -> Optional[int]:
+        """
+        Count a node without assigning further features, when possible.
+
+        A leaf counts its configuration unless an earlier assignment shows it too. A single valid
+        member with nothing left to null shows every completion of its features left unassigned,
+        and a single member whose subtree has no late null shows each of its valid configurations.
+        """
+        if depth == len(self.plan.domain_sizes):
+            return 0 if any(member[2] == BEFORE for member in members) else 1
+        if len(members) != 1 or members[0][2] != INSIDE or members[0][1]:
+            return None
+
+        state = members[0][0]
+        if self._free(members):
+            count = 1
+            for feature in range(depth, len(state.values)):
+                if state.values[feature] == UNASSIGNED:
+                    count *= len(self._codes[feature])
+                elif not self.plan.domain_sizes[feature]:
+                    return 0
+            return count
+        if self._count_subtree is not None:
+            valid, has_late, _ = self._count_subtree(state)
+            if not has_late:
+                return valid
+        return None
+
+    def _count(self, depth: int, members: List[Member], bound: Sequence[int]) -> int:
+        """
+        Count the configurations shown below a node, and memoize the counts of the nodes below it.
+
+        Args:
+            depth (int): Depth of the node.
+            members (List[Member]): Members of the node.
+            bound (Sequence[int]): Start of the assignments of the counted configurations.
+
+        Returns:
+            int: The number of distinct valid configurations shown below the node.
+        """
+        memo = self._memo
+        key = self._node_key(depth, members, bound)
+        count = memo.get(key)
+        if count is None:
+            count = self._settled(depth, members)
+        if count is not None:
+            memo[key] = count
+            return count
+
+        # Each frame: [node key, depth, children left, count so far]
+        stack = [[key, depth, self._children(depth, members, bound), 0]]
+        while True:
+            frame = stack[-1]
+            if frame[2]:
+                _, child_members = frame[2].pop()
+                child_depth = frame[1] + 1
+                child_key = self._node_key(child_depth, child_members, bound)
+                count = memo.get(child_key)
+                if count is None:
+                    count = self._settled(child_depth, child_members)
+                    if count is None:
+                        stack.append([child_key, child_depth, self._children(child_depth, child_members, bound), 0])
+                        continue
+                    memo[child_key] = count
+                frame[3] += count
+                continue
+
+            memo[frame[0]] = frame[3]
+            stack.pop()
+            if not stack:
+                return frame[3]
+            stack[-1][3] += frame[3]
+
+    def _root_members(self, role: int) -> List[Member]:
+        """
+        Members of the root node.
+        """
+        return [] if self._root.blocker is not None else [self._member(self._root, frozenset(), role)]
+
+    def count_valid(self) -> int:
+        """
+        Count the distinct valid configurations.
+
+        Returns:
+            int: The number of distinct valid configurations.
+        """
+        return self._count(0, self._root_members(INSIDE), ())
+
+    def _count_first(self, prefix: Sequence[int]) -> int:
+        """
+        Count the valid configurations whose first assignment starts with a prefix.
+        """
+        return self._count(0, self._root_members(TIGHT), prefix)
+
+    def iter_valid(self, offset: int = 0) -> Iterator[str]:
+        """
+        Produce the distinct valid configurations in the order of their first assignment.
+
+        The assignments are followed in product order, and every prefix is skipped with the
+        count of the configurations first shown below it.
+
+        Args:
+            offset (int): Number of valid configurations to skip.
+
+        Yields:
+            str: The valid configurations after the skipped ones.
+        """
+        size = len(self.plan.domain_sizes)
+        if not size:
+            if not offset and self.count_valid():
+                yield self.plan.format([])
+            return
+
+        state = SearchState(self.search)
+        prefix: List[int] = []
+        # Each frame: [codes left to assign to the next feature, undo mark of the node]
+        stack = [[list(self._prefix_codes(state)), state.mark()]]
+        while stack:
+            frame = stack[-1]
+            state.rollback(frame[1])
+            del prefix[len(stack) - 1:]
+            if not frame[0]:
+                stack.pop()
+                continue
+
+            code = frame[0].pop(0)
+            state.assign(code)
+            prefix.append(code)
+            count = 0 if state.blocker is not None else self._count_first(prefix)
+            if count <= offset:
+                offset -= count
+            elif len(prefix) == size:
+                yield self.plan.format(state.values)
+            else:
+                stack.append([list(self._prefix_codes(state)), state.mark()])
+
+    def _prefix_codes(self, state: SearchState) -> Tuple[int, ...]:
+        """
+        Codes of the next feature whose assignments can first show a configuration.
+        """
+        depth = state.depth
+        if state.values[depth] != UNASSIGNED:
+            return (0,) if self.plan.domain_sizes[depth] else ()
+        return self._codes[depth]
+
+    def _sampling_node(self, depth: int, members: List[Member]) -> Tuple[List[int], List[Tuple[int, List[Member]]]]:
+        """
+        Cumulative counts and children of a node, kept for the next draws.
+        """
+        key = self._node_key(depth, members, ())
+        node = self._sampling.get(key)
+        if node is None:
+            children = self._children(depth, members, ())
+            cumulative, total = [], 0
+            for _, child_members in children:
+                total += self._count(depth + 1, child_members, ())
+                cumulative.append(total)
+            node = self._sampling[key] = cumulative, children
+        return node
+
+    def configurations(self, indices: List[int]) -> List[str]:
+        """
+        Get valid configurations by their sorted indices in an order fit for sampling.
+
+        The indices are followed down the nodes once, split among the children containing them,
+        with the counts and children of every node visited kept for the next draws.
+
+        Args:
+            indices (List[int]): Zero-based indices in ascending order, lower than `count_valid()`.
+
+        Returns:
+            List[str]: The configurations, in the order of the indices.
+        """
+        size = len(self.plan.domain_sizes)
+        configurations: List[str] = []
+        shown: List[int] = []
+        # Each entry: depth, members, code shown by the feature before, first and end position of
+        # the indices of the node, and count of the configurations before it
+        stack = [(0, self._root_members(INSIDE), None, 0, len(indices), 0)]
+        while stack:
+            depth, members, shown_code, start, end, before = stack.pop()
+            if depth:
+                del shown[depth - 1:]
+                shown.append(shown_code)
+            if depth == size:
+                configurations.extend([self.plan.format(shown)] * (end - start))
+                continue
+
+            if self._free(members):
+                # The features left unassigned are digits of a mixed-radix number
+                values = members[0][0].values
+                for position in range(start, end):
+                    index = indices[position] - before
+                    tail = list(values[depth:])
+                    for feature in range(size - 1, depth - 1, -1):
+                        if tail[feature - depth] == UNASSIGNED:
+                            codes = self._codes[feature]
+                            index, digit = divmod(index, len(codes))
+                            tail[feature - depth] = codes[digit]
+                    configurations.append(self.plan.format(shown + tail))
+                continue
+
+            cumulative, children = self._sampling_node(depth, members)
+            entries = []
+            while start < end:
+                child = bisect_right(cumulative, indices[start] - before)
+                child_end = bisect_left(indices, before + cumulative[child], start, end)
+                child_code, child_members = children[child]
+                entries.append((depth + 1, child_members, child_code, start, child_end,
+                                before + (cumulative[child - 1] if child else 0)))
+                start = child_end
+            stack.extend(reversed(entries))
+        return configurations
@@ -0,0 +1,186 @@
+from typing import List, Optional, Sequence, Tuple
+
+from models.plan import BLOCK_ACTION, CONDITIONAL_RULE, DOMAIN_RULE, NULL_ACTION, CompiledPlan
+from models.profiling import ProfileStats
+
+
+class EvaluationOrder:
+    """
+    Order in which the rules of a plan are evaluated, with the same results as the declared order.
+
+    A rule is movable when it has no `null` action, raises no error and no earlier rule nulls a
+    feature it reads: it then sees the raw values whatever the order, and only ever blocks.
+    Movable rules are evaluated first, the most selective per unit of cost first, and a rule is
+    skipped once a lower-indexed rule has blocked the configuration. The other rules are then
+    evaluated in declared order, up to the lowest blocking rule found so far, so the reported
+    blocker is still the first blocking rule in declared order and `null` actions apply as
+    declared.
+
+    Attributes:
+        early (Tuple[int, ...]): Movable rules, in evaluation order.
+        pinned (Tuple[int, ...]): The other rules, in declared order.
+    """
+
+    def __init__(self, early: Sequence[int], pinned: Sequence[int]):
+        self.early = tuple(early)
+        self.pinned = tuple(pinned)
+
+    def __repr__(self) -> str:
+        return f'EvaluationOrder(early={self.early}, pinned={self.pinned})'
+
+
+def _fraction(plan: CompiledPlan, feature: int, mask: int) -> float:
+    """
+    Fraction of the domain of a feature whose codes are in a mask.
+    """
+    size = plan.domain_sizes[feature]
+    if not size:
+        return 0.0
+    return bin(mask & ((1 << size) - 1)).count('1') / size
+
+
+def estimate_rule(plan: CompiledPlan, rule_idx: int) -> Tuple[float, float]:
+    """
+    Estimate the cost and selectivity of a rule, assuming independent uniformly distributed values.
+
+    Args:
+        plan (CompiledPlan): The compiled features and constraints.
+        rule_idx (int): Index of the rule.
+
+    Returns:
+        Tuple[float, float]: The number of value lookups of an evaluation and the fraction of the
+            configurations the rule blocks.
+    """
+    rule = plan.rules[rule_idx]
+    if rule[0] == DOMAIN_RULE:
+        return 1.0, 1.0 - _fraction(plan, rule[1], rule[2])
+
+    if rule[0] == CONDITIONAL_RULE:
+        matching = 1.0
+        for feature, mask in rule[1]:
+            matching *= _fraction(plan, feature, mask)
+        passing = 1.0
+        for feature, mode, mask in rule[2]:
+            if mode == BLOCK_ACTION:
+                passing *= _fraction(plan, feature, mask)
+        return float(len(rule[1]) + len(rule[2])), matching * (1.0 - passing)
+
+    return 1.0, 0.0
+
+
+def movable_rules(plan: CompiledPlan) -> List[bool]:
+    """
+    Find the rules that can be evaluated out of declared order.
+
+    Args:
+        plan (CompiledPlan): The compiled features and constraints.
+
+    Returns:
+        List[bool]: For every rule, whether it only blocks, raises no error and reads no feature
+            nulled by an earlier rule.
+    """
+    movable = []
+    nulled = set()
+    for rule in plan.rules:
+        if rule[0] == DOMAIN_RULE:
+            movable.append(rule[1] not in nulled)
+        elif rule[0] == CONDITIONAL_RULE:
+            reads = {feature for feature, _ in rule[1]} | {action[0] for action in rule[2] if action[1] == BLOCK_ACTION}
+            has_nulls = any(action[1] == NULL_ACTION for action in rule[2])
+            movable.append(not has_nulls and rule[3] is None and not reads & nulled)
+            nulled.update(action[0] for action in rule[2] if action[1] == NULL_ACTION)
+        else:
+            movable.append(False)
+    return movable
+
+
+def evaluation_order(plan: CompiledPlan, stats: Optional[ProfileStats] = None) -> EvaluationOrder:
+    """
+    Order the movable rules of a plan by selectivity per unit of cost.
+
+    Args:
+        plan (CompiledPlan): The compiled features and constraints.
+        stats (Optional[ProfileStats]): Measured statistics of the same constraints, from a
+            classification in profiling mode, whose blocked fraction replaces the selectivity
+            estimated by `estimate_rule`; the cost is always the estimated number of lookups.
+
+    Returns:
+        EvaluationOrder: The evaluation order.
+    """
+    movable = movable_rules(plan)
+    # Conditional rules without actions nor error, such as dropped rules, change nothing and are left out
+    skipped = {rule_idx for rule_idx, rule in enumerate(plan.rules)
+               if rule[0] == CONDITIONAL_RULE and not rule[2] and rule[3] is None}
+    scores = []
+    for rule_idx, is_movable in enumerate(movable):
+        if not is_movable or rule_idx in skipped:
+            continue
+        cost, selectivity = estimate_rule(plan, rule_idx)
+        # Only the selectivity is measured: the cost stays in value lookups for every rule, as
+        # timings of single evaluations are too coarse to compare with the estimates
+        if stats is not None:
+            measured = stats.constraints[rule_idx]
+            if measured.evaluated:
+                selectivity = measured.blocked / measured.evaluated
+        scores.append((-selectivity / cost if cost else 0.0, rule_idx))
+
+    early = [rule_idx for _, rule_idx in sorted(scores)]
+    pinned = [rule_idx for rule_idx, is_movable in enumerate(movable) if not is_movable and rule_idx not in skipped]
+    return EvaluationOrder(early, pinned)
+
+
+def feature_order(plan: CompiledPlan) -> List[int]:
+    """
+    Order the features so that the rules reading several features span few positions.
+
+    The counts of a dynamic program over feature assignments are shared between the nodes whose
+    rules still waiting on unassigned features are in the same state, so their number grows with
+    the rules open at each depth: those with some of their features assigned and some not. The
+    features are placed greedily, each time the one leaving the fewest rules open, then closing
+    the most, then the lowest index, which keeps the sequence order when no rule spans features.
+    A feature a rule nulls waits for the other features of that rule, when some feature can be
+    placed without waiting, so the null is known before the feature is assigned and the
+    configurations it hides do not need merging.
+
+    Args:
+        plan (CompiledPlan): The compiled features and constraints.
+
+    Returns:
+        List[int]: Every feature index once, in the order to assign them.
+    """
+    size = len(plan.domain_sizes)
+    # Features of every rule spanning several of them, and the rules of every feature
+    spans = [features for features in map(plan.rule_features, range(len(plan.rules))) if len(features) > 1]
+    rules_of: List[List[int]] = [[] for _ in range(size)]
+    for span_idx, features in enumerate(spans):
+        for feature in features:
+            rules_of[feature].append(span_idx)
+
+    waits: List[set] = [set() for _ in range(size)]
+    for rule in plan.rules:
+        if rule[0] == CONDITIONAL_RULE:
+            nulled = {action[0] for action in rule[2] if action[1] == NULL_ACTION}
+            others = {feature for feature, _ in rule[1]} | {action[0] for action in rule[2]}
+            for feature in nulled:
+                waits[feature].update(others - {feature})
+
+    placed = [0] * len(spans)
+    left = list(range(size))
+    done = set()
+    order = []
+    while left:
+        best = None
+        ready = [feature for feature in left if waits[feature] <= done] or left
+        for feature in ready:
+            opened = sum(1 for span_idx in rules_of[feature] if not placed[span_idx])
+            closed = sum(1 for span_idx in rules_of[feature] if placed[span_idx] == len(spans[span_idx]) - 1)
+            score = (opened - closed, -closed, feature)
+            if best is None or score < best:
+                best = score
+        feature = best[2]
+        left.remove(feature)
+        done.add(feature)
+        order.append(feature)
+        for span_idx in rules_of[feature]:
+            placed[span_idx] += 1
+    return order
@@ -0,0 +1,369 @@
+import json
+import mmap
+import struct
+import sys
+from array import array
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple
+
+from models.plan import CompiledPlan
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, filtering falls back to a loop over the status column
+    np = None
+
+# File signature and format version
+MAGIC = b'CFGPACK2'
+
+# Fixed part of the file: signature, length of the JSON header, number of records
+PREAMBLE = struct.Struct('<8sIQ')
+
+# Number of records buffered before they are written
+WRITE_BATCH = 1 << 16
+
+# Status of a valid record; a blocked record stores the index of the blocking constraint plus one
+VALID_STATUS = 0
+
+
+def _type_code(largest: int) -> str:
+    """
+    Choose the smallest array type code holding every integer up to `largest`.
+    """
+    return 'B' if largest <= 0xFF else 'H' if largest <= 0xFFFF else 'I'
+
+
+def _record_struct(status_type: str, code_type: str, n_features: int) -> Tuple[struct.Struct, int]:
+    """
+    Build the layout of a record: the status, padded to the item size of the codes, then the codes.
+
+    Returns:
+        Tuple[struct.Struct, int]: The record structure, in native byte order without
+            alignment, and the offset of the first code.
+    """
+    code_size = array(code_type).itemsize
+    status_size = array(status_type).itemsize
+    codes_offset = -(-status_size // code_size) * code_size
+    record = struct.Struct(f'={status_type}{codes_offset - status_size}x{n_features}{code_type}')
+    return record, codes_offset
+
+
+def _record_dtype(status_type: str, code_type: str, n_features: int) -> 'np.dtype':
+    """
+    Build the NumPy structured type of a record, with the fields `status` and `codes`.
+    """
+    record, codes_offset = _record_struct(status_type, code_type, n_features)
+    return np.dtype({
+        'names': ['status', 'codes'],
+        'formats': [np.dtype(status_type), (np.dtype(code_type), n_features)],
+        'offsets': [0, codes_offset],
+        'itemsize': record.size,
+    })
+
+
+def _write_header(f: BinaryIO, features: List[dict], constraints: List[dict],
+                  plan: CompiledPlan) -> Tuple[str, str, struct.Struct, int]:
+    """
+    Write the preamble, with no records yet, and the JSON header of a packed result file.
+
+    Returns:
+        Tuple[str, str, struct.Struct, int]: The type codes of the status and of the value codes,
+            the record structure and the size of the header.
+    """
+    status_type = _type_code(len(plan.rules))
+    code_type = _type_code(max([len(labels) - 1 for labels in plan.labels], default=0))
+    record, codes_offset = _record_struct(status_type, code_type, len(features))
+    header = {
+        'features': [
+            {'name': feature['name'], 'domain': feature['domain'], 'labels': list(labels)}
+            for feature, labels in zip(features, plan.labels)
+        ],
+        'constraints': [{'id': constraint['id'], 'description': constraint.get('description', '')}
+                        for constraint in constraints],
+        'status_type': status_type,
+        'type_code': code_type,
+        'byteorder': sys.byteorder,
+        'record_size': record.size,
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    # Pad the header with spaces so that the records are aligned on the item size of the codes
+    header_bytes += b' ' * (-(PREAMBLE.size + len(header_bytes)) % array(code_type).itemsize)
+
+    f.write(PREAMBLE.pack(MAGIC, len(header_bytes), 0))
+    f.write(header_bytes)
+    return status_type, code_type, record, len(header_bytes)
+
+
+def write_packed(file_path: str, features: List[dict], constraints: List[dict], plan: CompiledPlan,
+                 rows: Iterable[Tuple[Optional[int], Tuple[int, ...]]]) -> int:
+    """
+    Write classified configurations as fixed-width records of packed value codes.
+
+    The file starts with PREAMBLE and a JSON header with the features, their value labels by code,
+    the constraints and the record layout. Every record is the status (VALID_STATUS, or the index
+    of the blocking constraint plus one) as an unsigned integer of the header `status_type`,
+    padded to the item size of the codes, then the code of every feature value as unsigned
+    integers of the header `type_code`, in native byte order. The two types are sized
+    separately, so the codes take one byte per feature whenever the domains allow.
+
+    Args:
+        file_path (str): Path of the file to write.
+        features (List[dict]): Features of the project, each with a name and a domain.
+        constraints (List[dict]): Constraints of the project in declared order.
+        plan (CompiledPlan): The compiled features and constraints the codes refer to.
+        rows (Iterable[Tuple[Optional[int], Tuple[int, ...]]]): Index of the blocking constraint
+            (None for a valid configuration) and value codes of every configuration.
+
+    Returns:
+        int: Number of records written.
+    """
+    count = 0
+    with open(file_path, 'wb') as f:
+        _, _, record, header_size = _write_header(f, features, constraints, plan)
+        pack = record.pack
+
+        batch = []
+        for rule_idx, codes in rows:
+            batch.append(pack(VALID_STATUS if rule_idx is None else rule_idx + 1, *codes))
+            count += 1
+            if count % WRITE_BATCH == 0:
+                f.write(b''.join(batch))
+                batch = []
+        f.write(b''.join(batch))
+
+        # The number of records is only known at the end
+        f.seek(0)
+        f.write(PREAMBLE.pack(MAGIC, header_size, count))
+    return count
+
+
+def write_packed_chunks(file_path: str, features: List[dict], constraints: List[dict], plan: CompiledPlan,
+                        chunks: Iterable[Tuple['np.ndarray', 'np.ndarray']]) -> int:
+    """
+    Write classified configurations given as NumPy chunks, in the format of `write_packed`.
+
+    Every chunk is converted to records with array operations and written at once, without
+    going through a Python object per configuration.
+
+    Args:
+        file_path (str): Path of the file to write.
+        features (List[dict]): Features of the project, each with a name and a domain.
+        constraints (List[dict]): Constraints of the project in declared order.
+        plan (CompiledPlan): The compiled features and constraints the codes refer to.
+        chunks (Iterable[Tuple[np.ndarray, np.ndarray]]): Value codes of shape (rows, n_features)
+            and index of the blocking constraint of every row, -1 for a valid configuration.
+
+    Returns:
+        int: Number of records written.
+    """
+    if np is None:
+        raise ImportError('Writing NumPy chunks requires numpy, see requirements-optional.txt')
+
+    count = 0
+    with open(file_path, 'wb') as f:
+        status_type, code_type, _, header_size = _write_header(f, features, constraints, plan)
+        dtype = _record_dtype(status_type, code_type, len(features))
+        for codes, blocked_by in chunks:
+            records = np.zeros(len(codes), dtype=dtype)
+            # A valid row is -1, so every status is the blocking index plus one
+            records['status'] = blocked_by + 1
+            records['codes'] = codes
+            f.write(records.tobytes())
+            count += len(codes)
+
+        # The number of records is only known at the end
+        f.seek(0)
+        f.write(PREAMBLE.pack(MAGIC, header_size, count))
+    return count
+
+
+class PackedResults:
+    """
+    Memory-mapped reader of a file written by `write_packed`.
+
+    Records are read straight from the mapping: `codes` returns a view into the file, and the
+    status column is read with a strided structure, so opening the file costs only parsing the
+    header. Views returned by the reader must be released before `close`.
+
+    Attributes:
+        feature_sequence (List[str]): Ordered list of feature names.
+        labels (List[List[str]]): For every feature, the label of every value code.
+        constraint_ids (List[str]): Constraint IDs in declared order.
+        record_size (int): Number of bytes of a record.
+    """
+
+    def __init__(self, file_path: str):
+        """
+        Open and map a packed result file.
+
+        Args:
+            file_path (str): Path of the file written by `write_packed`.
+
+        Raises:
+            ValueError: If the file is not a packed result file or was written with another byte order.
+        """
+        self._file = open(file_path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f'{file_path} is not a packed result file')
+
+        try:
+            magic, header_size, self._count = PREAMBLE.unpack_from(self._mmap)
+            if magic != MAGIC:
+                raise ValueError(f'{file_path} is not a packed result file')
+            header = json.loads(self._mmap[PREAMBLE.size:PREAMBLE.size + header_size].decode('utf-8'))
+            if header['byteorder'] != sys.byteorder:
+                raise ValueError(f'{file_path} was written with {header["byteorder"]}-endian byte order')
+        except (ValueError, struct.error):
+            self._mmap.close()
+            self._file.close()
+            raise
+
+        self.header = header
+        self.feature_sequence = [feature['name'] for feature in header['features']]
+        self.labels = [feature['labels'] for feature in header['features']]
+        self.constraint_ids = [constraint['id'] for constraint in header['constraints']]
+        self._status_type = header['status_type']
+        self._code_type = header['type_code']
+        self._record, self._codes_offset = _record_struct(self._status_type, self._code_type,
+                                                          len(self.feature_sequence))
+        self.record_size = self._record.size
+        # The status of a record followed by the rest of the record, skipped
+        self._status = struct.Struct(f'={self._status_type}{self.record_size - array(self._status_type).itemsize}x')
+
+        self._start = PREAMBLE.size + header_size
+        self._view = memoryview(self._mmap)[self._start:self._start + self._count * self.record_size]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _index(self, idx: int) -> int:
+        if idx < 0:
+            idx += self._count
+        if not 0 <= idx < self._count:
+            raise IndexError(f'Record index {idx} out of range')
+        return idx
+
+    def codes(self, idx: int) -> memoryview:
+        """
+        Get the value codes of a record without copying them.
+
+        Args:
+            idx (int): Index of the record; negative indexes count from the end.
+
+        Returns:
+            memoryview: The code of every feature value.
+        """
+        start = self._index(idx) * self.record_size
+        return self._view[start + self._codes_offset:start + self.record_size].cast(self._code_type)
+
+    def blocked_by(self, idx: int) -> Optional[str]:
+        """
+        Get the ID of the constraint blocking a record.
+
+        Args:
+            idx (int): Index of the record; negative indexes count from the end.
+
+        Returns:
+            Optional[str]: The ID of the first blocking constraint, None for a valid configuration.
+        """
+        status, = self._status.unpack_from(self._view, self._index(idx) * self.record_size)
+        return None if status == VALID_STATUS else self.constraint_ids[status - 1]
+
+    def __getitem__(self, idx: int) -> Tuple[Optional[str], str]:
+        """
+        Decode a record.
+
+        Args:
+            idx (int): Index of the record; negative indexes count from the end.
+
+        Returns:
+            Tuple[Optional[str], str]: The ID of the first blocking constraint (None for a valid
+                configuration) and the formatted configuration.
+        """
+        labels = self.labels
+        config = '/'.join([labels[feature][code] for feature, code in enumerate(self.codes(idx))])
+        return self.blocked_by(idx), config
+
+    def __iter__(self) -> Iterator[Tuple[Optional[str], str]]:
+        return self.iter_rows()
+
+    def iter_rows(self, valid: bool = True, blocked: bool = True) -> Iterator[Tuple[Optional[str], str]]:
+        """
+        Decode the records in file order, a batch of records at a time.
+
+        Args:
+            valid (bool): Whether to produce the valid configurations.
+            blocked (bool): Whether to produce the blocked configurations.
+
+        Yields:
+            Tuple[Optional[str], str]: The ID of the first blocking constraint (None for a valid
+                configuration) and the formatted configuration.
+        """
+        labels = self.labels
+        constraint_ids = [None] + self.constraint_ids
+        batch_size = WRITE_BATCH * self.record_size
+        for batch_start in range(0, len(self._view), batch_size):
+            for status, *codes in self._record.iter_unpack(self._view[batch_start:batch_start + batch_size]):
+                if valid if status == VALID_STATUS else blocked:
+                    yield constraint_ids[status], '/'.join([labels[feature][code] for feature, code in enumerate(codes)])
+
+    def indices(self, only: str = 'all', constraint_id: Optional[str] = None) -> List[int]:
+        """
+        Find the records matching a filter, with NumPy over the status column when available.
+
+        Args:
+            only (str): Which records to keep: 'valid', 'blocked' or 'all'.
+            constraint_id (Optional[str]): Keep only the records blocked by this constraint.
+
+        Returns:
+            List[int]: Indexes of the matching records, in file order.
+        """
+        # Every test takes a status or the whole status column
+        if constraint_id is not None:
+            wanted = self.constraint_ids.index(constraint_id) + 1
+
+            def matches(status):
+                return status == wanted
+        elif only == 'valid':
+            def matches(status):
+                return status == VALID_STATUS
+        elif only == 'blocked':
+            def matches(status):
+                return status != VALID_STATUS
+        elif only == 'all':
+            return list(range(self._count))
+        else:
+            raise ValueError(f'Unknown filter {only}, expected valid, blocked or all')
+
+        if np is not None:
+            return np.flatnonzero(matches(self.as_array()['status'])).tolist()
+        return [idx for idx, (status,) in enumerate(self._status.iter_unpack(self._view)) if matches(status)]
+
+    def as_array(self) -> 'np.ndarray':
+        """
+        View the records as a NumPy array without copying them.
+
+        Returns:
+            np.ndarray: Read-only structured array of one item per record, with the fields
+                `status` and `codes` (the code of every feature value).
+        """
+        if np is None:
+            raise ImportError('Viewing the records as an array requires numpy, see requirements-optional.txt')
+        dtype = _record_dtype(self._status_type, self._code_type, len(self.feature_sequence))
+        return np.frombuffer(self._view, dtype=dtype, count=self._count)
+
+    def close(self):
+        """
+        Unmap and close the file.
+        """
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self) -> 'PackedResults':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
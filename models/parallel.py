@@ -0,0 +1,324 @@
+import multiprocessing
+import queue
+import time
+from array import array
+from collections import deque
+from itertools import product, repeat
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from models.plan import CompiledPlan
+from models.search import BacktrackingSearch
+from models.vectorized import VALID
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, only the engines with `walk_chunks` send NumPy chunks
+    np = None
+
+# Number of shards per worker, so that uneven shards still keep every worker busy
+SHARDS_PER_WORKER = 8
+
+# Number of shards classified at the same time per worker; later shards wait for a free slot
+SHARDS_IN_FLIGHT_PER_WORKER = 2
+
+# Number of rows sent back to the parent process at once
+CHUNK_SIZE = 4096
+
+# Number of chunks a shard can send ahead of the parent before its worker waits
+CHUNKS_PER_SLOT = 4
+
+# Seconds the parent waits for rows of a shard before checking that the workers are still running
+POLL_INTERVAL = 1.0
+
+
+def _run_worker(engine_class: type, plan: CompiledPlan, tasks: multiprocessing.SimpleQueue,
+                slots: List[multiprocessing.Queue]):
+    """
+    Create the engine once and classify the shards of the task queue until it yields None.
+    """
+    engine = engine_class(plan)
+    for task in iter(tasks.get, None):
+        _walk_shard(engine, slots, task)
+
+
+def _walk_shard(engine, slots: List[multiprocessing.Queue], task: Tuple[Tuple[int, ...], bool, bool, bool, int]):
+    """
+    Classify the combinations of one shard in a worker process and stream them to the parent as value codes.
+
+    Every chunk is sent as two flat arrays, the first blocking rule of every row (-1 for a valid
+    row) and the value codes of the rows one after the other, which pickle to a fraction of the
+    size of the rows themselves. The engines with `walk_chunks` send their NumPy chunks as they
+    are, their repeated rows dropped by `_drop_repeated_rows`. The chunks go through the queue of
+    the slot of the shard, followed by None, or by the exception raised by the engine.
+
+    Args:
+        engine: Engine of the worker process.
+        slots (List[multiprocessing.Queue]): Queues of the shard slots.
+        task (Tuple[Tuple[int, ...], bool, bool, bool, int]): Prefix of the shard, the `valid` and
+            `blocked` arguments of the walk, whether valid rows repeating the value codes of an
+            earlier row of the shard are dropped, and the slot of the shard.
+    """
+    prefix, valid, blocked, dedupe, slot = task
+    slot_queue = slots[slot]
+    try:
+        strides = _code_strides(engine.plan) if dedupe else None
+        if hasattr(engine, 'walk_chunks') and (not dedupe or strides is not None):
+            chunks = engine.walk_chunks(valid=valid, blocked=blocked, prefix=prefix)
+            if dedupe:
+                chunks = _drop_repeated_rows(chunks, strides)
+            for codes, blocked_by in chunks:
+                if len(blocked_by):
+                    slot_queue.put((blocked_by, codes))
+        else:
+            typecode = 'b' if max(map(len, engine.plan.labels), default=0) <= 127 else 'i'
+            statuses, codes = array('i'), array(typecode)
+            seen = set()
+            for blocked_by, values in engine.walk_codes(valid=valid, blocked=blocked, prefix=prefix):
+                if blocked_by is None:
+                    if dedupe:
+                        if values in seen:
+                            continue
+                        seen.add(values)
+                    blocked_by = -1
+                statuses.append(blocked_by)
+                codes.extend(values)
+                if len(statuses) == CHUNK_SIZE:
+                    slot_queue.put((statuses, codes))
+                    statuses, codes = array('i'), array(typecode)
+            if statuses:
+                slot_queue.put((statuses, codes))
+    except Exception as error:
+        slot_queue.put(error)
+        return
+    slot_queue.put(None)
+
+
+def _code_strides(plan: CompiledPlan) -> Optional['np.ndarray']:
+    """
+    Compute the strides numbering every combination of value codes, null codes included, with one int64.
+
+    Returns:
+        Optional[np.ndarray]: Stride of every feature, or None if the combinations overflow an int64.
+    """
+    strides, size = [], 1
+    for labels in reversed(plan.labels):
+        strides.append(size)
+        size *= len(labels)
+    if size >= 2 ** 63:
+        return None
+    return np.array(strides[::-1], dtype=np.int64)
+
+
+def _drop_repeated_rows(chunks: Iterator[Tuple['np.ndarray', 'np.ndarray']],
+                        strides: 'np.ndarray') -> Iterator[Tuple['np.ndarray', 'np.ndarray']]:
+    """
+    Drop the valid rows of NumPy chunks repeating the value codes of an earlier valid row.
+
+    Every valid row is numbered by its value codes; a chunk keeps the first row of every number
+    not seen in the earlier chunks, whose numbers are kept sorted.
+    """
+    seen = np.empty(0, dtype=np.int64)
+    for codes, blocked_by in chunks:
+        valid_rows = np.flatnonzero(blocked_by == VALID)
+        numbers, first = np.unique(codes[valid_rows].astype(np.int64) @ strides, return_index=True)
+        new = ~np.isin(numbers, seen, assume_unique=True)
+        seen = np.union1d(seen, numbers)
+        keep = blocked_by != VALID
+        keep[valid_rows[first[new]]] = True
+        yield codes[keep], blocked_by[keep]
+
+
+class ShardedWalker:
+    """
+    Multi-process classification of the configuration space with the same output as one engine.
+
+    The product space is split into shards by the value codes of the first features: every
+    prefix covers a contiguous range of the product order, so the shards are classified by
+    worker processes and merged back in prefix order, which is the order of the serial walk.
+
+    Attributes:
+        plan (CompiledPlan): The compiled features and constraints.
+        workers (int): Number of worker processes.
+        prefix_depth (int): Number of leading features the shards are split on.
+    """
+
+    def __init__(self, engine_class: type, plan: CompiledPlan, workers: int):
+        """
+        Initialize the walker.
+
+        Args:
+            engine_class (type): Engine run by every worker, one of the classifier ENGINES.
+            plan (CompiledPlan): The compiled features and constraints, sent once to every worker.
+            workers (int): Number of worker processes.
+        """
+        if workers < 1:
+            raise ValueError(f'The number of workers must be at least 1, got {workers}')
+
+        self.plan = plan
+        self.workers = workers
+        self._initargs = (engine_class, plan)
+        self._formatter = None
+        # The search already produces every valid configuration once, the other engines only
+        # repeat configurations when the rules null values or the labels are ambiguous
+        self._dedupe = plan.repeats_configurations() and not issubclass(engine_class, BacktrackingSearch)
+
+        # Split on as few features as possible while giving every worker several shards
+        domain_sizes = self.plan.domain_sizes
+        self.prefix_depth, shards = 0, 1
+        while self.prefix_depth < len(domain_sizes) and shards < workers * SHARDS_PER_WORKER:
+            shards *= domain_sizes[self.prefix_depth]
+            self.prefix_depth += 1
+
+    def shards(self) -> Iterator[Tuple[int, ...]]:
+        """
+        Produce the shard prefixes in product order.
+
+        Yields:
+            Tuple[int, ...]: Value codes of the first `prefix_depth` features.
+        """
+        yield from product(*(range(size) for size in self.plan.domain_sizes[:self.prefix_depth]))
+
+    def walk(self, valid: bool = True, blocked: bool = True) -> Iterator[Tuple[Optional[str], str]]:
+        """
+        Classify every combination of feature values, in product order.
+
+        The workers send value codes, formatted here. Valid combinations repeating the value
+        codes of an earlier one of their shard are produced once; the other repetitions are left
+        to the caller, as with a single engine.
+
+        Args:
+            valid (bool): Whether to produce valid configurations.
+            blocked (bool): Whether to produce blocked configurations.
+
+        Yields:
+            Tuple[Optional[str], str]: The ID of the first blocking constraint (None for a valid
+                configuration) and the formatted configuration.
+        """
+        constraint_ids = list(self.plan.constraint_ids) + [None]
+        for statuses, codes in self._merge(valid, blocked):
+            if isinstance(codes, array):
+                formatted = map(self.plan.format, self._rows(statuses, codes))
+            else:
+                # NumPy chunks are formatted a column group at a time, as by their engine
+                if self._formatter is None:
+                    self._formatter = self._initargs[0](self.plan)
+                formatted = self._formatter.format_rows(codes)
+            yield from zip(map(constraint_ids.__getitem__, statuses), formatted)
+
+    def walk_codes(self, valid: bool = True, blocked: bool = True) -> Iterator[Tuple[Optional[int], Tuple[int, ...]]]:
+        """
+        Classify every combination of feature values, in product order, as value codes.
+
+        Args:
+            valid (bool): Whether to produce valid configurations.
+            blocked (bool): Whether to produce blocked configurations.
+
+        Yields:
+            Tuple[Optional[int], Tuple[int, ...]]: Index of the first blocking rule (None for a
+                valid configuration) and the value code of every feature.
+        """
+        rule_indexes = list(range(len(self.plan.rules))) + [None]
+        for statuses, codes in self._merge(valid, blocked):
+            rows = self._rows(statuses, codes) if isinstance(codes, array) else map(tuple, codes.tolist())
+            yield from zip(map(rule_indexes.__getitem__, statuses), rows)
+
+    def _rows(self, statuses: List[int], codes: array) -> Iterator[Tuple[int, ...]]:
+        """
+        Regroup the flat value codes of a chunk into the value codes of every row.
+        """
+        n_features = len(self.plan.domain_sizes)
+        return zip(*[iter(codes)] * n_features) if n_features else repeat((), len(statuses))
+
+    def _merge(self, valid: bool, blocked: bool) -> Iterator[Tuple[List[int], object]]:
+        """
+        Classify every shard in the worker processes and merge the chunks of the shards in order.
+
+        At most SHARDS_IN_FLIGHT_PER_WORKER shards per worker are submitted at a time, each with
+        its own bounded queue, so the rows held by the parent and the queues stay bounded however
+        large the shards are. A worker that exits before the end raises a RuntimeError instead of
+        leaving the parent waiting for its rows.
+
+        Yields:
+            Tuple[List[int], object]: For every chunk, the first blocking rule of every row, -1
+                for a valid row, and the value codes of the rows, flat in an array or in a NumPy
+                array of shape (rows, n_features).
+        """
+        in_flight = self.workers * SHARDS_IN_FLIGHT_PER_WORKER
+        slots = [multiprocessing.Queue(CHUNKS_PER_SLOT) for _ in range(in_flight)]
+        tasks = multiprocessing.SimpleQueue()
+        processes = [multiprocessing.Process(target=_run_worker, args=self._initargs + (tasks, slots), daemon=True)
+                     for _ in range(self.workers)]
+        for process in processes:
+            process.start()
+
+        shards = ((prefix, valid, blocked, self._dedupe) for prefix in self.shards())
+        completed = False
+        try:
+            # Shards are submitted in order, so the shard being merged is always running or done
+            pending = deque()
+            for slot, shard in zip(range(in_flight), shards):
+                tasks.put(shard + (slot,))
+                pending.append(slot)
+
+            while pending:
+                slot = pending.popleft()
+                while True:
+                    try:
+                        chunk = slots[slot].get(timeout=POLL_INTERVAL)
+                    except queue.Empty:
+                        self._check_workers(processes)
+                        continue
+                    if chunk is None:
+                        break
+                    if isinstance(chunk, Exception):
+                        raise chunk
+                    statuses, codes = chunk
+                    yield statuses.tolist(), codes
+
+                shard = next(shards, None)
+                if shard is not None:
+                    tasks.put(shard + (slot,))
+                    pending.append(slot)
+            completed = True
+        finally:
+            if completed:
+                for _ in processes:
+                    tasks.put(None)
+            else:
+                # Stopped early by the caller or by an error: the running shards are abandoned
+                for process in processes:
+                    process.terminate()
+            for process in processes:
+                process.join()
+
+    @staticmethod
+    def _check_workers(processes: List[multiprocessing.Process]):
+        """
+        Raise a RuntimeError if a worker process exited, as it would never send the rest of its rows.
+        """
+        for process in processes:
+            if not process.is_alive():
+                raise RuntimeError(f'Worker process {process.pid} exited with code {process.exitcode}')
+
+
+def measure_speedup(serial_engine, sharded_walker: ShardedWalker) -> Dict[str, float]:
+    """
+    Time a full classification with a single engine and with the sharded walker.
+
+    Args:
+        serial_engine: Engine used by the serial path.
+        sharded_walker (ShardedWalker): Walker used by the multi-process path.
+
+    Returns:
+        Dict[str, float]: Serial and parallel wall-clock times in seconds and the speedup.
+    """
+    timings = {}
+    for name, engine in (('serial', serial_engine), ('parallel', sharded_walker)):
+        start = time.perf_counter()
+        seen = set()
+        for constraint_id, formatted_config in engine.walk():
+            if constraint_id is None:
+                seen.add(formatted_config)
+        timings[name] = time.perf_counter() - start
+    timings['speedup'] = timings['serial'] / timings['parallel'] if timings['parallel'] else float('inf')
+    return timings
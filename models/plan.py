@@ -0,0 +1,337 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Marker for a feature that has no value assigned yet
+UNASSIGNED = -1
+
+# Compiled rule kinds
+DOMAIN_RULE = 0
+CONDITIONAL_RULE = 1
+INVALID_RULE = 2
+
+# Compiled action modes
+BLOCK_ACTION = 0
+NULL_ACTION = 1
+
+# Value written by `null` actions
+NULL_VALUE = 'None'
+
+
+def _mask(labels: Sequence[str], values) -> int:
+    """
+    Build a bitmask of the value codes whose label is one of `values`.
+
+    Args:
+        labels (Sequence[str]): Labels of a feature, indexed by value code.
+        values: A container of accepted labels.
+
+    Returns:
+        int: Bitmask with bit `code` set for every accepted code.
+    """
+    mask = 0
+    for code, label in enumerate(labels):
+        if label in values:
+            mask |= 1 << code
+    return mask
+
+
+class CompiledPlan:
+    """
+    Integer-indexed form of features and constraints used by the evaluation engines.
+
+    Every feature is interned to its position in the feature sequence and every domain value to
+    its position in the domain (its code). The value written by `null` actions gets its own code
+    when the domain does not already contain it. Conditions and allowed values are compiled to
+    bitmasks over codes, so a configuration is a list of ints and checking a value is a shift.
+
+    Attributes:
+        feature_sequence (List[str]): Ordered list of feature names.
+        labels (List[Tuple[str, ...]]): For every feature, the label of every code, including the null code.
+        domain_sizes (List[int]): Number of domain values of every feature; codes above are never enumerated.
+        null_codes (List[int]): Code of the `null` value of every feature.
+        constraint_ids (List[str]): Constraint IDs in declared order.
+        rules (List[tuple]): Compiled constraints in declared order.
+        ambiguous_labels (bool): True when different value codes can format to the same string: a domain
+            with repeated values, a domain containing the null value or a value containing '/'.
+        evaluation_order (Optional[EvaluationOrder]): Order in which the per-configuration engines
+            evaluate the rules (see `models.ordering`), the declared order if None.
+    """
+
+    def __init__(self, features: List[dict], constraints: List[dict]):
+        """
+        Compile features and constraints.
+
+        Domain constraints on an unknown feature, and constraints with an unknown rule type or a
+        missing field outside their conditions and actions, are compiled to invalid rules which
+        raise the corresponding error when they are evaluated. The unknown features and missing
+        fields of the conditions and actions of a conditional constraint only raise once a
+        configuration reaches them, see `_compile_rule`.
+
+        Args:
+            features (List[dict]): List of features, each with a name and a domain.
+            constraints (List[dict]): List of constraints in declared order.
+        """
+        self.feature_sequence = [feature['name'] for feature in features]
+        self.feature_index: Dict[str, int] = {}
+        for idx, name in enumerate(self.feature_sequence):
+            if name in self.feature_index:
+                raise ValueError(f'Duplicate feature name {name}')
+            self.feature_index[name] = idx
+
+        self.labels: List[Tuple[str, ...]] = []
+        self.domain_sizes: List[int] = []
+        self.null_codes: List[int] = []
+        for feature in features:
+            domain = tuple(feature['domain'])
+            if NULL_VALUE in domain:
+                labels, null_code = domain, domain.index(NULL_VALUE)
+            else:
+                labels, null_code = domain + (NULL_VALUE,), len(domain)
+            self.labels.append(labels)
+            self.domain_sizes.append(len(domain))
+            self.null_codes.append(null_code)
+
+        self.ambiguous_labels = any(
+            len(set(labels)) < len(labels) or NULL_VALUE in labels[:size] or any('/' in label for label in labels)
+            for labels, size in zip(self.labels, self.domain_sizes)
+        )
+
+        self.constraint_ids = [constraint['id'] for constraint in constraints]
+        self.rules = [self._compile_rule(constraint) for constraint in constraints]
+        self.evaluation_order = None
+
+    def _compile_rule(self, constraint: dict) -> tuple:
+        """
+        Compile a single constraint.
+
+        A condition or action referencing an unknown feature, or missing a field, only raises its
+        error when a configuration reaches it: the conditions before it match and the actions
+        before it do not block. The conditional rule then stops at it and keeps the error. A
+        `null` action on an unknown feature changes no shown value and is left out.
+
+        Returns:
+            tuple: One of
+                - (DOMAIN_RULE, feature, allowed mask)
+                - (CONDITIONAL_RULE, ((feature, value mask), ...), ((feature, mode, allowed mask), ...),
+                  error raised once the actions pass or None)
+                - (INVALID_RULE, exception)
+        """
+        try:
+            if constraint['rule_type'] == 'conditional':
+                conditions = []
+                for condition in constraint['conditions']:
+                    try:
+                        name, value = condition['feature'], condition['value']
+                        feature = self.feature_index[name]
+                    except KeyError as error:
+                        return CONDITIONAL_RULE, tuple(conditions), (), error
+                    conditions.append((feature, _mask(self.labels[feature], (value,))))
+
+                actions = []
+                try:
+                    for action in constraint['actions']:
+                        name = action['feature']
+                        if action['mode'] == 'block':
+                            allowed_values = action['allowed_values']
+                            feature = self.feature_index[name]
+                            actions.append((feature, BLOCK_ACTION, _mask(self.labels[feature], allowed_values)))
+                        elif action['mode'] == 'null' and name in self.feature_index:
+                            actions.append((self.feature_index[name], NULL_ACTION, 0))
+                except KeyError as error:
+                    return CONDITIONAL_RULE, tuple(conditions), tuple(actions), error
+                return CONDITIONAL_RULE, tuple(conditions), tuple(actions), None
+
+            elif constraint['rule_type'] == 'domain':
+                feature = self.feature_index[constraint['feature']]
+                return DOMAIN_RULE, feature, _mask(self.labels[feature], constraint['allowed_values'])
+
+            else:
+                return INVALID_RULE, Exception(f'Unknown constraint type {constraint["rule_type"]}')
+
+        except KeyError as error:
+            return INVALID_RULE, error
+
+    def rule_features(self, rule_idx: int) -> Tuple[int, ...]:
+        """
+        List the features a rule reads or writes.
+
+        Args:
+            rule_idx (int): Index of the rule.
+
+        Returns:
+            Tuple[int, ...]: Sorted indexes of the features used by the rule.
+        """
+        rule = self.rules[rule_idx]
+        if rule[0] == CONDITIONAL_RULE:
+            features = {feature for feature, _ in rule[1]} | {action[0] for action in rule[2]}
+        elif rule[0] == DOMAIN_RULE:
+            features = {rule[1]}
+        else:
+            features = set()
+        return tuple(sorted(features))
+
+    def repeats_configurations(self) -> bool:
+        """
+        Check whether different combinations can give the same configuration.
+
+        Without `null` actions every combination keeps its own value codes, and without ambiguous
+        labels different codes format differently, so a walk needs no deduplication.
+
+        Returns:
+            bool: True if the rules have a `null` action or the labels are ambiguous.
+        """
+        return self.ambiguous_labels or any(
+            rule[0] == CONDITIONAL_RULE and any(action[1] == NULL_ACTION for action in rule[2]) for rule in self.rules
+        )
+
+    def reordered(self, order: Sequence[int]) -> 'CompiledPlan':
+        """
+        Copy the plan with its features in another order, the rules reading the same features.
+
+        Every combination is classified as by this plan, its value codes in the new order.
+
+        Args:
+            order (Sequence[int]): Every feature index once, in the new order.
+
+        Returns:
+            CompiledPlan: The reordered plan, evaluating the rules in declared order.
+        """
+        position = {feature: idx for idx, feature in enumerate(order)}
+        plan = CompiledPlan.__new__(CompiledPlan)
+        plan.feature_sequence = [self.feature_sequence[feature] for feature in order]
+        plan.feature_index = {name: idx for idx, name in enumerate(plan.feature_sequence)}
+        plan.labels = [self.labels[feature] for feature in order]
+        plan.domain_sizes = [self.domain_sizes[feature] for feature in order]
+        plan.null_codes = [self.null_codes[feature] for feature in order]
+        plan.ambiguous_labels = self.ambiguous_labels
+        plan.constraint_ids = list(self.constraint_ids)
+        plan.rules = []
+        for rule in self.rules:
+            if rule[0] == CONDITIONAL_RULE:
+                rule = (CONDITIONAL_RULE, tuple((position[feature], mask) for feature, mask in rule[1]),
+                        tuple((position[feature], mode, mask) for feature, mode, mask in rule[2]), rule[3])
+            elif rule[0] == DOMAIN_RULE:
+                rule = DOMAIN_RULE, position[rule[1]], rule[2]
+            plan.rules.append(rule)
+        plan.evaluation_order = None
+        return plan
+
+    def drop_rules(self, rule_indexes: Iterable[int]):
+        """
+        Stop evaluating rules that never change the classification.
+
+        Every dropped rule becomes a conditional rule without conditions, actions nor error, which
+        the engines decide without reading any value, so the rule indices still match the constraints.
+
+        Args:
+            rule_indexes (Iterable[int]): Indices of the rules to drop.
+        """
+        for rule_idx in rule_indexes:
+            self.rules[rule_idx] = (CONDITIONAL_RULE, (), (), None)
+
+    def classify(self, values: List[int]) -> Optional[int]:
+        """
+        Apply the rules to a complete configuration.
+
+        Args:
+            values (List[int]): Value code of every feature; modified in place by `null` actions.
+
+        Returns:
+            Optional[int]: Index of the first blocking rule, or None if the configuration is valid.
+        """
+        if self.evaluation_order is not None:
+            return self._classify_ordered(values)
+
+        null_codes = self.null_codes
+        for idx, rule in enumerate(self.rules):
+            kind = rule[0]
+            if kind == CONDITIONAL_RULE:
+                for feature, mask in rule[1]:
+                    if not mask >> values[feature] & 1:
+                        break
+                else:
+                    for feature, mode, mask in rule[2]:
+                        if mode == BLOCK_ACTION:
+                            if not mask >> values[feature] & 1:
+                                return idx
+                        else:
+                            values[feature] = null_codes[feature]
+                    if rule[3] is not None:
+                        raise rule[3]
+
+            elif kind == DOMAIN_RULE:
+                if not rule[2] >> values[rule[1]] & 1:
+                    return idx
+
+            else:
+                raise rule[1]
+
+        return None
+
+    def _classify_ordered(self, values: List[int]) -> Optional[int]:
+        """
+        Apply the rules to a complete configuration in the evaluation order.
+
+        The movable rules only block, so the lowest-indexed of them that fails is kept and the
+        others only need evaluating below it. The pinned rules then run in declared order below
+        that bound, applying their `null` actions as `classify` does.
+        """
+        rules = self.rules
+        null_codes = self.null_codes
+        bound = len(rules)
+        for idx in self.evaluation_order.early:
+            if idx >= bound:
+                continue
+            rule = rules[idx]
+            if rule[0] == DOMAIN_RULE:
+                if not rule[2] >> values[rule[1]] & 1:
+                    bound = idx
+                continue
+            for feature, mask in rule[1]:
+                if not mask >> values[feature] & 1:
+                    break
+            else:
+                for feature, _, mask in rule[2]:
+                    if not mask >> values[feature] & 1:
+                        bound = idx
+                        break
+
+        for idx in self.evaluation_order.pinned:
+            if idx >= bound:
+                break
+            rule = rules[idx]
+            kind = rule[0]
+            if kind == CONDITIONAL_RULE:
+                for feature, mask in rule[1]:
+                    if not mask >> values[feature] & 1:
+                        break
+                else:
+                    for feature, mode, mask in rule[2]:
+                        if mode == BLOCK_ACTION:
+                            if not mask >> values[feature] & 1:
+                                return idx
+                        else:
+                            values[feature] = null_codes[feature]
+                    if rule[3] is not None:
+                        raise rule[3]
+
+            elif kind == DOMAIN_RULE:
+                if not rule[2] >> values[rule[1]] & 1:
+                    return idx
+
+            else:
+                raise rule[1]
+
+        return bound if bound < len(rules) else None
+
+    def format(self, values: Sequence[int]) -> str:
+        """
+        Format value codes into the `/`-joined string representation of a configuration.
+
+        Args:
+            values (Sequence[int]): Value code of every feature.
+
+        Returns:
+            str: A formatted string representing the configuration.
+        """
+        labels = self.labels
+        return '/'.join([labels[feature][code] for feature, code in enumerate(values)])
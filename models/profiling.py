@@ -0,0 +1,219 @@
+import time
+from itertools import product
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from models.plan import BLOCK_ACTION, CONDITIONAL_RULE, DOMAIN_RULE, CompiledPlan
+
+
+class ConstraintStats:
+    """
+    Counters of one constraint collected while classifying configurations.
+
+    Attributes:
+        constraint_id (str): ID of the constraint.
+        evaluated (int): Configurations the constraint was evaluated on.
+        matched (int): Configurations matching all its conditions; for a domain rule, every
+            evaluated configuration.
+        blocked (int): Configurations it blocked first.
+        nulled (int): Configurations one of its `null` actions was applied to.
+        seconds (float): Total time spent evaluating it.
+    """
+
+    def __init__(self, constraint_id: str):
+        self.constraint_id = constraint_id
+        self.evaluated = 0
+        self.matched = 0
+        self.blocked = 0
+        self.nulled = 0
+        self.seconds = 0.0
+
+    def as_dict(self) -> dict:
+        """
+        Convert the counters to a dictionary.
+        """
+        return {
+            'constraint_id': self.constraint_id,
+            'evaluated': self.evaluated,
+            'matched': self.matched,
+            'blocked': self.blocked,
+            'nulled': self.nulled,
+            'seconds': self.seconds,
+        }
+
+
+class ProfileStats:
+    """
+    Per-constraint statistics of every classification run in profiling mode.
+
+    Attributes:
+        constraints (List[ConstraintStats]): Statistics of every constraint, in declared order.
+    """
+
+    def __init__(self, constraint_ids: Sequence[str]):
+        """
+        Initialize empty statistics.
+
+        Args:
+            constraint_ids (Sequence[str]): Constraint IDs in declared order.
+        """
+        self.constraints = [ConstraintStats(constraint_id) for constraint_id in constraint_ids]
+
+    def __getitem__(self, constraint_id: str) -> ConstraintStats:
+        for stats in self.constraints:
+            if stats.constraint_id == constraint_id:
+                return stats
+        raise KeyError(constraint_id)
+
+    def as_dict(self) -> Dict[str, dict]:
+        """
+        Convert the statistics to a dictionary by constraint ID.
+        """
+        return {stats.constraint_id: stats.as_dict() for stats in self.constraints}
+
+    def report(self) -> List[str]:
+        """
+        Format the statistics as a table, the most expensive constraints first.
+
+        Returns:
+            List[str]: The lines of the table.
+        """
+        lines = [f"{'Constraint':<16}{'Evaluated':>12}{'Matched':>12}{'Blocked':>12}{'Nulled':>12}{'Time (ms)':>12}"]
+        for stats in sorted(self.constraints, key=lambda stats: stats.seconds, reverse=True):
+            lines.append(
+                f"{stats.constraint_id:<16}{stats.evaluated:>12}{stats.matched:>12}{stats.blocked:>12}"
+                f"{stats.nulled:>12}{stats.seconds * 1000:>12.3f}"
+            )
+        return lines
+
+
+class ProfilingEvaluator:
+    """
+    Engine classifying every combination in declared rule order while collecting per-constraint statistics.
+
+    Every configuration is evaluated on its own, as the rules are declared, so the counters are
+    per configuration. It is slower than the other engines and only used in profiling mode,
+    which leaves them free of any instrumentation.
+
+    Attributes:
+        plan (CompiledPlan): The compiled features and constraints.
+        stats (ProfileStats): The statistics, accumulated over every walk.
+    """
+
+    def __init__(self, plan: CompiledPlan, stats: Optional[ProfileStats] = None):
+        """
+        Initialize the evaluator.
+
+        Args:
+            plan (CompiledPlan): The compiled features and constraints.
+            stats (Optional[ProfileStats]): Statistics to accumulate into, new ones by default.
+        """
+        self.plan = plan
+        self.stats = stats if stats is not None else ProfileStats(plan.constraint_ids)
+
+    def _walk_rows(self, valid: bool, blocked: bool, prefix: Sequence[int]) -> Iterator[Tuple[Optional[int], List[int]]]:
+        """
+        Classify the combinations starting with a prefix, in product order.
+
+        Yields:
+            Tuple[Optional[int], List[int]]: Index of the first blocking rule (None for a valid
+                configuration) and the value codes after `null` actions.
+        """
+        plan = self.plan
+        rules = plan.rules
+        null_codes = plan.null_codes
+        size = len(rules)
+        evaluated, matched, blocked_counts, nulled = [0] * size, [0] * size, [0] * size, [0] * size
+        seconds = [0.0] * size
+        clock = time.perf_counter
+
+        ranges = [range(domain_size) for domain_size in plan.domain_sizes[len(prefix):]]
+        try:
+            for combination in product(*ranges):
+                values = list(prefix) + list(combination)
+                blocked_by = None
+                for idx, rule in enumerate(rules):
+                    start = clock()
+                    evaluated[idx] += 1
+                    kind = rule[0]
+                    if kind == CONDITIONAL_RULE:
+                        for feature, mask in rule[1]:
+                            if not mask >> values[feature] & 1:
+                                break
+                        else:
+                            matched[idx] += 1
+                            applied_null = False
+                            for feature, mode, mask in rule[2]:
+                                if mode == BLOCK_ACTION:
+                                    if not mask >> values[feature] & 1:
+                                        blocked_by = idx
+                                        break
+                                else:
+                                    values[feature] = null_codes[feature]
+                                    applied_null = True
+                            if applied_null:
+                                nulled[idx] += 1
+                            if blocked_by is None and rule[3] is not None:
+                                raise rule[3]
+
+                    elif kind == DOMAIN_RULE:
+                        matched[idx] += 1
+                        if not rule[2] >> values[rule[1]] & 1:
+                            blocked_by = idx
+
+                    else:
+                        raise rule[1]
+
+                    seconds[idx] += clock() - start
+                    if blocked_by is not None:
+                        blocked_counts[idx] += 1
+                        break
+
+                if valid if blocked_by is None else blocked:
+                    yield blocked_by, values
+        finally:
+            # Counters are kept in local lists in the loop and added to the statistics once
+            for idx, stats in enumerate(self.stats.constraints):
+                stats.evaluated += evaluated[idx]
+                stats.matched += matched[idx]
+                stats.blocked += blocked_counts[idx]
+                stats.nulled += nulled[idx]
+                stats.seconds += seconds[idx]
+
+    def walk(self, valid: bool = True, blocked: bool = True,
+             prefix: Sequence[int] = ()) -> Iterator[Tuple[Optional[str], str]]:
+        """
+        Classify every combination of feature values, in product order.
+
+        Valid configurations are not deduplicated.
+
+        Args:
+            valid (bool): Whether to produce valid configurations.
+            blocked (bool): Whether to produce blocked configurations.
+            prefix (Sequence[int]): Value codes of the first features; only the combinations
+                starting with them are classified.
+
+        Yields:
+            Tuple[Optional[str], str]: The ID of the first blocking constraint (None for a valid
+                configuration) and the formatted configuration.
+        """
+        constraint_ids = self.plan.constraint_ids
+        for rule_idx, values in self._walk_rows(valid, blocked, prefix):
+            yield None if rule_idx is None else constraint_ids[rule_idx], self.plan.format(values)
+
+    def walk_codes(self, valid: bool = True, blocked: bool = True,
+                   prefix: Sequence[int] = ()) -> Iterator[Tuple[Optional[int], Tuple[int, ...]]]:
+        """
+        Classify every combination of feature values, in product order, as value codes.
+
+        Args:
+            valid (bool): Whether to produce valid configurations.
+            blocked (bool): Whether to produce blocked configurations.
+            prefix (Sequence[int]): Value codes of the first features; only the combinations
+                starting with them are classified.
+
+        Yields:
+            Tuple[Optional[int], Tuple[int, ...]]: Index of the first blocking rule (None for a
+                valid configuration) and the value code of every feature.
+        """
+        for rule_idx, values in self._walk_rows(valid, blocked, prefix):
+            yield rule_idx, tuple(values)
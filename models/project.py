@@ -0,0 +1,89 @@
+from typing import Dict
+
+
+def group_title(group_priority, group: Dict) -> str:
+    """
+    Format the header of a group in the project view.
+    """
+    return f"Group ({group_priority}): {group['group_name']}"
+
+
+def feature_text(feature_priority, feature: Dict) -> str:
+    """
+    Format a feature in the project view, one line per option.
+    """
+    label_text = f"Feature ({feature_priority}): {feature['name']}"
+    for option in feature["options"]:
+        label_text += f"\n({option['code']}) {option['name']}"
+    return label_text
+
+
+class ProjectGroups:
+    """
+    Groups and features edited in the project view.
+
+    The groups keep the saved format: {group priority: {"group_name", "features": {feature
+    priority: feature}}}. Every edit changes the dictionaries in place and swaps exchange them
+    between priorities without copying them, so a view holding a group dictionary follows it.
+
+    Attributes:
+        groups (Dict): The groups by priority.
+    """
+
+    def __init__(self):
+        self.groups = {}
+
+    def add_group(self, group_name: str):
+        """
+        Add an empty group after the others.
+
+        Returns:
+            The priority of the new group.
+        """
+        group_priority = len(self.groups.keys()) + 1
+        self.groups[group_priority] = {
+            "group_name": group_name,
+            "features": {}
+        }
+        return group_priority
+
+    def add_feature(self, group_priority, feature_name: str):
+        """
+        Add a feature without options after the others of a group.
+
+        Returns:
+            The priority of the new feature in its group.
+        """
+        features = self.groups[group_priority]["features"]
+        feature_priority = len(features) + 1
+        features[feature_priority] = {
+            "name": feature_name,
+            "options": []
+        }
+        return feature_priority
+
+    def swap_groups(self, first_priority, second_priority) -> bool:
+        """
+        Exchange the groups of two priorities.
+
+        Returns:
+            bool: False if the priorities are the same and nothing changed.
+        """
+        if first_priority == second_priority:
+            return False
+        groups = self.groups
+        groups[first_priority], groups[second_priority] = groups[second_priority], groups[first_priority]
+        return True
+
+    def swap_features(self, group_priority, first_priority, second_priority) -> bool:
+        """
+        Exchange the features of two priorities in a group.
+
+        Returns:
+            bool: False if the priorities are the same and nothing changed.
+        """
+        if first_priority == second_priority:
+            return False
+        features = self.groups[group_priority]["features"]
+        features[first_priority], features[second_priority] = features[second_priority], features[first_priority]
+        return True
@@ -0,0 +1,64 @@
+from typing import Dict, List, Tuple
+
+from models.plan import NULL_VALUE
+
+# ID of the domain constraint appended to a restricted project
+QUERY_CONSTRAINT_ID = 'query'
+
+
+def restrict_project(features: List[dict], constraints: List[dict],
+                     fixed: Dict[str, str]) -> Tuple[List[dict], List[dict]]:
+    """
+    Restrict a project to the configurations in which some features have fixed values.
+
+    The domain of every fixed feature is reduced to the requested value, in product order, so
+    the engines only walk the restricted subspace. A configuration can still show another value
+    once a `null` action changes the feature, so a domain constraint on the fixed values is
+    appended after the others: the valid configurations of the restricted project are the valid
+    configurations of the project showing the fixed values, in the same order. The appended
+    constraint comes last and never changes which constraint blocks the other configurations.
+    For the null value, every value of the domain is kept, since any of them can be nulled.
+
+    Args:
+        features (List[dict]): List of features, each with a name and a domain.
+        constraints (List[dict]): List of constraints in declared order.
+        fixed (Dict[str, str]): Value of every fixed feature, by feature name.
+
+    Returns:
+        Tuple[List[dict], List[dict]]: The features and constraints of the restricted project;
+            the dictionaries of the project are not modified.
+
+    Raises:
+        ValueError: If a fixed feature is unknown or a fixed value is not a value of its domain
+            nor the null value.
+    """
+    names = {feature['name'] for feature in features}
+    for name, value in fixed.items():
+        if name not in names:
+            raise ValueError(f'Unknown feature {name}')
+
+    restricted_features = []
+    guards = []
+    for feature in features:
+        name = feature['name']
+        if name not in fixed:
+            restricted_features.append(feature)
+            continue
+
+        value = fixed[name]
+        if value != NULL_VALUE and value not in feature['domain']:
+            raise ValueError(f'Unknown value {value} of feature {name}')
+        if value == NULL_VALUE:
+            domain = list(feature['domain'])
+        else:
+            domain = [label for label in feature['domain'] if label == value]
+        restricted_features.append(dict(feature, domain=domain))
+        guards.append({
+            'id': QUERY_CONSTRAINT_ID,
+            'description': f"'{name}' is {value}",
+            'rule_type': 'domain',
+            'feature': name,
+            'allowed_values': [value],
+        })
+
+    return restricted_features, list(constraints) + guards
@@ -0,0 +1,588 @@
+from itertools import product
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from models.plan import BLOCK_ACTION, CONDITIONAL_RULE, DOMAIN_RULE, INVALID_RULE, NULL_ACTION, UNASSIGNED, CompiledPlan
+
+# Outcomes of deciding a single rule against a partial configuration
+PASS = 0
+BLOCK = 1
+UNKNOWN = 2
+ERROR = 3
+
+# Status of a node of the search tree
+OPEN = 0
+VALID = 1
+BLOCKED = 2
+
+# Operations recorded in the undo log of a SearchState
+_ASSIGN = 0
+_SET_VALUE = 1
+_DECIDE = 2
+_UNSTABLE = 3
+_NULL_BLOCKED = 4
+_BLOCKER = 5
+_POINTER = 6
+_LATE = 7
+
+
+class BacktrackingSearch:
+    """
+    Depth-first search over feature assignments that prunes partial configurations.
+
+    Features are assigned one at a time in feature sequence order. After every assignment each
+    rule whose features are known is decided, even out of declared order, as long as this cannot
+    change the result of the declared-order evaluation:
+
+    - a rule is decided only when no undecided earlier rule can null a feature it reads;
+    - the `null` actions of a passing rule are applied only when no undecided earlier rule reads
+      the nulled features;
+    - a blocking rule is remembered as the blocker; the blocked-by attribution is final once every
+      earlier rule has passed;
+    - a rule that raises its error is remembered as a blocker too, and the error is raised once
+      every earlier rule has passed, as the declared-order evaluation reaches it.
+
+    A subtree is abandoned for valid output as soon as a blocker is known, and its configurations
+    are produced without further checks once its outcome is final. The results (and the blocked-by
+    attribution) are the same as checking every combination of the full product.
+
+    Attributes:
+        plan (CompiledPlan): The compiled features and constraints.
+    """
+
+    def __init__(self, plan: CompiledPlan):
+        """
+        Initialize the search and the dependencies between rules.
+
+        Args:
+            plan (CompiledPlan): The compiled features and constraints.
+        """
+        self.plan = plan
+        # Without any configuration no rule is ever evaluated, so no error is ever raised
+        self.empty = 0 in plan.domain_sizes
+
+        rules = plan.rules
+        self.kinds = [rule[0] for rule in rules]
+        # Rules that raise their error when their actions pass, and every rule that can raise one
+        self.erring = [rule[0] == CONDITIONAL_RULE and rule[3] is not None for rule in rules]
+        self.raising = [rule_idx for rule_idx, rule in enumerate(rules)
+                        if rule[0] == INVALID_RULE or self.erring[rule_idx]]
+        self.reads: List[Tuple[int, ...]] = []
+        self.nulls: List[Tuple[int, ...]] = []
+        for rule in rules:
+            if rule[0] == CONDITIONAL_RULE:
+                reads = {feature for feature, _ in rule[1]}
+                reads.update(feature for feature, mode, _ in rule[2] if mode == BLOCK_ACTION)
+                nulls = {feature for feature, mode, _ in rule[2] if mode == NULL_ACTION}
+            elif rule[0] == DOMAIN_RULE:
+                reads, nulls = {rule[1]}, set()
+            else:
+                reads, nulls = set(), set()
+            self.reads.append(tuple(sorted(reads)))
+            self.nulls.append(tuple(sorted(nulls)))
+
+        # Rules to reconsider when a feature becomes known or changes
+        self.watchers: List[List[int]] = [[] for _ in plan.domain_sizes]
+        for rule_idx, reads in enumerate(self.reads):
+            for feature in reads:
+                self.watchers[feature].append(rule_idx)
+
+        # A rule waits for every earlier rule that can null a feature it reads (unstable), and a
+        # passing rule waits for every earlier rule that reads a feature it nulls (null-blocked)
+        self.unstable_counts = [0] * len(rules)
+        self.null_blocked_counts = [0] * len(rules)
+        self.unstable_dependents: List[List[int]] = [[] for _ in rules]
+        self.null_blocked_dependents: List[List[int]] = [[] for _ in rules]
+        for later in range(len(rules)):
+            later_reads, later_nulls = set(self.reads[later]), set(self.nulls[later])
+            for earlier in range(later):
+                if later_reads.intersection(self.nulls[earlier]):
+                    self.unstable_counts[later] += 1
+                    self.unstable_dependents[earlier].append(later)
+                if later_nulls.intersection(self.reads[earlier]):
+                    self.null_blocked_counts[later] += 1
+                    self.null_blocked_dependents[earlier].append(later)
+
+    def decide(self, rule_idx: int, values: List[int]) -> Tuple[int, bool]:
+        """
+        Decide a rule against a partial configuration, ignoring the other rules.
+
+        Args:
+            rule_idx (int): Index of the rule to decide.
+            values (List[int]): Value code of every feature, UNASSIGNED if not known yet.
+
+        Returns:
+            Tuple[int, bool]: PASS, BLOCK, ERROR if the rule raises its error or UNKNOWN if the
+                known values are not enough to decide, and whether the rule applies its `null`
+                actions when it passes.
+        """
+        rule = self.plan.rules[rule_idx]
+        kind = rule[0]
+        if kind == CONDITIONAL_RULE:
+            # The conditions are a conjunction: one failing condition is enough to skip the rule
+            unknown = False
+            for feature, mask in rule[1]:
+                value = values[feature]
+                if value == UNASSIGNED:
+                    unknown = True
+                elif not mask >> value & 1:
+                    return PASS, False
+
+            if unknown:
+                # Without `null` actions nor error, a rule whose `block` actions all pass never changes anything
+                if rule[3] is None and all(mode == BLOCK_ACTION and values[feature] != UNASSIGNED
+                                           and mask >> values[feature] & 1 for feature, mode, mask in rule[2]):
+                    return PASS, False
+                return UNKNOWN, False
+
+            nulled = []
+            for feature, mode, mask in rule[2]:
+                if mode == BLOCK_ACTION:
+                    value = self.plan.null_codes[feature] if feature in nulled else values[feature]
+                    if value == UNASSIGNED:
+                        return UNKNOWN, False
+                    if not mask >> value & 1:
+                        return BLOCK, False
+                else:
+                    nulled.append(feature)
+
+            if rule[3] is not None:
+                return ERROR, False
+            return PASS, bool(nulled)
+
+        elif kind == DOMAIN_RULE:
+            value = values[rule[1]]
+            if value == UNASSIGNED:
+                return UNKNOWN, False
+            if not rule[2] >> value & 1:
+                return BLOCK, False
+            return PASS, False
+
+        return UNKNOWN, False
+
+    def blocked_row(self, state: 'SearchState') -> List[int]:
+        """
+        Rebuild the configuration as the declared-order evaluation leaves it when the blocker fails.
+
+        Only the `null` actions of the rules declared before the blocker, and those of the blocker
+        that come before its failing action, are applied.
+
+        Args:
+            state (SearchState): A state whose status is BLOCKED.
+
+        Returns:
+            List[int]: Value code of every feature, UNASSIGNED for features that are not assigned.
+        """
+        null_codes = self.plan.null_codes
+        row = list(state.raw)
+        for rule_idx in state.applied:
+            if rule_idx < state.blocker:
+                for feature in self.nulls[rule_idx]:
+                    row[feature] = null_codes[feature]
+
+        rule = self.plan.rules[state.blocker]
+        if rule[0] == CONDITIONAL_RULE:
+            for feature, mode, mask in rule[2]:
+                if mode == NULL_ACTION:
+                    row[feature] = null_codes[feature]
+                elif not mask >> row[feature] & 1:
+                    break
+        return row
+
+    def _expand(self, row: List[int], depth: int, collapse: bool = False) -> Iterator[str]:
+        """
+        Format every completion of a subtree whose outcome is final.
+
+        Args:
+            row (List[int]): Value code of every feature, UNASSIGNED for features to enumerate.
+            depth (int): Number of assigned features.
+            collapse (bool): Whether a feature nulled ahead of its assignment is produced once
+                instead of once per value of its domain, which only drops repetitions.
+
+        Yields:
+            str: The formatted configurations, in product order.
+        """
+        plan = self.plan
+        prefix = [plan.labels[feature][code] for feature, code in enumerate(row[:depth])]
+        # Features nulled ahead of their assignment keep the null label for every value of their domain
+        remaining = [
+            plan.labels[feature][:plan.domain_sizes[feature]] if row[feature] == UNASSIGNED
+            else [plan.labels[feature][row[feature]]] * (min(plan.domain_sizes[feature], 1) if collapse
+                                                         else plan.domain_sizes[feature])
+            for feature in range(depth, len(row))
+        ]
+        for combination in product(*remaining):
+            yield '/'.join(prefix + list(combination))
+
+    def _expand_codes(self, row: List[int], depth: int, collapse: bool = False) -> Iterator[Tuple[int, ...]]:
+        """
+        Produce the value codes of every completion of a subtree whose outcome is final.
+
+        Args:
+            row (List[int]): Value code of every feature, UNASSIGNED for features to enumerate.
+            depth (int): Number of assigned features.
+            collapse (bool): Whether a feature nulled ahead of its assignment is produced once, as
+                in `_expand`.
+
+        Yields:
+            Tuple[int, ...]: The value codes of every feature, in product order.
+        """
+        domain_sizes = self.plan.domain_sizes
+        prefix = tuple(row[:depth])
+        remaining = [
+            range(domain_sizes[feature]) if row[feature] == UNASSIGNED
+            else (row[feature],) * (min(domain_sizes[feature], 1) if collapse else domain_sizes[feature])
+            for feature in range(depth, len(row))
+        ]
+        for combination in product(*remaining):
+            yield prefix + combination
+
+    def _walk_leaves(self, valid: bool, blocked: bool,
+                     prefix: Sequence[int]) -> Iterator[Tuple[Optional[int], List[int], int, bool]]:
+        """
+        Visit the nodes of the search tree whose outcome is final, in product order.
+
+        A feature nulled ahead of its assignment is a collapsed branch: every value of its domain
+        leads to the same values, so the valid nodes below its first value are the only ones
+        visited. Subtrees that are blocked, and the other values of collapsed branches, are
+        skipped entirely when blocked configurations are not requested, unless one of their
+        configurations can raise an error.
+
+        Yields:
+            Tuple[Optional[int], List[int], int, bool]: Index of the blocking rule (None for a
+                valid node), the value code of every feature (only valid until the next node), the
+                depth and whether a valid node can repeat configurations of other valid nodes.
+        """
+        domain_sizes = self.plan.domain_sizes
+        state = SearchState(self)
+        # Number of collapsed branches the current node repeats
+        repeats = 0
+        for code in prefix:
+            if code and state.values[state.depth] != UNASSIGNED:
+                repeats += 1
+            state.assign(code)
+        if repeats and not blocked:
+            return
+
+        # Only nodes below a late null or with ambiguous labels can format to the same string
+        ambiguous = self.plan.ambiguous_labels
+        # Each frame: [next value code, undo mark of the node, number of codes, collapsed]
+        stack: List[list] = []
+        while True:
+            status = state.status()
+            if status == BLOCKED:
+                if blocked:
+                    yield state.blocker, self.blocked_row(state), state.depth, False
+            elif status == VALID:
+                if valid and not repeats:
+                    yield None, state.values, state.depth, state.late or ambiguous
+            elif blocked or state.blocker is None or state.may_raise():
+                collapsed = state.values[state.depth] != UNASSIGNED
+                size = domain_sizes[state.depth]
+                stack.append([0, state.mark(), size if blocked or not collapsed else min(size, 1), collapsed])
+
+            # Move on to the next unexplored child
+            while stack:
+                frame = stack[-1]
+                state.rollback(frame[1])
+                if frame[0] < frame[2]:
+                    if frame[3] and frame[0] == 1:
+                        repeats += 1
+                    state.assign(frame[0])
+                    frame[0] += 1
+                    break
+                if frame[3] and frame[0] > 1:
+                    repeats -= 1
+                stack.pop()
+            else:
+                return
+
+    def walk(self, valid: bool = True, blocked: bool = True,
+             prefix: Sequence[int] = ()) -> Iterator[Tuple[Optional[str], str]]:
+        """
+        Classify every combination of feature values, in product order.
+
+        Every valid configuration is produced once, where it first occurs. Collapsed branches are
+        never repeated, so only the valid configurations below a late null (or all of them when
+        labels are ambiguous) go through a seen-set. Subtrees that are blocked are skipped
+        entirely when blocked configurations are not requested.
+
+        Args:
+            valid (bool): Whether to produce valid configurations.
+            blocked (bool): Whether to produce blocked configurations.
+            prefix (Sequence[int]): Value codes of the first features; only the combinations
+                starting with them are classified.
+
+        Yields:
+            Tuple[Optional[str], str]: The ID of the first blocking constraint (None for a valid
+                configuration) and the formatted configuration.
+        """
+        constraint_ids = self.plan.constraint_ids
+        seen = set()
+        for rule_idx, row, depth, repeating in self._walk_leaves(valid, blocked, prefix):
+            if rule_idx is not None:
+                constraint_id = constraint_ids[rule_idx]
+                for formatted_config in self._expand(row, depth):
+                    yield constraint_id, formatted_config
+            elif repeating:
+                for formatted_config in self._expand(row, depth, collapse=True):
+                    if formatted_config not in seen:
+                        seen.add(formatted_config)
+                        yield None, formatted_config
+            else:
+                for formatted_config in self._expand(row, depth, collapse=True):
+                    yield None, formatted_config
+
+    def walk_codes(self, valid: bool = True, blocked: bool = True,
+                   prefix: Sequence[int] = ()) -> Iterator[Tuple[Optional[int], Tuple[int, ...]]]:
+        """
+        Classify every combination of feature values, in product order, as value codes.
+
+        Valid configurations are produced once, as in `walk`.
+
+        Args:
+            valid (bool): Whether to produce valid configurations.
+            blocked (bool): Whether to produce blocked configurations.
+            prefix (Sequence[int]): Value codes of the first features; only the combinations
+                starting with them are classified.
+
+        Yields:
+            Tuple[Optional[int], Tuple[int, ...]]: Index of the first blocking rule (None for a
+                valid configuration) and the value code of every feature.
+        """
+        plan = self.plan
+        seen = set()
+        for rule_idx, row, depth, repeating in self._walk_leaves(valid, blocked, prefix):
+            if rule_idx is not None:
+                for codes in self._expand_codes(row, depth):
+                    yield rule_idx, codes
+            elif repeating:
+                for codes in self._expand_codes(row, depth, collapse=True):
+                    # Different codes only format to the same configuration with ambiguous labels
+                    key = plan.format(codes) if plan.ambiguous_labels else codes
+                    if key not in seen:
+                        seen.add(key)
+                        yield None, codes
+            else:
+                for codes in self._expand_codes(row, depth, collapse=True):
+                    yield None, codes
+
+
+class SearchState:
+    """
+    Mutable state of one traversal of the search tree, with an undo log to backtrack.
+
+    Attributes:
+        depth (int): Number of assigned features.
+        raw (List[int]): Assigned value code of every feature, UNASSIGNED if not assigned yet.
+        values (List[int]): Current value code of every feature after `null` actions; a feature
+            nulled ahead of its assignment is already known.
+        decided (List[bool]): Whether every rule has passed, its `null` actions applied.
+        applied (List[int]): Decided rules whose `null` actions were applied.
+        blocker (Optional[int]): Lowest rule known to block the configuration.
+        pointer (int): Index of the first undecided rule.
+        late (bool): Whether a `null` action changed an assigned feature on the current path.
+    """
+
+    def __init__(self, search: BacktrackingSearch):
+        """
+        Initialize the state at the root of the search tree and decide the rules that need no values.
+
+        Args:
+            search (BacktrackingSearch): The search the state belongs to.
+        """
+        self.search = search
+        size = len(search.plan.domain_sizes)
+        self.depth = 0
+        self.raw = [UNASSIGNED] * size
+        self.values = [UNASSIGNED] * size
+        self.decided = [False] * len(search.kinds)
+        self.applied: List[int] = []
+        self.unstable = list(search.unstable_counts)
+        self.null_blocked = list(search.null_blocked_counts)
+        self.blocker: Optional[int] = None
+        self.pointer = 0
+        self.late = False
+        self.undo: List[tuple] = []
+
+        self._check_pointer()
+        self._propagate(range(len(search.kinds)))
+
+    def status(self) -> int:
+        """
+        Classify the current node.
+
+        Returns:
+            int: BLOCKED or VALID when every completion of the node has that outcome, OPEN otherwise.
+
+        Raises:
+            Exception: The error of a rule that the declared-order evaluation reaches and that
+                raises it rather than blocking.
+        """
+        if self.blocker is not None:
+            if self.pointer != self.blocker:
+                return OPEN
+            if self.raises() and not self.search.empty:
+                raise self.search.plan.rules[self.blocker][3]
+            return BLOCKED
+        return VALID if self.pointer == len(self.decided) else OPEN
+
+    def raises(self) -> bool:
+        """
+        Whether the blocker raises its error rather than blocking, when the evaluation reaches it.
+        """
+        return (self.blocker is not None and self.search.erring[self.blocker]
+                and self.search.decide(self.blocker, self.values)[0] == ERROR)
+
+    def may_raise(self) -> bool:
+        """
+        Whether a completion of the node can raise an error: an undecided rule before the blocker
+        (if any) can, or the blocker raises its error.
+        """
+        if self.search.empty:
+            return False
+        last = len(self.decided) if self.blocker is None else self.blocker
+        for rule_idx in self.search.raising:
+            if rule_idx >= last:
+                break
+            if rule_idx >= self.pointer and not self.decided[rule_idx]:
+                return True
+        return self.raises()
+
+    def copy(self) -> 'SearchState':
+        """
+        Copy the state at the current node, with an empty undo log.
+        """
+        state = SearchState.__new__(SearchState)
+        state.search = self.search
+        state.depth = self.depth
+        state.raw = list(self.raw)
+        state.values = list(self.values)
+        state.decided = list(self.decided)
+        state.applied = list(self.applied)
+        state.unstable = list(self.unstable)
+        state.null_blocked = list(self.null_blocked)
+        state.blocker = self.blocker
+        state.pointer = self.pointer
+        state.late = self.late
+        state.undo = []
+        return state
+
+    def mark(self) -> int:
+        """
+        Return the current position of the undo log.
+        """
+        return len(self.undo)
+
+    def rollback(self, mark: int):
+        """
+        Undo every change recorded after `mark`.
+        """
+        undo = self.undo
+        while len(undo) > mark:
+            entry = undo.pop()
+            operation = entry[0]
+            if operation == _SET_VALUE:
+                self.values[entry[1]] = entry[2]
+            elif operation == _ASSIGN:
+                self.depth -= 1
+                self.raw[self.depth] = UNASSIGNED
+            elif operation == _DECIDE:
+                self.decided[entry[1]] = False
+                if entry[2]:
+                    self.applied.pop()
+            elif operation == _UNSTABLE:
+                self.unstable[entry[1]] += 1
+            elif operation == _NULL_BLOCKED:
+                self.null_blocked[entry[1]] += 1
+            elif operation == _BLOCKER:
+                self.blocker = entry[1]
+            elif operation == _POINTER:
+                self.pointer = entry[1]
+            else:
+                self.late = False
+
+    def assign(self, code: int):
+        """
+        Assign a value to the next feature and decide the rules this makes decidable.
+
+        Args:
+            code (int): Value code of the feature.
+        """
+        feature = self.depth
+        self.raw[feature] = code
+        self.depth += 1
+        self.undo.append((_ASSIGN,))
+
+        # A feature nulled ahead of its assignment keeps the null value
+        if self.values[feature] == UNASSIGNED:
+            self._set_value(feature, code)
+            self._propagate(self.search.watchers[feature])
+
+    def _set_value(self, feature: int, code: int):
+        self.undo.append((_SET_VALUE, feature, self.values[feature]))
+        self.values[feature] = code
+
+    def _check_pointer(self):
+        """
+        Raise the error of an invalid rule reached by the declared-order evaluation.
+        """
+        if (self.pointer < len(self.decided) and self.search.kinds[self.pointer] == INVALID_RULE
+                and not self.search.empty):
+            raise self.search.plan.rules[self.pointer][1]
+
+    def _propagate(self, rule_indexes: Iterable[int]):
+        """
+        Decide rules until no more can be decided.
+
+        Args:
+            rule_indexes (Iterable[int]): Rules whose inputs changed.
+        """
+        search = self.search
+        null_codes = search.plan.null_codes
+        decided, unstable, null_blocked, values = self.decided, self.unstable, self.null_blocked, self.values
+        undo = self.undo
+
+        queue = list(rule_indexes)
+        while queue:
+            rule_idx = queue.pop()
+            if decided[rule_idx] or unstable[rule_idx] or (self.blocker is not None and rule_idx >= self.blocker):
+                continue
+
+            outcome, applies_nulls = search.decide(rule_idx, values)
+            if outcome == UNKNOWN or (applies_nulls and null_blocked[rule_idx]):
+                continue
+
+            if outcome == BLOCK or outcome == ERROR:
+                undo.append((_BLOCKER, self.blocker))
+                self.blocker = rule_idx
+                continue
+
+            decided[rule_idx] = True
+            undo.append((_DECIDE, rule_idx, applies_nulls))
+            if applies_nulls:
+                self.applied.append(rule_idx)
+                for feature in search.nulls[rule_idx]:
+                    if values[feature] == null_codes[feature]:
+                        continue
+                    if self.raw[feature] != UNASSIGNED and not self.late:
+                        undo.append((_LATE,))
+                        self.late = True
+                    self._set_value(feature, null_codes[feature])
+                    queue.extend(search.watchers[feature])
+
+            for dependent in search.unstable_dependents[rule_idx]:
+                unstable[dependent] -= 1
+                undo.append((_UNSTABLE, dependent))
+                if not unstable[dependent]:
+                    queue.append(dependent)
+            for dependent in search.null_blocked_dependents[rule_idx]:
+                null_blocked[dependent] -= 1
+                undo.append((_NULL_BLOCKED, dependent))
+                if not null_blocked[dependent]:
+                    queue.append(dependent)
+
+            if rule_idx == self.pointer:
+                undo.append((_POINTER, self.pointer))
+                while self.pointer < len(decided) and decided[self.pointer]:
+                    self.pointer += 1
+                self._check_pointer()
@@ -0,0 +1,178 @@
+import time
+from array import array
+from typing import Callable, List, Optional, Tuple
+
+from models.classifier import ConfigurationGenerator
+from models.plan import CompiledPlan
+
+# Classified configurations are sent in batches of this size, or at this interval (seconds)
+BATCH_SIZE = 5000
+BATCH_INTERVAL = 0.2
+
+# Status of a valid configuration in ConfigurationRows
+VALID_ROW = -1
+
+# Status filters of ConfigurationRows
+ALL_CONFIGURATIONS = "All"
+VALID_CONFIGURATIONS = "Valid"
+BLOCKED_CONFIGURATIONS = "Blocked"
+
+Row = Tuple[Optional[int], Tuple[int, ...]]
+
+
+def classify_in_batches(generator: ConfigurationGenerator, send_batch: Callable[[List[Row]], None],
+                        send_progress: Callable[[int, int], None], interrupted: Callable[[], bool],
+                        batch_size: int = BATCH_SIZE, interval: float = BATCH_INTERVAL,
+                        clock: Callable[[], float] = time.monotonic) -> bool:
+    """
+    Classify every configuration of a generator and send the rows in batches, with the progress.
+
+    A batch is sent once it holds `batch_size` rows, or at the end of a part of the product when
+    `interval` seconds passed since the last one, with the progress. The progress counts the
+    combinations classified, repeated valid configurations that are dropped included, as each
+    part is done. The classification stops between two rows once `interrupted` returns True.
+
+    Args:
+        generator (ConfigurationGenerator): The compiled project.
+        send_batch (Callable[[List[Row]], None]): Called with every batch of (index of the blocking
+            constraint or None, value codes) rows, in the order of `iter_classified_codes`.
+        send_progress (Callable[[int, int], None]): Called with the combinations classified so far
+            and in total.
+        interrupted (Callable[[], bool]): Whether to stop the classification.
+        batch_size (int): Largest number of rows of a batch.
+        interval (float): Seconds between the batches sent at the end of a part.
+        clock (Callable[[], float]): Source of the time in seconds.
+
+    Returns:
+        bool: True once every row is sent, False if interrupted.
+    """
+    total = 1
+    for size in generator.plan.domain_sizes:
+        total *= size
+    send_progress(0, total)
+
+    batch = []
+    last_sent = clock()
+    for done, rows in generator.iter_classified_parts():
+        for row in rows:
+            if interrupted():
+                return False
+            batch.append(row)
+            if len(batch) >= batch_size:
+                send_batch(batch)
+                batch = []
+                last_sent = clock()
+        if interrupted():
+            return False
+        if clock() - last_sent >= interval:
+            if batch:
+                send_batch(batch)
+                batch = []
+            send_progress(done, total)
+            last_sent = clock()
+
+    if batch:
+        send_batch(batch)
+    send_progress(total, total)
+    return True
+
+
+class ConfigurationRows:
+    """
+    Classified configurations, stored as packed value codes and formatted only when a row is read.
+
+    The rows passing the status and constraint filters are kept as an index array of visible
+    rows, so filtering does not copy the configurations.
+
+    Attributes:
+        plan (Optional[CompiledPlan]): The compiled project of the rows, None before it is loaded.
+    """
+
+    def __init__(self):
+        self.plan: Optional[CompiledPlan] = None
+        self._width = 0
+        self._statuses = array('i')
+        self._codes = array('I')
+        self._visible = array('q')
+        self._status_filter = ALL_CONFIGURATIONS
+        self._constraint_filter: Optional[str] = None
+
+    def reset(self, plan: Optional[CompiledPlan] = None):
+        """
+        Drop every row, the next ones belonging to `plan`; the filters are kept.
+        """
+        self.plan = plan
+        self._width = len(plan.domain_sizes) if plan is not None else 0
+        self._statuses = array('i')
+        # Value codes are small, the narrowest array type holding every code is enough
+        largest = max((len(labels) for labels in plan.labels), default=0) if plan is not None else 0
+        self._codes = array('B' if largest <= 0xFF else 'H' if largest <= 0xFFFF else 'I')
+        self._visible = array('q')
+
+    def total_count(self) -> int:
+        return len(self._statuses)
+
+    def visible_count(self) -> int:
+        return len(self._visible)
+
+    def status(self, position: int) -> int:
+        """
+        Get the index of the blocking constraint of a visible row, VALID_ROW for a valid one.
+        """
+        return self._statuses[self._visible[position]]
+
+    def text(self, position: int) -> str:
+        """
+        Format a visible row, naming the blocking constraint of a blocked configuration.
+        """
+        row = self._visible[position]
+        status = self._statuses[row]
+        config = self.plan.format(self._codes[row * self._width:(row + 1) * self._width])
+        if status == VALID_ROW:
+            return config
+        return f"Blocked by ({self.plan.constraint_ids[status]}): {config}"
+
+    def _accepts(self, status: int) -> bool:
+        if status == VALID_ROW:
+            return self._status_filter != BLOCKED_CONFIGURATIONS and self._constraint_filter is None
+        if self._status_filter == VALID_CONFIGURATIONS:
+            return False
+        return self._constraint_filter is None or self.plan.constraint_ids[status] == self._constraint_filter
+
+    def append(self, rows: List[Row]) -> List[int]:
+        """
+        Store classified rows, without showing them yet.
+
+        Args:
+            rows (List[Row]): (index of the blocking constraint or None, value codes) rows.
+
+        Returns:
+            List[int]: The stored rows passing the filters, to pass to `show`.
+        """
+        first = len(self._statuses)
+        for rule_idx, codes in rows:
+            self._statuses.append(VALID_ROW if rule_idx is None else rule_idx)
+            self._codes.extend(codes)
+
+        accepts = self._accepts
+        statuses = self._statuses
+        return [row for row in range(first, len(statuses)) if accepts(statuses[row])]
+
+    def show(self, rows: List[int]):
+        """
+        Make stored rows visible after the visible ones.
+        """
+        self._visible.extend(rows)
+
+    def set_filter(self, status_filter: str, constraint_id: Optional[str]):
+        """
+        Show the rows of a status filter and, if given, blocked by a constraint.
+
+        Args:
+            status_filter (str): ALL_CONFIGURATIONS, VALID_CONFIGURATIONS or BLOCKED_CONFIGURATIONS.
+            constraint_id (Optional[str]): Only show the configurations blocked by this constraint.
+        """
+        self._status_filter = status_filter
+        self._constraint_filter = constraint_id
+        accepts = self._accepts
+        self._visible = array('q', (row for row, status in enumerate(self._statuses) if accepts(status)))
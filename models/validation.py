@@ -0,0 +1,260 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from models.plan import NULL_VALUE, UNASSIGNED, CompiledPlan
+from models.search import BLOCKED, VALID, BacktrackingSearch, SearchState
+
+# Status of a checked configuration
+VALID_STATUS = 'valid'
+BLOCKED_STATUS = 'blocked'
+INVALID_STATUS = 'invalid'
+
+# A checked configuration: the configuration, its status and the ID of the blocking constraint
+# (blocked) or the reason it is not a configuration of the project (invalid), None if valid
+ValidationResult = Tuple[str, str, Optional[str]]
+
+
+class ConfigurationValidator:
+    """
+    Check configurations formatted as `/`-joined values against the compiled constraints.
+
+    Every configuration is parsed into value codes and classified on its own, so the cost is
+    independent of the size of the configuration space. A configuration is valid when it is one
+    of the valid configurations of the project, as formatted by the classifier. A feature showing
+    the null value may be nulled from any value of its domain: the configuration is valid if one
+    candidate value of these features classifies as valid and formats to the configuration;
+    otherwise it is blocked by the first blocking constraint of the first blocked candidate, in
+    product order.
+
+    The candidates are not enumerated but searched with BacktrackingSearch, the other features
+    fixed to their shown value: blocked subtrees are cut once the first blocker is known, as are
+    subtrees where a feature keeps a value it does not show, and subtrees already seen with the
+    same undecided rules and values are visited once.
+
+    Attributes:
+        plan (CompiledPlan): The compiled features and constraints.
+    """
+
+    def __init__(self, plan: CompiledPlan):
+        """
+        Initialize the validator.
+
+        Args:
+            plan (CompiledPlan): The compiled features and constraints.
+
+        Raises:
+            ValueError: If a value contains '/', which makes the format ambiguous.
+        """
+        if any('/' in label for labels in plan.labels for label in labels):
+            raise ValueError('Configurations cannot be parsed when a feature value contains /')
+
+        self.plan = plan
+        self._search = BacktrackingSearch(plan)
+        # Features used by every rule, and the rules nulling every feature
+        self._rule_features = [plan.rule_features(rule_idx) for rule_idx in range(len(plan.rules))]
+        self._nullers: List[List[int]] = [[] for _ in plan.domain_sizes]
+        for rule_idx, nulls in enumerate(self._search.nulls):
+            for feature in nulls:
+                self._nullers[feature].append(rule_idx)
+        # Whether a feature from every depth onwards has an empty domain, leaving no candidate
+        self._empty_suffix = [False] * (len(plan.domain_sizes) + 1)
+        for depth in range(len(plan.domain_sizes) - 1, -1, -1):
+            self._empty_suffix[depth] = self._empty_suffix[depth + 1] or not plan.domain_sizes[depth]
+        # Code of every label that can be read as a raw value; repeated labels behave the same
+        self._codes: List[Dict[str, int]] = []
+        for labels, size in zip(plan.labels, plan.domain_sizes):
+            codes = {}
+            for code, label in enumerate(labels[:size]):
+                codes.setdefault(label, code)
+            codes.pop(NULL_VALUE, None)
+            self._codes.append(codes)
+
+    def validate(self, configuration: str) -> Tuple[str, Optional[str]]:
+        """
+        Check one configuration.
+
+        Args:
+            configuration (str): Values of every feature in feature order, joined by '/'.
+
+        Returns:
+            Tuple[str, Optional[str]]: The status (VALID_STATUS, BLOCKED_STATUS or INVALID_STATUS)
+                and the ID of the blocking constraint or the reason the configuration is invalid.
+        """
+        plan = self.plan
+        labels = configuration.split('/')
+        if len(labels) != len(self._codes):
+            return INVALID_STATUS, f'Expected {len(self._codes)} values, got {len(labels)}'
+
+        values = []
+        open_features = []
+        for feature, (codes, label) in enumerate(zip(self._codes, labels)):
+            code = codes.get(label)
+            if code is None:
+                if label != NULL_VALUE:
+                    return INVALID_STATUS, f"Unknown value '{label}' of feature '{plan.feature_sequence[feature]}'"
+                open_features.append(feature)
+            values.append(code)
+
+        if not open_features:
+            shown = list(values)
+            blocked_by = plan.classify(values)
+            if blocked_by is not None:
+                return BLOCKED_STATUS, plan.constraint_ids[blocked_by]
+            if values != shown:
+                return INVALID_STATUS, self._not_applicable(values, shown)
+            return VALID_STATUS, None
+
+        # Features showing the null value: search the values they can be nulled from
+        shown = list(values)
+        for feature in open_features:
+            shown[feature] = plan.null_codes[feature]
+        return self._search_open(shown, set(open_features))
+
+    def _search_open(self, shown: List[int], open_features: set) -> Tuple[str, Optional[str]]:
+        """
+        Search the candidate values of the features showing the null value, in product order.
+
+        Args:
+            shown (List[int]): Code of every shown value, the null code for the open features.
+            open_features (set): Features showing the null value.
+
+        Returns:
+            Tuple[str, Optional[str]]: The status and detail, as in `validate`.
+        """
+        plan = self.plan
+        domain_sizes = plan.domain_sizes
+        first_blocker = None
+        mismatch = None
+        seen = set()
+
+        state = SearchState(self._search)
+        # Each frame: [candidate codes, position of the next one, undo mark of the node]
+        stack: List[list] = []
+        while True:
+            status = None if self._empty_suffix[state.depth] else state.status()
+            if status == BLOCKED:
+                if first_blocker is None:
+                    first_blocker = state.blocker
+            elif status == VALID:
+                if self._completes_to(state, shown):
+                    return VALID_STATUS, None
+                if mismatch is None:
+                    mismatch = self._not_applicable(self._first_completion(state, shown, open_features), shown)
+            elif status is not None and (first_blocker is None or state.may_raise()
+                                         or self._can_match(state, shown)):
+                key = self._key(state, shown)
+                if key not in seen:
+                    seen.add(key)
+                    feature = state.depth
+                    if feature not in open_features:
+                        codes = (shown[feature],)
+                    elif state.values[feature] != UNASSIGNED:
+                        # Nulled ahead of its assignment, every value gives the same candidates
+                        codes = range(min(domain_sizes[feature], 1))
+                    else:
+                        codes = range(domain_sizes[feature])
+                    stack.append([codes, 0, state.mark()])
+
+            # Move on to the next candidate value
+            while stack:
+                frame = stack[-1]
+                state.rollback(frame[2])
+                if frame[1] < len(frame[0]):
+                    state.assign(frame[0][frame[1]])
+                    frame[1] += 1
+                    break
+                stack.pop()
+            else:
+                break
+
+        if first_blocker is not None:
+            return BLOCKED_STATUS, plan.constraint_ids[first_blocker]
+        if mismatch is not None:
+            return INVALID_STATUS, mismatch
+        return INVALID_STATUS, 'A feature showing the null value has an empty domain'
+
+    def _key(self, state: SearchState, shown: List[int]) -> tuple:
+        """
+        Key of an open node: nodes with the same key have the same candidates below, up to the
+        values of the assigned features, which only matter through whether they are shown.
+        """
+        values = state.values
+        last = len(state.decided) if state.blocker is None else state.blocker
+        undecided = tuple(
+            (rule_idx, tuple(values[feature] for feature in self._rule_features[rule_idx]))
+            for rule_idx in range(state.pointer, last) if not state.decided[rule_idx]
+        )
+        matching = tuple(values[feature] == shown[feature] for feature in range(state.depth))
+        return state.depth, state.blocker, undecided, matching, tuple(values[state.depth:])
+
+    def _can_match(self, state: SearchState, shown: List[int]) -> bool:
+        """
+        Whether a candidate below an open node can be valid and format to the shown values.
+
+        Values only ever change to the null value, so a feature whose value is known and not
+        shown can only match if it is still to be nulled by an undecided rule.
+        """
+        if state.blocker is not None:
+            return False
+        decided = state.decided
+        for feature, value in enumerate(state.values):
+            if value == UNASSIGNED or value == shown[feature]:
+                continue
+            if value == self.plan.null_codes[feature]:
+                return False
+            if all(decided[rule_idx] for rule_idx in self._nullers[feature]):
+                return False
+        return True
+
+    def _completes_to(self, state: SearchState, shown: List[int]) -> bool:
+        """
+        Whether a completion of a valid node formats to the shown values.
+
+        A feature that is not assigned yet keeps the value it is assigned: it matches a shown
+        raw value, or the null value when the null label is also a value of its domain.
+        """
+        domain_sizes = self.plan.domain_sizes
+        for feature, value in enumerate(state.values):
+            if value == UNASSIGNED:
+                if shown[feature] >= domain_sizes[feature]:
+                    return False
+            elif value != shown[feature]:
+                return False
+        return True
+
+    def _first_completion(self, state: SearchState, shown: List[int], open_features: set) -> List[int]:
+        """
+        Values of the first candidate below a valid node, in product order.
+        """
+        return [
+            value if value != UNASSIGNED else 0 if feature in open_features else shown[feature]
+            for feature, value in enumerate(state.values)
+        ]
+
+    def _not_applicable(self, values: List[int], shown: List[int]) -> str:
+        """
+        Describe the first difference between a classified configuration and the shown values.
+        """
+        plan = self.plan
+        for feature, (value, shown_value) in enumerate(zip(values, shown)):
+            if value != shown_value:
+                name = plan.feature_sequence[feature]
+                return f"'{name}' is {plan.labels[feature][value]}, not {plan.labels[feature][shown_value]}"
+        return ''
+
+    def validate_batch(self, configurations: Iterable[str]) -> Iterator[ValidationResult]:
+        """
+        Check configurations one after the other.
+
+        Args:
+            configurations (Iterable[str]): Configurations formatted as `/`-joined values; a
+                trailing newline is ignored.
+
+        Yields:
+            ValidationResult: The configuration, its status and the blocking constraint ID or
+                the reason it is invalid, in input order.
+        """
+        validate = self.validate
+        for configuration in configurations:
+            configuration = configuration.rstrip('\r\n')
+            status, detail = validate(configuration)
+            yield configuration, status, detail
@@ -0,0 +1,398 @@
+from itertools import product
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from models.plan import BLOCK_ACTION, CONDITIONAL_RULE, DOMAIN_RULE, CompiledPlan
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, only the vectorized engine needs it
+    np = None
+
+# Value of `blocked_by` for a valid configuration
+VALID = -1
+
+# Bound of the number of entries of the table of formatted labels of a group of features
+FORMAT_TABLE_SIZE = 1 << 12
+
+
+class VectorizedEvaluator:
+    """
+    Batch evaluation of the rules over blocks of the configuration space with NumPy.
+
+    The configuration space is a mixed-radix number system over the feature domains: the index of
+    a configuration in product order is decoded into one value code per feature, the last feature
+    being the fastest-changing digit. A chunk of indices is decoded into an int array of shape
+    (chunk, n_features) and every rule is evaluated as a boolean mask over the whole chunk.
+
+    Attributes:
+        plan (CompiledPlan): The compiled features and constraints.
+        chunk_size (int): Number of configurations evaluated at once.
+        total (int): Number of configurations in the full product.
+    """
+
+    def __init__(self, plan: CompiledPlan, chunk_size: int = 1 << 16):
+        """
+        Initialize the evaluator.
+
+        Args:
+            plan (CompiledPlan): The compiled features and constraints.
+            chunk_size (int): Number of configurations evaluated at once.
+        """
+        if np is None:
+            raise ImportError('The vectorized engine requires numpy, see requirements-optional.txt')
+
+        self.plan = plan
+        self.chunk_size = chunk_size
+
+        self.total = 1
+        for size in plan.domain_sizes:
+            self.total *= size
+
+        max_code = max((len(labels) for labels in plan.labels), default=1)
+        self._dtype = np.uint8 if max_code <= 0xFF else np.uint16 if max_code <= 0xFFFF else np.uint32
+        self._null_codes = plan.null_codes
+
+        # Bitmasks become lookup tables indexed by value code
+        self._rules = []
+        for rule in plan.rules:
+            if rule[0] == CONDITIONAL_RULE:
+                conditions = tuple((feature, self._lut(feature, mask)) for feature, mask in rule[1])
+                actions = tuple((feature, mode, self._lut(feature, mask)) for feature, mode, mask in rule[2])
+                self._rules.append((CONDITIONAL_RULE, conditions, actions, rule[3]))
+            elif rule[0] == DOMAIN_RULE:
+                self._rules.append((DOMAIN_RULE, rule[1], self._lut(rule[1], rule[2])))
+            else:
+                self._rules.append(rule)
+
+        # Formatted labels of every combination of a group of consecutive features, with the
+        # separator after every group but the last, so a row is formatted by a few table lookups
+        self._format_groups: List[Tuple[Tuple[int, ...], Tuple[int, ...], 'np.ndarray']] = []
+        group: List[int] = []
+        for feature in range(len(plan.labels)):
+            size = 1
+            for grouped in group:
+                size *= len(plan.labels[grouped])
+            if group and size * len(plan.labels[feature]) > FORMAT_TABLE_SIZE:
+                self._format_groups.append(self._format_group(group))
+                group = []
+            group.append(feature)
+        if group:
+            self._format_groups.append(self._format_group(group))
+        if self._format_groups:
+            features, strides, table = self._format_groups[-1]
+            self._format_groups[-1] = features, strides, np.array([label[:-1] for label in table], dtype=object)
+
+        # Constraint ID of every `blocked_by` value, the last one (VALID) being None for a valid row
+        self._constraint_ids = np.array(list(plan.constraint_ids) + [None], dtype=object)
+        self._rule_indexes = np.array(list(range(len(plan.rules))) + [None], dtype=object)
+
+    def _format_group(self, features: List[int]) -> Tuple[Tuple[int, ...], Tuple[int, ...], 'np.ndarray']:
+        """
+        Build the table of formatted labels of a group of features.
+
+        Returns:
+            Tuple[Tuple[int, ...], Tuple[int, ...], np.ndarray]: The features, the stride of each
+                of them in the index of the table, and the labels of every combination of their
+                codes, each followed by the separator.
+        """
+        labels = self.plan.labels
+        strides = []
+        stride = 1
+        for feature in reversed(features):
+            strides.append(stride)
+            stride *= len(labels[feature])
+        table = np.array(['/'.join(combination) + '/' for combination in product(*[labels[feature] for feature in features])],
+                         dtype=object)
+        return tuple(features), tuple(reversed(strides)), table
+
+    def format_rows(self, codes: 'np.ndarray') -> List[str]:
+        """
+        Format a block of value codes into configurations, a column group at a time.
+
+        Args:
+            codes (np.ndarray): Value codes of shape (rows, n_features).
+
+        Returns:
+            List[str]: The formatted configuration of every row, as by `CompiledPlan.format`.
+        """
+        formatted = None
+        for features, strides, table in self._format_groups:
+            index = np.zeros(len(codes), dtype=np.intp)
+            for feature, stride in zip(features, strides):
+                index += codes[:, feature].astype(np.intp) * stride
+            formatted = table[index] if formatted is None else formatted + table[index]
+        return [''] * len(codes) if formatted is None else formatted.tolist()
+
+    def format_statuses(self, blocked_by: 'np.ndarray', ids: bool = True) -> list:
+        """
+        Convert the first blocking rules of a block of rows for the walks.
+
+        Args:
+            blocked_by (np.ndarray): First blocking rule of every row, VALID for valid rows.
+            ids (bool): Whether to return constraint IDs instead of rule indexes.
+
+        Returns:
+            list: The constraint ID, or rule index, of every row, None for valid rows.
+        """
+        return (self._constraint_ids if ids else self._rule_indexes)[blocked_by].tolist()
+
+    def _lut(self, feature: int, mask: int) -> 'np.ndarray':
+        """
+        Convert a value bitmask of a feature into a boolean lookup table.
+        """
+        return np.array([bool(mask >> code & 1) for code in range(len(self.plan.labels[feature]))], dtype=bool)
+
+    def decode(self, start: int, stop: int) -> 'np.ndarray':
+        """
+        Decode a range of product indices into value codes.
+
+        Args:
+            start (int): First index of the range.
+            stop (int): Index after the last one.
+
+        Returns:
+            np.ndarray: Array of shape (stop - start, n_features) with the value code of every feature.
+        """
+        return self.decode_indices(np.arange(start, stop, dtype=np.int64))
+
+    def decode_indices(self, indices: 'np.ndarray') -> 'np.ndarray':
+        """
+        Decode arbitrary product indices into value codes.
+
+        Args:
+            indices (np.ndarray): Product indices.
+
+        Returns:
+            np.ndarray: Array of shape (len(indices), n_features) with the value code of every feature.
+        """
+        domain_sizes = self.plan.domain_sizes
+        codes = np.empty((len(indices), len(domain_sizes)), dtype=self._dtype)
+        for feature in range(len(domain_sizes) - 1, -1, -1):
+            indices, codes[:, feature] = np.divmod(indices, domain_sizes[feature])
+        return codes
+
+    def evaluate(self, codes: 'np.ndarray', start: int = 0,
+                 null_hits: Optional[Dict[Tuple[int, int], 'np.ndarray']] = None) -> 'np.ndarray':
+        """
+        Apply the rules to a block of configurations.
+
+        Args:
+            codes (np.ndarray): Value codes of shape (chunk, n_features); `null` actions rewrite
+                the affected columns to the null code in place.
+            start (int): Index of the first rule to apply; the rows are the configurations
+                reaching it, with the `null` actions of the earlier rules already applied.
+            null_hits (Optional[Dict[Tuple[int, int], np.ndarray]]): If given, filled with the rows
+                reaching every applied `null` action, by (rule index, action position).
+
+        Returns:
+            np.ndarray: Index of the first blocking rule of every row, VALID for valid rows.
+        """
+        if self.plan.evaluation_order is not None:
+            return self._evaluate_ordered(codes, start, null_hits)
+
+        blocked_by = np.full(len(codes), VALID, dtype=np.int32)
+        alive = np.ones(len(codes), dtype=bool)
+
+        for idx in range(start, len(self._rules)):
+            rule = self._rules[idx]
+            kind = rule[0]
+            if kind == CONDITIONAL_RULE:
+                if not rule[2] and rule[3] is None:
+                    # Without actions nor error, matching changes nothing
+                    continue
+                matched = alive.copy()
+                for feature, lut in rule[1]:
+                    matched &= lut[codes[:, feature]]
+                if not matched.any():
+                    continue
+
+                for position, (feature, mode, lut) in enumerate(rule[2]):
+                    if mode == BLOCK_ACTION:
+                        failed = matched & ~lut[codes[:, feature]]
+                        blocked_by[failed] = idx
+                        alive &= ~failed
+                        # The remaining actions are not applied to blocked rows
+                        matched &= ~failed
+                    else:
+                        codes[matched, feature] = self._null_codes[feature]
+                        if null_hits is not None:
+                            null_hits[idx, position] = matched.copy()
+                if rule[3] is not None and matched.any():
+                    raise rule[3]
+
+            elif kind == DOMAIN_RULE:
+                failed = alive & ~rule[2][codes[:, rule[1]]]
+                blocked_by[failed] = idx
+                alive &= ~failed
+
+            elif alive.any():
+                raise rule[1]
+
+        return blocked_by
+
+    def _evaluate_ordered(self, codes: 'np.ndarray', start: int,
+                          null_hits: Optional[Dict[Tuple[int, int], 'np.ndarray']]) -> 'np.ndarray':
+        """
+        Apply the rules to a block of configurations in the evaluation order of the plan.
+
+        Every row keeps the lowest index of the rules found blocking it, and a rule is only
+        evaluated on the rows whose bound is above its index, gathered as an index array. The
+        movable rules run first, most selective first, so the rules after them see fewer rows;
+        the pinned rules then run in declared order and apply their `null` actions.
+
+        Args and return value as in `evaluate`.
+        """
+        order = self.plan.evaluation_order
+        size = len(self._rules)
+        bound = np.full(len(codes), size, dtype=np.int32)
+
+        for idx in order.early:
+            if idx < start:
+                continue
+            rows = np.flatnonzero(bound > idx)
+            if not len(rows):
+                continue
+            rule = self._rules[idx]
+            if rule[0] == DOMAIN_RULE:
+                bound[rows[~rule[2][codes[rows, rule[1]]]]] = idx
+                continue
+            for feature, lut in rule[1]:
+                rows = rows[lut[codes[rows, feature]]]
+            for feature, _, lut in rule[2]:
+                passed = lut[codes[rows, feature]]
+                bound[rows[~passed]] = idx
+                rows = rows[passed]
+
+        for idx in order.pinned:
+            if idx < start:
+                continue
+            rows = np.flatnonzero(bound > idx)
+            if not len(rows):
+                continue
+            rule = self._rules[idx]
+            kind = rule[0]
+            if kind == CONDITIONAL_RULE:
+                for feature, lut in rule[1]:
+                    rows = rows[lut[codes[rows, feature]]]
+                if not len(rows):
+                    continue
+
+                for position, (feature, mode, lut) in enumerate(rule[2]):
+                    if mode == BLOCK_ACTION:
+                        passed = lut[codes[rows, feature]]
+                        bound[rows[~passed]] = idx
+                        # The remaining actions are not applied to blocked rows
+                        rows = rows[passed]
+                    else:
+                        codes[rows, feature] = self._null_codes[feature]
+                        if null_hits is not None:
+                            hits = np.zeros(len(codes), dtype=bool)
+                            hits[rows] = True
+                            null_hits[idx, position] = hits
+                if rule[3] is not None and len(rows):
+                    raise rule[3]
+
+            elif kind == DOMAIN_RULE:
+                bound[rows[~rule[2][codes[rows, rule[1]]]]] = idx
+
+            else:
+                raise rule[1]
+
+        return np.where(bound == size, VALID, bound).astype(np.int32)
+
+    def iter_chunks(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple['np.ndarray', 'np.ndarray']]:
+        """
+        Classify a range of the configuration space chunk by chunk.
+
+        Args:
+            start (int): First product index.
+            stop (Optional[int]): Index after the last one, the end of the space by default.
+
+        Yields:
+            Tuple[np.ndarray, np.ndarray]: Value codes (after `null` actions) and the first blocking
+                rule of every row of the chunk.
+        """
+        stop = self.total if stop is None else stop
+        for chunk_start in range(start, stop, self.chunk_size):
+            codes = self.decode(chunk_start, min(chunk_start + self.chunk_size, stop))
+            yield codes, self.evaluate(codes)
+
+    def prefix_range(self, prefix: Sequence[int]) -> Tuple[int, int]:
+        """
+        Compute the range of product indices of the combinations starting with a prefix.
+
+        Args:
+            prefix (Sequence[int]): Value codes of the first features.
+
+        Returns:
+            Tuple[int, int]: First index of the range and the index after the last one.
+        """
+        domain_sizes = self.plan.domain_sizes
+        start, size = 0, self.total
+        for feature, code in enumerate(prefix):
+            size //= domain_sizes[feature]
+            start += code * size
+        return start, start + size
+
+    def walk(self, valid: bool = True, blocked: bool = True,
+             prefix: Sequence[int] = ()) -> Iterator[Tuple[Optional[str], str]]:
+        """
+        Classify every combination of feature values, in product order.
+
+        Valid configurations are not deduplicated.
+
+        Args:
+            valid (bool): Whether to produce valid configurations.
+            blocked (bool): Whether to produce blocked configurations.
+            prefix (Sequence[int]): Value codes of the first features; only the combinations
+                starting with them are classified.
+
+        Yields:
+            Tuple[Optional[str], str]: The ID of the first blocking constraint (None for a valid
+                configuration) and the formatted configuration.
+        """
+        for selected_codes, selected_blocked_by in self.walk_chunks(valid, blocked, prefix):
+            # Only the emitted rows are converted back to labels, a chunk at a time
+            yield from zip(self.format_statuses(selected_blocked_by), self.format_rows(selected_codes))
+
+    def walk_codes(self, valid: bool = True, blocked: bool = True,
+                   prefix: Sequence[int] = ()) -> Iterator[Tuple[Optional[int], Tuple[int, ...]]]:
+        """
+        Classify every combination of feature values, in product order, as value codes.
+
+        Args:
+            valid (bool): Whether to produce valid configurations.
+            blocked (bool): Whether to produce blocked configurations.
+            prefix (Sequence[int]): Value codes of the first features; only the combinations
+                starting with them are classified.
+
+        Yields:
+            Tuple[Optional[int], Tuple[int, ...]]: Index of the first blocking rule (None for a
+                valid configuration) and the value code of every feature.
+        """
+        for selected_codes, selected_blocked_by in self.walk_chunks(valid, blocked, prefix):
+            yield from zip(self.format_statuses(selected_blocked_by, ids=False), map(tuple, selected_codes.tolist()))
+
+    def walk_chunks(self, valid: bool = True, blocked: bool = True,
+                    prefix: Sequence[int] = ()) -> Iterator[Tuple['np.ndarray', 'np.ndarray']]:
+        """
+        Classify the combinations starting with a prefix and keep the requested rows of every chunk.
+
+        Args:
+            valid (bool): Whether to keep valid configurations.
+            blocked (bool): Whether to keep blocked configurations.
+            prefix (Sequence[int]): Value codes of the first features; only the combinations
+                starting with them are kept.
+
+        Yields:
+            Tuple[np.ndarray, np.ndarray]: Value codes (after `null` actions) of shape (rows,
+                n_features) and first blocking rule, VALID for a valid row, of the kept rows.
+        """
+        for codes, blocked_by in self.iter_chunks(*self.prefix_range(prefix)):
+            if not blocked:
+                rows = np.flatnonzero(blocked_by == VALID)
+            elif not valid:
+                rows = np.flatnonzero(blocked_by != VALID)
+            else:
+                rows = slice(None)
+            yield codes[rows], blocked_by[rows]
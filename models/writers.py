@@ -0,0 +1,202 @@
+import csv
+import json
+import shutil
+import tempfile
+from typing import Callable, Dict, Iterable, Optional, TextIO, Tuple
+
+# A classified configuration: the ID of the first blocking constraint (None if valid) and the configuration
+Row = Tuple[Optional[str], str]
+
+# A checked configuration: the configuration, its status and the blocking constraint ID or the reason it is invalid
+CheckedRow = Tuple[str, str, Optional[str]]
+
+
+def write_text(rows: Iterable[Row], stream: TextIO, valid: bool = True, blocked: bool = True) -> int:
+    """
+    Write classified configurations as the console report: a numbered section of the valid
+    configurations, then a numbered section of the blocked ones.
+
+    The rows are read once: valid configurations are written as they come and blocked ones are
+    spilled to a temporary file, appended after the valid section.
+
+    Args:
+        rows (Iterable[Row]): Classified configurations.
+        stream (TextIO): Destination of the lines.
+        valid (bool): Whether to write the section of the valid configurations.
+        blocked (bool): Whether to write the section of the blocked configurations.
+
+    Returns:
+        int: Number of configurations written.
+    """
+    valid_count = blocked_count = 0
+    if valid:
+        stream.write("\nValid configurations:\n")
+    with tempfile.TemporaryFile('w+', encoding='utf-8', newline='') as spill:
+        for constraint_id, config in rows:
+            if constraint_id is None:
+                if valid:
+                    valid_count += 1
+                    stream.write(f"{valid_count}. {config}\n")
+            elif blocked:
+                blocked_count += 1
+                spill.write(f"{blocked_count}. Blocked by ({constraint_id}): {config}\n")
+
+        if blocked:
+            stream.write("\nBlocked configurations:\n")
+            spill.seek(0)
+            shutil.copyfileobj(spill, stream)
+    return valid_count + blocked_count
+
+
+def _csv_field(value: str) -> str:
+    """
+    Quote a CSV field as `csv.writer` does by default, only when it contains a separator, a quote
+    or a line break.
+    """
+    if ',' in value or '"' in value or '\r' in value or '\n' in value:
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def write_csv(rows: Iterable[Row], stream: TextIO) -> int:
+    """
+    Write classified configurations as CSV with a `status,constraint_id,configuration` header.
+
+    Args:
+        rows (Iterable[Row]): Classified configurations.
+        stream (TextIO): Destination of the records, opened with `newline=''`.
+
+    Returns:
+        int: Number of configurations written.
+    """
+    count = 0
+    # The status fields are formatted once per constraint
+    prefixes: Dict[Optional[str], str] = {None: 'valid,,'}
+
+    def lines():
+        nonlocal count
+        for count, (constraint_id, config) in enumerate(rows, start=1):
+            prefix = prefixes.get(constraint_id)
+            if prefix is None:
+                prefix = prefixes[constraint_id] = f"blocked,{_csv_field(str(constraint_id))},"
+            yield f"{prefix}{_csv_field(config)}\r\n"
+
+    csv.writer(stream).writerow(('status', 'constraint_id', 'configuration'))
+    stream.writelines(lines())
+    return count
+
+
+def write_jsonl(rows: Iterable[Row], stream: TextIO) -> int:
+    """
+    Write classified configurations as one JSON object per line.
+
+    Args:
+        rows (Iterable[Row]): Classified configurations.
+        stream (TextIO): Destination of the lines.
+
+    Returns:
+        int: Number of configurations written.
+    """
+    count = 0
+    # Only the configuration changes between lines, the status fields are encoded once per constraint
+    prefixes: Dict[Optional[str], str] = {None: '{"status": "valid", "constraint_id": null, "configuration": '}
+
+    def lines():
+        nonlocal count
+        for count, (constraint_id, config) in enumerate(rows, start=1):
+            prefix = prefixes.get(constraint_id)
+            if prefix is None:
+                prefix = prefixes[constraint_id] = (
+                    f'{{"status": "blocked", "constraint_id": {json.dumps(constraint_id, ensure_ascii=False)}, "configuration": '
+                )
+            yield f"{prefix}{json.dumps(config, ensure_ascii=False)}}}\n"
+
+    stream.writelines(lines())
+    return count
+
+
+WRITERS: Dict[str, Callable[[Iterable[Row], TextIO], int]] = {
+    'text': write_text,
+    'csv': write_csv,
+    'jsonl': write_jsonl,
+}
+
+
+def write_checked_text(rows: Iterable[CheckedRow], stream: TextIO) -> int:
+    """
+    Write checked configurations as numbered lines, in the style of `write_text`.
+
+    Args:
+        rows (Iterable[CheckedRow]): Checked configurations.
+        stream (TextIO): Destination of the lines.
+
+    Returns:
+        int: Number of configurations written.
+    """
+    count = 0
+
+    def lines():
+        nonlocal count
+        for count, (config, status, detail) in enumerate(rows, start=1):
+            if detail is None:
+                yield f"{count}. {config}\n"
+            elif status == 'blocked':
+                yield f"{count}. Blocked by ({detail}): {config}\n"
+            else:
+                yield f"{count}. Invalid ({detail}): {config}\n"
+
+    stream.writelines(lines())
+    return count
+
+
+def write_checked_csv(rows: Iterable[CheckedRow], stream: TextIO) -> int:
+    """
+    Write checked configurations as CSV with a `status,detail,configuration` header.
+
+    Args:
+        rows (Iterable[CheckedRow]): Checked configurations.
+        stream (TextIO): Destination of the records, opened with `newline=''`.
+
+    Returns:
+        int: Number of configurations written.
+    """
+    count = 0
+
+    def records():
+        nonlocal count
+        for count, (config, status, detail) in enumerate(rows, start=1):
+            yield status, detail or '', config
+
+    writer = csv.writer(stream)
+    writer.writerow(('status', 'detail', 'configuration'))
+    writer.writerows(records())
+    return count
+
+
+def write_checked_jsonl(rows: Iterable[CheckedRow], stream: TextIO) -> int:
+    """
+    Write checked configurations as one JSON object per line.
+
+    Args:
+        rows (Iterable[CheckedRow]): Checked configurations.
+        stream (TextIO): Destination of the lines.
+
+    Returns:
+        int: Number of configurations written.
+    """
+    count = 0
+
+    def lines():
+        nonlocal count
+        for count, (config, status, detail) in enumerate(rows, start=1):
+            yield json.dumps({'status': status, 'detail': detail, 'configuration': config}, ensure_ascii=False) + '\n'
+
+    stream.writelines(lines())
+    return count
+
+
+CHECKED_WRITERS: Dict[str, Callable[[Iterable[CheckedRow], TextIO], int]] = {
+    'text': write_checked_text,
+    'csv': write_checked_csv,
+    'jsonl': write_checked_jsonl,
+}
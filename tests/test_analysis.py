@@ -0,0 +1,88 @@
+from models.analysis import analyse_constraints, dead_rules, format_findings
+from tests.test_engines import conditional, feature
+
+FEATURES = [feature('A', ['a1', 'a2', 'a3']), feature('B', ['b1', 'b2']), feature('C', ['c1', 'c2'])]
+
+
+def domain(constraint_id: str, name: str, allowed_values: list) -> dict:
+    return {'id': constraint_id, 'rule_type': 'domain', 'feature': name, 'allowed_values': allowed_values}
+
+
+def report(constraints: list) -> list:
+    return format_findings(analyse_constraints(FEATURES, constraints))
+
+
+def test_rule_never_reached():
+    constraints = [
+        domain('c0', 'A', ['a1', 'a2']),
+        conditional('c1', [{'feature': 'A', 'value': 'a3'}], [{'feature': 'B', 'mode': 'null'}]),
+        conditional('c2', [{'feature': 'A', 'value': 'a1'}], [{'feature': 'B', 'mode': 'block', 'allowed_values': ['b1', 'b2']}]),
+        domain('c3', 'A', ['a1', 'a2', 'a3']),
+    ]
+    assert report(constraints) == [
+        "c1: never_matches (dead): The conditions on 'A' can never match",
+        "c2: redundant (dead): No action can block or null a value",
+        "c3: redundant (dead): Allows every value of feature 'A' it can hold",
+    ]
+    assert dead_rules(analyse_constraints(FEATURES, constraints)) == [1, 2, 3]
+
+
+def test_null_value_reaches_later_rules():
+    constraints = [
+        conditional('c0', [{'feature': 'A', 'value': 'a1'}], [{'feature': 'B', 'mode': 'null'}]),
+        conditional('c1', [{'feature': 'B', 'value': 'None'}], [{'feature': 'C', 'mode': 'block', 'allowed_values': ['c1']}]),
+        domain('c2', 'B', ['b1', 'b2']),
+    ]
+    # Only the null action makes B None, so c1 can match and c2 can block
+    assert report(constraints) == []
+
+
+def test_rule_always_blocks():
+    constraints = [
+        domain('c0', 'A', ['a1', 'a2']),
+        conditional('c1', [], [{'feature': 'A', 'mode': 'block', 'allowed_values': ['a3']}]),
+        conditional('c2', [{'feature': 'B', 'value': 'b1'}], [{'feature': 'Typo', 'mode': 'null'}]),
+        domain('c3', 'C', ['c1']),
+    ]
+    assert report(constraints) == [
+        "c1: always_blocks: The action on 'A' allows no value it can hold",
+        "c2: unknown_feature: Unknown feature 'Typo'",
+        "c2: unreachable (dead): Never reached, every configuration is blocked by c1",
+        "c3: unreachable (dead): Never reached, every configuration is blocked by c1",
+    ]
+    assert report([domain('c0', 'B', []), domain('c1', 'Typo', ['x'])]) == [
+        "c0: always_blocks: Allows no value of feature 'B' it can hold",
+        "c1: unknown_feature: Unknown feature 'Typo'",
+        "c1: unreachable (dead): Never reached, every configuration is blocked by c0",
+    ]
+
+
+def test_overlapping_rules():
+    constraints = [
+        conditional('c0', [{'feature': 'A', 'value': 'a1'}], [{'feature': 'B', 'mode': 'block', 'allowed_values': ['b1']}]),
+        # Blocks a1/b2 when C is c2, a subset of what c0 blocks
+        conditional('c1', [{'feature': 'A', 'value': 'a1'}, {'feature': 'C', 'value': 'c2'}],
+                    [{'feature': 'B', 'mode': 'block', 'allowed_values': ['b1']}]),
+        # Overlaps c0 on a1/b2 when C is c1, but also blocks a2/b2 and a3/b2
+        conditional('c2', [{'feature': 'C', 'value': 'c1'}], [{'feature': 'B', 'mode': 'block', 'allowed_values': ['b1']}]),
+        domain('c3', 'B', ['b1']),
+    ]
+    assert report(constraints) == [
+        "c1: subsumed (dead): Every configuration it blocks is blocked by c0",
+    ]
+    assert dead_rules(analyse_constraints(FEATURES, constraints)) == [1]
+
+
+def test_unknown_references():
+    constraints = [
+        domain('c0', 'A', ['a1', 'a4']),
+        conditional('c1', [{'feature': 'Typo', 'value': 'x'}], [{'feature': 'B', 'mode': 'null'}]),
+        {'id': 'c2', 'rule_type': 'unknown'},
+        {'id': 'c3', 'rule_type': 'domain', 'feature': 'A'},
+    ]
+    assert report(constraints) == [
+        "c0: unknown_value: Unknown allowed value 'a4' of feature 'A'",
+        "c1: unknown_feature: Unknown feature 'Typo'",
+        "c2: unknown_rule_type: Unknown constraint type unknown",
+        "c3: malformed: Missing key 'allowed_values'",
+    ]
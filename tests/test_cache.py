@@ -0,0 +1,103 @@
+import json
+import os
+
+from models import cache as cache_module
+from models.cache import COUNTS_FILE, RESULTS_FILE, ResultCache, project_key
+from models.classifier import ConfigurationGenerator
+from tests.test_engines import conditional, feature
+
+FEATURES = [feature('A', ['a1', 'a2']), feature('B', ['b1', 'b2'])]
+CONSTRAINTS = [
+    conditional('c1', [{'feature': 'A', 'value': 'a1'}], [{'feature': 'B', 'mode': 'block', 'allowed_values': ['b1']}]),
+]
+
+
+def write_project(path, features: list, constraints: list) -> str:
+    path.write_text(json.dumps({'features': features, 'constraints': constraints}), encoding='utf-8')
+    return str(path)
+
+
+def store_bytes(cache: ResultCache, key: str, size: int):
+    def write(path: str):
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+
+    cache.store(key, RESULTS_FILE, write)
+
+
+def test_miss_then_hit(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    key = project_key(FEATURES, CONSTRAINTS)
+    assert cache.lookup(key, COUNTS_FILE) is None
+    assert cache.load_counts(key) == {}
+
+    cache.store_counts(key, {'valid': 3})
+    assert cache.lookup(key, COUNTS_FILE) == cache.entry_path(key, COUNTS_FILE)
+    assert cache.load_counts(key) == {'valid': 3}
+
+
+def test_generator_reuses_cached_results(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    path = write_project(tmp_path / 'project.json', FEATURES, CONSTRAINTS)
+    first = ConfigurationGenerator(path, cache=cache)
+    expected = first.calculate_valid_configurations()
+    assert first.count_valid() == 3
+
+    second = ConfigurationGenerator(path, cache=cache)
+
+    def recompute(*args, **kwargs):
+        raise AssertionError('A hit never counts nor classifies again')
+
+    second._counter.count_valid = second._walker.walk = second._walker.walk_codes = recompute
+    assert second.count_valid() == 3
+    assert second.calculate_valid_configurations() == expected
+
+
+def test_key_follows_project_content():
+    key = project_key(FEATURES, CONSTRAINTS)
+    described = [dict(FEATURES[0], description='first', group='G')] + FEATURES[1:]
+    assert project_key(described, [dict(CONSTRAINTS[0], description='c1')]) == key
+
+    extended = [feature('A', ['a1', 'a2', 'a3'])] + FEATURES[1:]
+    assert project_key(extended, CONSTRAINTS) != key
+    assert project_key(FEATURES, []) != key
+
+
+def test_edited_project_misses(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    path = write_project(tmp_path / 'project.json', FEATURES, CONSTRAINTS)
+    assert ConfigurationGenerator(path, cache=cache).count_valid() == 3
+
+    write_project(tmp_path / 'project.json', FEATURES, [])
+    assert ConfigurationGenerator(path, cache=cache).count_valid() == 4
+    assert len(os.listdir(cache.directory)) == 2
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    for age, key in enumerate(['old', 'used', 'new']):
+        store_bytes(cache, key, 100)
+        os.utime(os.path.join(cache.directory, key), (age, age))
+    cache.max_bytes = 250
+    # Looking an entry up makes it the most recently used one
+    assert cache.lookup('old', RESULTS_FILE) is not None
+
+    store_bytes(cache, 'newest', 100)
+    assert sorted(os.listdir(cache.directory)) == ['newest', 'old']
+
+
+def test_evict_skips_entries_removed_meanwhile(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    store_bytes(cache, 'a', 100)
+    store_bytes(cache, 'b', 100)
+    cache.max_bytes = 150
+    getsize = os.path.getsize
+
+    def vanishing_getsize(path: str) -> int:
+        if os.sep + 'a' + os.sep in path:
+            raise FileNotFoundError(path)
+        return getsize(path)
+
+    monkeypatch.setattr(cache_module.os.path, 'getsize', vanishing_getsize)
+    cache.evict()
+    assert sorted(os.listdir(cache.directory)) == ['a', 'b']
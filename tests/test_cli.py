@@ -0,0 +1,124 @@
+import csv
+import io
+import json
+import re
+
+import pytest
+
+from create_configurations import parse_arguments
+from models.writers import write_csv
+from tests.test_engines import conditional, feature
+
+FEATURES = [feature('A', ['a1', 'a2']), feature('B', ['b1', 'b2', 'b3']), feature('C', ['c1', 'c2'])]
+CONSTRAINTS = [
+    {'id': 'c0', 'rule_type': 'domain', 'feature': 'B', 'allowed_values': ['b1', 'b2']},
+    conditional('c1', [{'feature': 'A', 'value': 'a1'}], [{'feature': 'C', 'mode': 'block', 'allowed_values': ['c1']}]),
+    conditional('c2', [{'feature': 'A', 'value': 'a2'}], [{'feature': 'C', 'mode': 'null'}]),
+]
+for constraint in CONSTRAINTS:
+    constraint['description'] = f"Constraint {constraint['id']}"
+
+
+@pytest.fixture
+def project(tmp_path) -> str:
+    path = tmp_path / 'project.json'
+    path.write_text(json.dumps({'features': FEATURES, 'constraints': CONSTRAINTS}), encoding='utf-8')
+    return str(path)
+
+
+def run(tmp_path, project: str, *options: str) -> str:
+    output = tmp_path / 'output'
+    parse_arguments([project, '--output', str(output), *options])
+    return output.read_text(encoding='utf-8')
+
+
+def text_rows(text: str) -> list:
+    """
+    Read the classified rows back from the sections of the console report, valid section first.
+    """
+    rows = []
+    section = None
+    for line in text.splitlines():
+        if line.endswith(':') and not line[:1].isdigit():
+            section = line
+        elif section == 'Valid configurations:' and line:
+            rows.append(('valid', '', line.split('. ', 1)[1]))
+        elif section == 'Blocked configurations:' and line:
+            constraint_id, config = re.fullmatch(r'\d+\. Blocked by \((.*)\): (.*)', line).groups()
+            rows.append(('blocked', constraint_id, config))
+    return rows
+
+
+def by_section(rows: list) -> list:
+    return [row for row in rows if row[0] == 'valid'] + [row for row in rows if row[0] == 'blocked']
+
+
+def test_csv_and_jsonl_match_text(tmp_path, project):
+    expected = text_rows(run(tmp_path, project))
+    assert len(expected) == 10
+
+    records = list(csv.reader(run(tmp_path, project, '--format', 'csv').splitlines()))
+    assert records[0] == ['status', 'constraint_id', 'configuration']
+    assert by_section([tuple(record) for record in records[1:]]) == expected
+
+    lines = [json.loads(line) for line in run(tmp_path, project, '--format', 'jsonl').splitlines()]
+    assert by_section([(line['status'], line['constraint_id'] or '', line['configuration']) for line in lines]) == expected
+
+
+@pytest.mark.parametrize('output_format', ['text', 'csv', 'jsonl'])
+def test_only_filters_rows(tmp_path, project, output_format):
+    expected = text_rows(run(tmp_path, project))
+    for only, status in (('valid', 'blocked'), ('blocked', 'valid')):
+        output = run(tmp_path, project, '--format', output_format, '--only', only)
+        if output_format == 'text':
+            rows = text_rows(output)
+        elif output_format == 'csv':
+            rows = by_section([tuple(record) for record in list(csv.reader(output.splitlines()))[1:]])
+        else:
+            rows = by_section([(line['status'], line['constraint_id'] or '', line['configuration'])
+                               for line in map(json.loads, output.splitlines())])
+        assert rows == [row for row in expected if row[0] != status]
+
+
+def test_limit_stops_early(tmp_path):
+    # 10^30 combinations: the run only ends if the classification stops after the limit
+    features = [feature(f'F{idx}', [f'v{code}' for code in range(10)]) for idx in range(30)]
+    constraints = [{'id': 'c0', 'rule_type': 'domain', 'feature': 'F29', 'allowed_values': ['v0'], 'description': ''}]
+    path = tmp_path / 'project.json'
+    path.write_text(json.dumps({'features': features, 'constraints': constraints}), encoding='utf-8')
+
+    lines = run(tmp_path, str(path), '--format', 'jsonl', '--limit', '3').splitlines()
+    assert [json.loads(line)['status'] for line in lines] == ['valid', 'blocked', 'blocked']
+    assert len(text_rows(run(tmp_path, str(path), '--limit', '3'))) == 3
+
+
+def test_rejects_negative_limit(project):
+    with pytest.raises(SystemExit):
+        parse_arguments([project, '--limit', '-1'])
+
+
+def test_csv_quotes_like_the_csv_module():
+    rows = [(None, 'a,b/c'), ('c"1', 'x/"y"'), (None, 'line\nbreak'), ('c2', ''), (None, 'plain/x')]
+    stream = io.StringIO(newline='')
+    assert write_csv(rows, stream) == len(rows)
+    assert list(csv.reader(io.StringIO(stream.getvalue(), newline=''))) == [
+        ['status', 'constraint_id', 'configuration'],
+        ['valid', '', 'a,b/c'],
+        ['blocked', 'c"1', 'x/"y"'],
+        ['valid', '', 'line\nbreak'],
+        ['blocked', 'c2', ''],
+        ['valid', '', 'plain/x'],
+    ]
+
+
+def test_validate_mode(tmp_path, project):
+    lines = tmp_path / 'lines.txt'
+    lines.write_text('a1/b1/c1\na1/b3/c1\na1/x/c1\n', encoding='utf-8')
+    output = run(tmp_path, project, '--validate', '--input', str(lines), '--format', 'jsonl').splitlines()
+    assert [json.loads(line)['status'] for line in output] == ['valid', 'blocked', 'invalid']
+
+
+@pytest.mark.parametrize('options', [['--validate', '--limit', '1'], ['--validate', '--format', 'packed'], ['--input', 'x']])
+def test_rejects_options_of_the_other_mode(project, options):
+    with pytest.raises(SystemExit):
+        parse_arguments([project, *options])
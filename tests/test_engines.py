@@ -0,0 +1,338 @@
+import copy
+import json
+import random
+import time
+from collections import Counter
+from itertools import product
+
+import pytest
+
+from benchmarks.generator import generate_project
+from models.classifier import ConfigurationGenerator
+from models.counting import ConfigurationCounter
+from models.plan import CompiledPlan
+
+ENGINE_OPTIONS = [
+    pytest.param({'engine': 'search'}, id='search'),
+    pytest.param({'engine': 'search', 'workers': 2}, id='search-workers'),
+    pytest.param({'engine': 'search', 'drop_dead_rules': True}, id='search-drop-dead'),
+    pytest.param({'engine': 'vectorized'}, id='vectorized'),
+    pytest.param({'engine': 'vectorized', 'reorder': True}, id='vectorized-reorder'),
+    pytest.param({'engine': 'vectorized', 'workers': 2}, id='vectorized-workers'),
+    pytest.param({'engine': 'incremental'}, id='incremental'),
+    pytest.param({'profile': True}, id='profile'),
+]
+
+
+def make_generator(tmp_path, features: list, constraints: list, **options) -> ConfigurationGenerator:
+    """
+    Write a project file and open it, skipping the NumPy engines when numpy is not installed.
+    """
+    if options.get('engine') in ('vectorized', 'incremental'):
+        pytest.importorskip('numpy')
+    path = tmp_path / 'project.json'
+    path.write_text(json.dumps({'features': features, 'constraints': constraints}), encoding='utf-8')
+    return ConfigurationGenerator(str(path), **options)
+
+
+def feature(name: str, domain: list) -> dict:
+    return {'name': name, 'domain': domain}
+
+
+def conditional(constraint_id: str, conditions: list, actions: list) -> dict:
+    return {'id': constraint_id, 'rule_type': 'conditional', 'conditions': conditions, 'actions': actions}
+
+
+TYPO_FEATURES = [feature('A', ['a1', 'a2']), feature('B', ['b1', 'b2'])]
+TYPO_CONSTRAINTS = [
+    conditional('c1', [{'feature': 'A', 'value': 'a1'}], [{'feature': 'Typo', 'mode': 'null'}]),
+    conditional('c2', [{'feature': 'A', 'value': 'zz'}], [{'feature': 'Typo', 'mode': 'block', 'allowed_values': []}]),
+]
+
+
+@pytest.mark.parametrize('options', ENGINE_OPTIONS)
+def test_unknown_features_never_read(tmp_path, options):
+    generator = make_generator(tmp_path, TYPO_FEATURES, TYPO_CONSTRAINTS, **options)
+    assert generator.calculate_valid_configurations() == (['a1/b1', 'a1/b2', 'a2/b1', 'a2/b2'], [])
+    assert generator.count_valid() == 4
+
+
+@pytest.mark.parametrize('options', ENGINE_OPTIONS)
+def test_unknown_feature_read_raises(tmp_path, options):
+    constraints = TYPO_CONSTRAINTS + [
+        conditional('c3', [{'feature': 'B', 'value': 'b2'}], [{'feature': 'Typo', 'mode': 'block', 'allowed_values': []}]),
+    ]
+    generator = make_generator(tmp_path, TYPO_FEATURES, constraints, **options)
+    with pytest.raises(KeyError):
+        generator.calculate_valid_configurations()
+    with pytest.raises(KeyError):
+        list(generator.iter_valid_configurations())
+    with pytest.raises(KeyError):
+        list(generator.iter_valid_configurations(offset=1))
+
+
+@pytest.mark.parametrize('options', ENGINE_OPTIONS)
+def test_unknown_feature_behind_blocking_rule(tmp_path, options):
+    constraints = [{'id': 'c0', 'rule_type': 'domain', 'feature': 'B', 'allowed_values': ['b1']}] + TYPO_CONSTRAINTS + [
+        conditional('c3', [{'feature': 'B', 'value': 'b2'}], [{'feature': 'Typo', 'mode': 'block', 'allowed_values': []}]),
+    ]
+    generator = make_generator(tmp_path, TYPO_FEATURES, constraints, **options)
+    assert generator.calculate_valid_configurations() == (['a1/b1', 'a2/b1'], [('c0', 'a1/b2'), ('c0', 'a2/b2')])
+
+
+@pytest.mark.parametrize('options', ENGINE_OPTIONS)
+def test_empty_domain_never_raises(tmp_path, options):
+    features = [feature('A', [])] + TYPO_FEATURES[1:]
+    constraints = [{'id': 'c0', 'rule_type': 'unknown'}] + TYPO_CONSTRAINTS
+    generator = make_generator(tmp_path, features, constraints, **options)
+    assert generator.calculate_valid_configurations() == ([], [])
+    assert generator.count_valid() == 0
+
+
+@pytest.mark.parametrize('options', ENGINE_OPTIONS)
+def test_edit_adding_unknown_feature_read(tmp_path, options):
+    generator = make_generator(tmp_path, TYPO_FEATURES, TYPO_CONSTRAINTS, **options)
+    assert generator.calculate_valid_configurations() == (['a1/b1', 'a1/b2', 'a2/b1', 'a2/b2'], [])
+    generator.add_constraint(
+        conditional('c3', [{'feature': 'B', 'value': 'b2'}], [{'feature': 'Typo', 'mode': 'block', 'allowed_values': []}])
+    )
+    with pytest.raises(KeyError):
+        generator.calculate_valid_configurations()
+    generator.remove_constraint('c3')
+    assert generator.calculate_valid_configurations() == (['a1/b1', 'a1/b2', 'a2/b1', 'a2/b2'], [])
+
+
+def reference(features: list, constraints: list) -> tuple:
+    """
+    Classify every combination of the full product with dictionaries, as the first version of
+    the classifier did.
+    """
+    names = [feature['name'] for feature in features]
+    valid, blocked = [], []
+    for combination in product(*[feature['domain'] for feature in features]):
+        config = dict(zip(names, combination))
+        blocked_by = None
+        for constraint in constraints:
+            if constraint['rule_type'] == 'conditional':
+                if all(config[condition['feature']] == condition['value'] for condition in constraint['conditions']):
+                    for action in constraint['actions']:
+                        if action['mode'] == 'block':
+                            allowed_values = action['allowed_values']
+                            if config[action['feature']] not in allowed_values:
+                                blocked_by = constraint['id']
+                                break
+                        elif action['mode'] == 'null':
+                            config[action['feature']] = 'None'
+            elif constraint['rule_type'] == 'domain':
+                if config[constraint['feature']] not in constraint['allowed_values']:
+                    blocked_by = constraint['id']
+            else:
+                raise Exception(f'Unknown constraint type {constraint["rule_type"]}')
+            if blocked_by is not None:
+                break
+
+        formatted_config = '/'.join(config[name] for name in names)
+        if blocked_by is not None:
+            blocked.append((blocked_by, formatted_config))
+        elif formatted_config not in valid:
+            valid.append(formatted_config)
+    return valid, blocked
+
+
+def outcome(classify) -> object:
+    """
+    Call a function, returning the type of the exception it raises instead of failing.
+    """
+    try:
+        return classify()
+    except Exception as error:
+        return type(error)
+
+
+def random_reference(rng: random.Random, n_features: int, read_unknown: float = 0.05) -> str:
+    """
+    Pick a feature name, sometimes one that is not a feature of the project.
+    """
+    return 'Typo' if rng.random() < read_unknown else f'F{rng.randrange(n_features)}'
+
+
+def random_constraint(rng: random.Random, features: list, constraint_id: str) -> dict:
+    """
+    Draw a domain or conditional constraint; `null` actions often target features before the
+    conditions, which null values already assigned.
+
+    `null` actions on an unknown feature target a name that is never read: the classifier leaves
+    them out, where the first version added the name to the configuration and a later read of it
+    saw the null value.
+    """
+    n_features = len(features)
+
+    def values(name: str) -> list:
+        domain = features[int(name[1:])]['domain'] if name != 'Typo' else ['x']
+        return domain + ['None']
+
+    if rng.random() < 0.25:
+        name = random_reference(rng, n_features)
+        return {'id': constraint_id, 'rule_type': 'domain', 'feature': name,
+                'allowed_values': rng.sample(values(name), rng.randint(0, len(values(name))))}
+
+    conditions = []
+    for _ in range(rng.randint(0, 2)):
+        name = random_reference(rng, n_features)
+        conditions.append({'feature': name, 'value': rng.choice(values(name))})
+    actions = []
+    for _ in range(rng.randint(1, 3)):
+        if rng.random() < 0.4:
+            name = 'Gone' if rng.random() < 0.05 else f'F{rng.randrange(n_features)}'
+            actions.append({'feature': name, 'mode': 'null'})
+        else:
+            name = random_reference(rng, n_features)
+            actions.append({'feature': name, 'mode': 'block',
+                            'allowed_values': rng.sample(values(name), rng.randint(0, len(values(name))))})
+    return conditional(constraint_id, conditions, actions)
+
+
+def random_project(seed: int) -> tuple:
+    """
+    Draw a small project: some domains are empty, contain the literal None or repeat a value.
+    """
+    rng = random.Random(seed)
+    features = []
+    for feature_idx in range(rng.randint(1, 5)):
+        domain = [f'v{feature_idx}_{code}' for code in range(0 if rng.random() < 0.03 else rng.randint(1, 4))]
+        if domain and rng.random() < 0.1:
+            domain[rng.randrange(len(domain))] = 'None'
+        if len(domain) > 1 and rng.random() < 0.05:
+            domain[1] = domain[0]
+        features.append(feature(f'F{feature_idx}', domain))
+    constraints = [random_constraint(rng, features, f'c{idx}') for idx in range(rng.randint(0, 7))]
+    return features, constraints
+
+
+SEEDS = range(60)
+
+
+@pytest.mark.parametrize('options', ENGINE_OPTIONS)
+def test_engines_match_reference(tmp_path, options):
+    for seed in SEEDS:
+        features, constraints = random_project(seed)
+        expected = outcome(lambda: reference(features, constraints))
+        generator = make_generator(tmp_path, features, constraints, **options)
+        assert outcome(generator.calculate_valid_configurations) == expected, seed
+
+
+@pytest.mark.parametrize('options', ENGINE_OPTIONS)
+def test_parts_match_classification(tmp_path, options):
+    for seed in SEEDS:
+        features, constraints = random_project(seed)
+        generator = make_generator(tmp_path, features, constraints, **options)
+        expected = outcome(lambda: list(generator.iter_classified_codes()))
+        if isinstance(expected, type):
+            continue
+        total = 1
+        for size in generator.plan.domain_sizes:
+            total *= size
+
+        rows, classified = [], []
+        for done, part in generator.iter_classified_parts(parts=4):
+            rows.extend(part)
+            classified.append(done)
+        assert rows == expected, seed
+        assert classified == sorted(classified) and classified[-1:] in ([total], []), seed
+
+
+def test_counting_matches_reference(tmp_path):
+    for seed in SEEDS:
+        features, constraints = random_project(seed)
+        expected = outcome(lambda: reference(features, constraints))
+        generator = make_generator(tmp_path, features, constraints)
+        if isinstance(expected, type):
+            assert outcome(generator.count_valid) == expected, seed
+            continue
+
+        valid, blocked = expected
+        assert generator.count_valid() == len(valid), seed
+        counts = {constraint_id: count for constraint_id, count in generator.count_blocked_by().items() if count}
+        assert counts == Counter(constraint_id for constraint_id, _ in blocked), seed
+        assert [generator.get_valid_configuration(k) for k in range(len(valid))] == valid, seed
+        with pytest.raises(IndexError):
+            generator.get_valid_configuration(len(valid))
+        for offset in range(len(valid) + 1):
+            assert list(generator.iter_valid_configurations(offset, 2)) == valid[offset:offset + 2], seed
+        if valid:
+            samples = generator.sample_valid(20, seed=seed)
+            assert set(samples) <= set(valid), seed
+            # The draws are served sorted, but come back in the order they were drawn
+            assert generator.sample_valid(7, seed=seed) == samples[:7], seed
+
+
+@pytest.mark.parametrize('domains', [
+    [['a', 'b', 'a'], ['None', 'c'], ['d', 'd']],
+    [['a', 'a/b'], ['b/c', 'c'], ['c', 'd']],
+])
+def test_count_all_merges_ambiguous_labels(tmp_path, domains):
+    features = [feature(f'F{idx}', domain) for idx, domain in enumerate(domains)]
+    generator = make_generator(tmp_path, features, [])
+    assert generator.count_all() == len({'/'.join(combination) for combination in product(*domains)})
+
+
+@pytest.mark.parametrize('null_fraction', [0.0, 0.2])
+def test_counting_scales_with_rules_on_distant_features(null_fraction):
+    # 40 rules on random pairs of 60 features: in sequence order most of them are open at every
+    # depth and the memoized nodes double with each, reordered they close soon after they open
+    project = generate_project(60, 4, 2, 40, 1, null_fraction, seed=1)
+    counter = ConfigurationCounter(CompiledPlan(project['features'], project['constraints']))
+    valid = counter.count_valid()
+    blocked = sum(counter.count_blocked_by().values())
+    assert len(counter._reordered._memo) < 5000
+    if not null_fraction:
+        assert valid + blocked == 4 ** 60
+    assert len(counter.sample_valid(100, seed=1)) == 100
+
+
+def test_paging_scales_with_rules_on_distant_features():
+    # Paged over the sequence order the memoized nodes of this project reach hundreds of
+    # thousands; over the reordered counter a page costs a count per value of every feature
+    project = generate_project(50, 4, 2, 33, 1, 0.0, seed=1)
+    counter = ConfigurationCounter(CompiledPlan(project['features'], project['constraints']))
+    started = time.perf_counter()
+    total = counter.count_valid()
+    page = list(counter.iter_valid(total // 2, 5))
+    assert time.perf_counter() - started < 10
+    assert len(page) == 5 and page == sorted(page)
+    assert list(counter.iter_valid(total // 2 + 3, 1)) == page[3:4]
+    assert len(list(counter.iter_valid(total - 1))) == 1
+
+
+@pytest.mark.parametrize('options', [
+    pytest.param({'engine': 'search'}, id='search'),
+    pytest.param({'engine': 'incremental'}, id='incremental'),
+    pytest.param({'engine': 'incremental', 'reorder': True, 'drop_dead_rules': True}, id='incremental-reorder-drop-dead'),
+])
+def test_edits_match_reference(tmp_path, options):
+    for seed in SEEDS:
+        features, constraints = random_project(seed)
+        rng = random.Random(seed)
+        generator = make_generator(tmp_path, features, constraints, **options)
+        outcome(generator.calculate_valid_configurations)
+        for step in range(5):
+            operation = rng.randrange(4)
+            constraint_ids = [constraint['id'] for constraint in generator.constraints]
+            if operation == 0:
+                constraint = random_constraint(rng, generator.features, f'n{step}')
+                generator.add_constraint(constraint, rng.randrange(len(constraint_ids) + 1))
+            elif operation == 1 and constraint_ids:
+                generator.remove_constraint(rng.choice(constraint_ids))
+            elif operation == 2 and constraint_ids:
+                constraint_id = rng.choice(constraint_ids)
+                constraint = random_constraint(rng, generator.features, constraint_id)
+                generator.update_constraint(constraint_id, constraint)
+            else:
+                name = rng.choice(generator.features)['name']
+                generator.add_domain_value(name, rng.choice([f'x{step}', 'None']))
+
+            expected = outcome(lambda: reference(copy.deepcopy(generator.features), generator.constraints))
+            assert outcome(generator.calculate_valid_configurations) == expected, (seed, step)
+            if not isinstance(expected, type):
+                counts = {constraint_id: count for constraint_id, count in generator.count_blocked_by().items() if count}
+                assert counts == Counter(constraint_id for constraint_id, _ in expected[1]), (seed, step)
@@ -0,0 +1,56 @@
+from models.ordering import evaluation_order, feature_order
+from models.plan import CompiledPlan
+from models.profiling import ProfileStats
+from tests.test_engines import conditional, feature
+
+FEATURES = [feature('A', ['a1', 'a2', 'a3', 'a4']), feature('B', ['b1', 'b2'])]
+CONSTRAINTS = [
+    {'id': 'c0', 'rule_type': 'domain', 'feature': 'A', 'allowed_values': ['a1', 'a2', 'a3']},
+    conditional('c1', [{'feature': 'A', 'value': 'a1'}], [{'feature': 'B', 'mode': 'block', 'allowed_values': ['b1']}]),
+]
+
+
+def measured(blocked: list, seconds: list) -> ProfileStats:
+    stats = ProfileStats(['c0', 'c1'])
+    for constraint, n_blocked, n_seconds in zip(stats.constraints, blocked, seconds):
+        constraint.evaluated = 100
+        constraint.matched = 100
+        constraint.blocked = n_blocked
+        constraint.seconds = n_seconds
+    return stats
+
+
+def test_order_uses_estimates_without_stats():
+    plan = CompiledPlan(FEATURES, CONSTRAINTS)
+    # c0 blocks 1/4 of the configurations in one lookup, c1 blocks 1/8 in two
+    assert evaluation_order(plan).early == (0, 1)
+
+
+def test_order_takes_only_selectivity_from_stats():
+    plan = CompiledPlan(FEATURES, CONSTRAINTS)
+    assert evaluation_order(plan, measured([10, 60], [0.001, 0.001])).early == (1, 0)
+    # A timing below the clock resolution does not make a rule free or worthless
+    assert evaluation_order(plan, measured([60, 10], [0.0, 1.0])).early == (0, 1)
+    assert evaluation_order(plan, measured([10, 60], [0.0, 0.0])).early == (1, 0)
+
+
+def test_feature_order_keeps_rules_narrow():
+    features = [feature(name, ['x', 'y']) for name in 'ABCDE']
+    constraints = [
+        conditional('c0', [{'feature': 'A', 'value': 'x'}], [{'feature': 'E', 'mode': 'block', 'allowed_values': ['x']}]),
+        conditional('c1', [{'feature': 'B', 'value': 'x'}], [{'feature': 'D', 'mode': 'null'}]),
+        {'id': 'c2', 'rule_type': 'domain', 'feature': 'C', 'allowed_values': ['x']},
+    ]
+    # C opens no rule and goes first, then E right after A and D right after B close their rules
+    assert feature_order(CompiledPlan(features, constraints)) == [2, 0, 4, 1, 3]
+    # Without rules spanning features the sequence order is kept
+    assert feature_order(CompiledPlan(features, constraints[2:])) == [0, 1, 2, 3, 4]
+
+
+def test_reordered_plan_classifies_the_same():
+    plan = CompiledPlan(FEATURES, CONSTRAINTS)
+    reordered = plan.reordered([1, 0])
+    assert reordered.feature_sequence == ['B', 'A']
+    for a_code in range(4):
+        for b_code in range(2):
+            assert reordered.classify([b_code, a_code]) == plan.classify([a_code, b_code])
@@ -0,0 +1,94 @@
+import pytest
+
+from models import packed
+from models.packed import PackedResults
+from tests.test_engines import conditional, feature, make_generator
+
+FEATURES = [feature('A', ['a1', 'a2']), feature('B', ['b1', 'b2', 'b3'])]
+CONSTRAINTS = [
+    {'id': 'c0', 'rule_type': 'domain', 'feature': 'B', 'allowed_values': ['b1', 'b2'], 'description': 'No b3'},
+    conditional('c1', [{'feature': 'A', 'value': 'a1'}], [{'feature': 'B', 'mode': 'block', 'allowed_values': ['b1']}]),
+    conditional('c2', [{'feature': 'A', 'value': 'a2'}], [{'feature': 'B', 'mode': 'null'}]),
+]
+
+
+@pytest.fixture(params=[True, False], ids=['numpy', 'loop'])
+def with_numpy(request, monkeypatch):
+    if request.param:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(packed, 'np', None)
+
+
+def test_round_trip(tmp_path, with_numpy):
+    generator = make_generator(tmp_path, FEATURES, CONSTRAINTS)
+    path = str(tmp_path / 'results.pack')
+    assert generator.export_packed(path) == 5
+
+    with PackedResults(path) as results:
+        assert results.feature_sequence == ['A', 'B']
+        assert results.labels == [['a1', 'a2', 'None'], ['b1', 'b2', 'b3', 'None']]
+        assert results.constraint_ids == ['c0', 'c1', 'c2']
+        assert results.header['constraints'][0] == {'id': 'c0', 'description': 'No b3'}
+        assert results.header['status_type'] == 'B' and results.header['type_code'] == 'B'
+
+        rows = list(generator.iter_classified_configurations())
+        assert len(results) == len(rows)
+        assert list(results) == rows
+        assert [results[idx] for idx in range(len(results))] == rows
+        assert results[-1] == rows[-1]
+        assert results[0] == (None, 'a1/b1')
+        assert list(results.codes(1)) == [0, 1] and results.blocked_by(1) == 'c1'
+        with pytest.raises(IndexError):
+            results.codes(len(results))
+
+        assert results.indices() == list(range(len(rows)))
+        assert results.indices('valid') == [idx for idx, (blocker, _) in enumerate(rows) if blocker is None]
+        assert results.indices('blocked') == [idx for idx, (blocker, _) in enumerate(rows) if blocker is not None]
+        assert results.indices(constraint_id='c0') == [idx for idx, (blocker, _) in enumerate(rows) if blocker == 'c0']
+        assert list(results.iter_rows(valid=False)) == [row for row in rows if row[0] is not None]
+        with pytest.raises(ValueError):
+            results.indices('unknown')
+
+
+def test_empty_results(tmp_path, with_numpy):
+    generator = make_generator(tmp_path, FEATURES, CONSTRAINTS)
+    path = str(tmp_path / 'results.pack')
+    assert generator.export_packed(path, limit=0) == 0
+
+    with PackedResults(path) as results:
+        assert len(results) == 0
+        assert results.feature_sequence == ['A', 'B']
+        assert list(results) == []
+        assert results.indices('valid') == []
+        assert results.indices(constraint_id='c1') == []
+        with pytest.raises(IndexError):
+            results[0]
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'results.pack'
+    path.write_bytes(b'not a packed result file')
+    with pytest.raises(ValueError):
+        PackedResults(str(path))
+
+
+@pytest.mark.parametrize('options', [
+    pytest.param({'engine': 'vectorized'}, id='vectorized'),
+    pytest.param({'engine': 'incremental'}, id='incremental'),
+])
+@pytest.mark.parametrize('limit', [None, 0, 3])
+def test_numpy_chunks_match_rows(tmp_path, options, limit):
+    # Without null actions the NumPy engines write their chunks as they are
+    constraints = CONSTRAINTS[:2]
+    search_path, chunks_path = str(tmp_path / 'search.pack'), str(tmp_path / 'chunks.pack')
+    make_generator(tmp_path, FEATURES, constraints).export_packed(search_path, limit=limit)
+    generator = make_generator(tmp_path, FEATURES, constraints, **options)
+    generator._walker.chunk_size = 2
+    generator.export_packed(chunks_path, limit=limit)
+    with open(search_path, 'rb') as search, open(chunks_path, 'rb') as chunks:
+        assert search.read() == chunks.read()
+
+    generator.export_packed(chunks_path, valid=False)
+    with PackedResults(chunks_path) as results:
+        assert list(results) == [('c1', 'a1/b2'), ('c0', 'a1/b3'), ('c0', 'a2/b3')]
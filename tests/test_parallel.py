@@ -0,0 +1,51 @@
+import multiprocessing
+import os
+
+import pytest
+
+from models import parallel
+from models.plan import CompiledPlan
+from models.search import BacktrackingSearch
+from tests.test_engines import conditional, feature
+
+FEATURES = [feature(f'F{idx}', [f'v{idx}_{code}' for code in range(4)]) for idx in range(4)]
+NULL_F3 = [conditional('c1', [{'feature': 'F0', 'value': 'v0_0'}], [{'feature': 'F3', 'mode': 'null'}])]
+
+
+def test_dead_worker_raises(monkeypatch):
+    if multiprocessing.get_start_method() != 'fork':
+        pytest.skip('The workers only inherit the patched shard function when forked')
+
+    def exit_worker(engine, slots, task):
+        os._exit(3)
+
+    monkeypatch.setattr(parallel, 'POLL_INTERVAL', 0.05)
+    monkeypatch.setattr(parallel, '_walk_shard', exit_worker)
+    walker = parallel.ShardedWalker(BacktrackingSearch, CompiledPlan(FEATURES, []), 2)
+    with pytest.raises(RuntimeError, match='exited with code 3'):
+        list(walker.walk())
+
+
+def test_stopping_early_ends_the_workers():
+    walker = parallel.ShardedWalker(BacktrackingSearch, CompiledPlan(FEATURES, []), 2)
+    rows = walker.walk()
+    assert next(rows) == (None, 'v0_0/v1_0/v2_0/v3_0')
+    rows.close()
+    assert not multiprocessing.active_children()
+    assert len(list(walker.walk())) == 4 ** 4
+
+
+def test_workers_drop_repeats_only_when_the_engine_repeats():
+    pytest.importorskip('numpy')
+    from models.vectorized import VectorizedEvaluator
+
+    plan = CompiledPlan(FEATURES, NULL_F3)
+    assert not parallel.ShardedWalker(BacktrackingSearch, plan, 2)._dedupe
+    assert not parallel.ShardedWalker(VectorizedEvaluator, CompiledPlan(FEATURES, []), 2)._dedupe
+    walker = parallel.ShardedWalker(VectorizedEvaluator, plan, 2)
+    assert walker._dedupe
+
+    # Every combination starting with v0_0 nulls F3, the four F3 values giving one configuration
+    rows = list(walker.walk_codes())
+    assert len(rows) == 4 ** 4 - 3 * 4 ** 2
+    assert rows == list(BacktrackingSearch(plan).walk_codes())
@@ -0,0 +1,52 @@
+from tests.test_engines import conditional, feature, make_generator
+
+FEATURES = [feature('A', ['a1', 'a2', 'a3']), feature('B', ['b1', 'b2'])]
+CONSTRAINTS = [
+    {'id': 'c0', 'rule_type': 'domain', 'feature': 'A', 'allowed_values': ['a1', 'a2']},
+    conditional('c1', [{'feature': 'A', 'value': 'a1'}], [{'feature': 'B', 'mode': 'null'}]),
+    conditional('c2', [{'feature': 'B', 'value': 'b2'}], [{'feature': 'A', 'mode': 'block', 'allowed_values': ['a1']}]),
+    {'id': 'c3', 'rule_type': 'domain', 'feature': 'B', 'allowed_values': ['None']},
+]
+
+# Evaluated, matched, blocked and nulled configurations of every constraint over the 6 combinations:
+# c0 blocks a3/b1 and a3/b2, c1 nulls B of a1/b1 and a1/b2, c2 matches and blocks a2/b2 only since
+# B is None for a1, and c3 blocks a2/b1
+EXPECTED = {
+    'c0': (6, 6, 2, 0),
+    'c1': (4, 2, 0, 2),
+    'c2': (4, 1, 1, 0),
+    'c3': (3, 3, 1, 0),
+}
+
+
+def counts(stats) -> dict:
+    return {constraint.constraint_id: (constraint.evaluated, constraint.matched, constraint.blocked, constraint.nulled)
+            for constraint in stats.constraints}
+
+
+def test_counts_every_constraint(tmp_path):
+    generator = make_generator(tmp_path, FEATURES, CONSTRAINTS, profile=True)
+    assert generator.calculate_valid_configurations() == (
+        ['a1/None'], [('c3', 'a2/b1'), ('c2', 'a2/b2'), ('c0', 'a3/b1'), ('c0', 'a3/b2')]
+    )
+    assert counts(generator.stats) == EXPECTED
+    assert all(constraint.seconds >= 0 for constraint in generator.stats.constraints)
+    assert sum(constraint.seconds for constraint in generator.stats.constraints) > 0
+    assert generator.stats['c2'].as_dict()['blocked'] == 1
+
+    lines = generator.stats.report()
+    assert lines[0].split() == ['Constraint', 'Evaluated', 'Matched', 'Blocked', 'Nulled', 'Time', '(ms)']
+    assert sorted(line.split()[0] for line in lines[1:]) == ['c0', 'c1', 'c2', 'c3']
+
+
+def test_counts_accumulate_until_constraints_change(tmp_path):
+    generator = make_generator(tmp_path, FEATURES, CONSTRAINTS, profile=True)
+    list(generator.iter_classified_configurations())
+    list(generator.iter_classified_configurations(blocked=False))
+    assert counts(generator.stats) == {constraint_id: tuple(2 * count for count in expected)
+                                       for constraint_id, expected in EXPECTED.items()}
+
+    generator.remove_constraint('c3')
+    assert counts(generator.stats) == {constraint_id: (0, 0, 0, 0) for constraint_id in ('c0', 'c1', 'c2')}
+    list(generator.iter_classified_configurations())
+    assert counts(generator.stats) == {constraint_id: EXPECTED[constraint_id] for constraint_id in ('c0', 'c1', 'c2')}
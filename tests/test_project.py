@@ -0,0 +1,60 @@
+import pytest
+
+from models.project import ProjectGroups, feature_text, group_title
+
+
+def test_edits_change_the_groups_in_place():
+    project = ProjectGroups()
+    assert project.add_group('First') == 1
+    assert project.add_group('Second') == 2
+    first, second = project.groups[1], project.groups[2]
+    assert project.add_feature(1, 'A') == 1
+    assert project.add_feature(1, 'B') == 2
+    # A view holding a group dictionary sees the features added to it
+    assert first['features'] == {1: {'name': 'A', 'options': []}, 2: {'name': 'B', 'options': []}}
+
+    a, b = first['features'][1], first['features'][2]
+    assert project.swap_features(1, 1, 2)
+    assert first['features'][1] is b and first['features'][2] is a
+    assert project.swap_groups(1, 2)
+    assert project.groups[1] is second and project.groups[2] is first
+
+    assert not project.swap_groups(2, 2)
+    assert not project.swap_features(2, 1, 1)
+    assert project.groups[2] is first and first['features'][1] is b
+
+
+def test_labels_follow_the_priorities():
+    group = {'group_name': 'Colors', 'features': {}}
+    assert group_title(3, group) == 'Group (3): Colors'
+    feature = {'name': 'Hue', 'options': [{'code': 'r', 'name': 'Red'}, {'code': 'g', 'name': 'Green'}]}
+    assert feature_text(2, feature) == 'Feature (2): Hue\n(r) Red\n(g) Green'
+
+
+def test_project_model_signals():
+    pytest.importorskip('PyQt5')
+    from app import ProjectModel
+
+    model = ProjectModel()
+    emitted = []
+    model.groups_reset.connect(lambda: emitted.append(('reset',)))
+    model.group_added.connect(lambda *args: emitted.append(('group_added',) + args))
+    model.feature_added.connect(lambda *args: emitted.append(('feature_added',) + args))
+    model.groups_swapped.connect(lambda *args: emitted.append(('groups_swapped',) + args))
+    model.features_swapped.connect(lambda *args: emitted.append(('features_swapped',) + args))
+
+    model.set_groups({})
+    model.add_group('First')
+    model.add_group('Second')
+    model.add_feature(2, 'A')
+    model.add_feature(2, 'B')
+    first = model.groups[1]
+    model.swap_groups(1, 2)
+    model.swap_groups(1, 1)
+    model.swap_features(1, 1, 2)
+    model.swap_features(1, 2, 2)
+    assert emitted == [
+        ('reset',), ('group_added', 1), ('group_added', 2), ('feature_added', 2, 1), ('feature_added', 2, 2),
+        ('groups_swapped', 1, 2), ('features_swapped', 1, 1, 2),
+    ]
+    assert model.groups[2] is first and [feature['name'] for feature in model.groups[1]['features'].values()] == ['B', 'A']
@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from tests.test_engines import (ENGINE_OPTIONS, SEEDS, conditional, feature, make_generator, outcome, random_project,
+                                reference)
+
+FEATURES = [feature('A', ['a1', 'a2']), feature('B', ['b1', 'b2']), feature('C', ['c1', 'c2'])]
+CONSTRAINTS = [
+    conditional('c1', [{'feature': 'A', 'value': 'a2'}], [{'feature': 'C', 'mode': 'null'}]),
+    conditional('c2', [{'feature': 'B', 'value': 'b2'}], [{'feature': 'C', 'mode': 'block', 'allowed_values': ['c1']}]),
+]
+
+
+def shown(valid: list, fixed: dict, names: list) -> list:
+    """
+    Filter the full classification down to the valid configurations showing the fixed values.
+    """
+    positions = {names.index(name): value for name, value in fixed.items()}
+    return [config for config in valid
+            if all(config.split('/')[position] == value for position, value in positions.items())]
+
+
+@pytest.mark.parametrize('options', ENGINE_OPTIONS)
+def test_fixing_a_nulled_feature(tmp_path, options):
+    generator = make_generator(tmp_path, FEATURES, CONSTRAINTS, **options)
+    valid, _ = generator.calculate_valid_configurations()
+    assert valid == ['a1/b1/c1', 'a1/b1/c2', 'a1/b2/c1', 'a2/b1/None']
+
+    # c1 sets C to None whenever A is a2, so fixing C to a value excludes a2 and fixing it to None
+    # requires it; c2 then reads the null value and blocks a2/b2
+    for fixed in ({'C': 'c2'}, {'C': 'c1'}, {'C': 'None'}, {'A': 'a2', 'C': 'c1'}, {'B': 'b2', 'C': 'None'}):
+        expected = shown(valid, fixed, generator.feature_sequence)
+        assert list(generator.query(fixed)) == expected, fixed
+        assert generator.count_query(fixed) == len(expected), fixed
+    assert list(generator.query({'C': 'c2'})) == ['a1/b1/c2']
+    assert list(generator.query({'C': 'None'})) == ['a2/b1/None']
+    assert generator.count_query({'B': 'b2', 'C': 'None'}) == 0
+
+
+def test_unknown_fixed_values_raise(tmp_path):
+    generator = make_generator(tmp_path, FEATURES, CONSTRAINTS)
+    with pytest.raises(ValueError):
+        list(generator.query({'D': 'd1'}))
+    with pytest.raises(ValueError):
+        generator.count_query({'A': 'a3'})
+
+
+def test_queries_match_filtered_reference(tmp_path):
+    for seed in SEEDS:
+        features, constraints = random_project(seed)
+        expected = outcome(lambda: reference(features, constraints))
+        if isinstance(expected, type):
+            continue
+        valid, _ = expected
+        generator = make_generator(tmp_path, features, constraints)
+        rng = random.Random(seed)
+        for _ in range(3):
+            fixed = {}
+            for feature_idx in rng.sample(range(len(features)), rng.randint(1, min(2, len(features)))):
+                domain = features[feature_idx]['domain']
+                fixed[features[feature_idx]['name']] = rng.choice(domain + ['None'])
+            filtered = shown(valid, fixed, generator.feature_sequence)
+            assert list(generator.query(fixed)) == filtered, (seed, fixed)
+            assert generator.count_query(fixed) == len(filtered), (seed, fixed)
@@ -0,0 +1,91 @@
+from itertools import count
+
+import pytest
+
+from models.streaming import (
+    BLOCKED_CONFIGURATIONS, VALID_CONFIGURATIONS, VALID_ROW, ConfigurationRows, classify_in_batches
+)
+from tests.test_engines import conditional, feature, make_generator
+
+FEATURES = [feature(f'F{idx}', [f'v{idx}_{code}' for code in range(3)]) for idx in range(4)]
+CONSTRAINTS = [
+    {'id': 'c0', 'rule_type': 'domain', 'feature': 'F1', 'allowed_values': ['v1_0', 'v1_1']},
+    conditional('c1', [{'feature': 'F0', 'value': 'v0_0'}], [{'feature': 'F3', 'mode': 'block', 'allowed_values': ['v3_0']}]),
+    conditional('c2', [{'feature': 'F0', 'value': 'v0_1'}], [{'feature': 'F2', 'mode': 'null'}]),
+]
+TOTAL = 3 ** 4
+
+
+@pytest.fixture
+def generator(tmp_path):
+    return make_generator(tmp_path, FEATURES, CONSTRAINTS)
+
+
+def classify(generator, interrupted=lambda: False, **options) -> tuple:
+    batches, progress = [], []
+    finished = classify_in_batches(generator, batches.append, lambda done, total: progress.append((done, total)),
+                                   interrupted, **options)
+    return finished, batches, progress
+
+
+def test_batches_hold_every_row_in_order(generator):
+    finished, batches, progress = classify(generator, batch_size=7, interval=float('inf'))
+    assert finished
+    assert [row for batch in batches for row in batch] == list(generator.iter_classified_codes())
+    assert all(len(batch) == 7 for batch in batches[:-1]) and 0 < len(batches[-1]) <= 7
+    assert progress == [(0, TOTAL), (TOTAL, TOTAL)]
+
+
+def test_progress_is_sent_with_the_batches_of_every_interval(generator):
+    # Every read of the clock moves it a second ahead
+    finished, batches, progress = classify(generator, interval=1.0, clock=count().__next__)
+    assert finished
+    assert [row for batch in batches for row in batch] == list(generator.iter_classified_codes())
+    assert progress[0] == (0, TOTAL) and progress[-1] == (TOTAL, TOTAL)
+    done = [done for done, _ in progress]
+    assert done == sorted(done) and len(progress) > 3
+
+
+def test_cancelling_stops_between_rows(generator):
+    checks = count()
+    finished, batches, progress = classify(generator, interrupted=lambda: next(checks) >= 10, batch_size=4,
+                                           interval=float('inf'))
+    assert not finished
+    # Only the full batches are sent, the rows classified after the last one are dropped
+    rows = [row for batch in batches for row in batch]
+    expected = list(generator.iter_classified_codes())
+    assert 0 < len(rows) < len(expected) and len(rows) % 4 == 0
+    assert rows == expected[:len(rows)]
+    assert (TOTAL, TOTAL) not in progress
+
+
+def test_stopping_before_the_first_row_sends_nothing(generator):
+    finished, batches, progress = classify(generator, interrupted=lambda: True)
+    assert not finished
+    assert batches == [] and progress == [(0, TOTAL)]
+
+
+def test_rows_count_format_and_filter(generator):
+    rows = ConfigurationRows()
+    rows.reset(generator.plan)
+    classified = list(generator.iter_classified_codes())
+    rows.show(rows.append(classified[:10]))
+    rows.show(rows.append(classified[10:]))
+    assert rows.total_count() == rows.visible_count() == len(classified)
+
+    expected = [config if constraint_id is None else f'Blocked by ({constraint_id}): {config}'
+                for constraint_id, config in generator.iter_classified_configurations()]
+    assert [rows.text(position) for position in range(rows.visible_count())] == expected
+
+    rows.set_filter(VALID_CONFIGURATIONS, None)
+    assert rows.visible_count() == sum(1 for rule_idx, _ in classified if rule_idx is None)
+    assert all(rows.status(position) == VALID_ROW for position in range(rows.visible_count()))
+
+    rows.set_filter(BLOCKED_CONFIGURATIONS, 'c1')
+    assert rows.visible_count() == sum(1 for rule_idx, _ in classified if rule_idx == 1)
+    assert all(rows.text(position).startswith('Blocked by (c1)') for position in range(rows.visible_count()))
+    # Rows appended under a filter are only shown if they pass it
+    assert len(rows.append(classified)) == rows.visible_count()
+
+    rows.reset(generator.plan)
+    assert rows.total_count() == rows.visible_count() == 0
@@ -0,0 +1,92 @@
+import random
+from itertools import product
+
+import pytest
+
+from benchmarks.generator import generate_project
+from models.plan import NULL_VALUE, CompiledPlan
+from models.validation import BLOCKED_STATUS, INVALID_STATUS, VALID_STATUS, ConfigurationValidator
+from tests.test_engines import outcome, random_project
+
+
+def reference_validate(plan: CompiledPlan, configuration: str) -> tuple:
+    """
+    Classify every candidate value of the features showing the null value, in product order.
+
+    Returns the status and the blocking constraint ID, without the reason of invalid configurations.
+    """
+    labels = configuration.split('/')
+    values, open_features = [], []
+    for feature, label in enumerate(labels):
+        if label == NULL_VALUE:
+            open_features.append(feature)
+            values.append(None)
+        elif label in plan.labels[feature][:plan.domain_sizes[feature]]:
+            values.append(plan.labels[feature].index(label))
+        else:
+            return INVALID_STATUS, None
+
+    shown = list(values)
+    for feature in open_features:
+        shown[feature] = plan.null_codes[feature]
+    first_blocker = None
+    for combination in product(*[range(plan.domain_sizes[feature]) for feature in open_features]):
+        for feature, code in zip(open_features, combination):
+            values[feature] = code
+        candidate = list(values)
+        blocked_by = plan.classify(candidate)
+        if blocked_by is None and candidate == shown:
+            return VALID_STATUS, None
+        if blocked_by is not None and first_blocker is None:
+            first_blocker = blocked_by
+    if first_blocker is not None:
+        return BLOCKED_STATUS, plan.constraint_ids[first_blocker]
+    return INVALID_STATUS, None
+
+
+def test_validation_matches_product_search():
+    for seed in range(150):
+        features, constraints = random_project(seed)
+        plan = CompiledPlan(features, constraints)
+        validator = ConfigurationValidator(plan)
+        for combination in product(*[feature['domain'] + [NULL_VALUE] for feature in features]):
+            configuration = '/'.join(combination)
+            expected = outcome(lambda: reference_validate(plan, configuration))
+            got = outcome(lambda: validator.validate(configuration))
+            if isinstance(got, tuple) and got[0] == INVALID_STATUS:
+                got = INVALID_STATUS, None
+            assert got == expected, (seed, configuration)
+
+
+def test_validation_does_not_enumerate_null_candidates(monkeypatch):
+    # Up to 16 features showing the null value, 4**16 candidates each for a product search
+    project = generate_project(16, 4, 0, 30, 1, 0.9, seed=4)
+    plan = CompiledPlan(project['features'], project['constraints'])
+    validator = ConfigurationValidator(plan)
+
+    rng = random.Random(0)
+    valid_lines, other_lines = [], []
+    while len(valid_lines) < 5:
+        values = [rng.randrange(size) for size in plan.domain_sizes]
+        if plan.classify(values) is None:
+            configuration = plan.format(values)
+            if configuration.count(NULL_VALUE) >= 9:
+                valid_lines.append(configuration)
+    for n_nulls in range(9, 17):
+        labels = [rng.choice(feature['domain']) for feature in project['features']]
+        for feature in rng.sample(range(len(labels)), n_nulls):
+            labels[feature] = NULL_VALUE
+        other_lines.append('/'.join(labels))
+
+    calls = []
+
+    def classify(values):
+        calls.append(values)
+        if len(calls) > 1000:
+            pytest.fail('The candidates of the features showing the null value are enumerated')
+        return CompiledPlan.classify(plan, values)
+
+    monkeypatch.setattr(plan, 'classify', classify)
+    assert [validator.validate(configuration)[0] for configuration in valid_lines] == [VALID_STATUS] * 5
+    for configuration in other_lines:
+        assert validator.validate(configuration)[0] in (BLOCKED_STATUS, INVALID_STATUS)